@@ -0,0 +1,180 @@
+"""Скомпилированные планы diff для аудита.
+
+Для каждой модели один раз строится план: список полей (attname, чтобы не
+подгружать связанные объекты), конвертер значения в JSON по типу поля и
+набор исключаемых полей. build_diff сравнивает «сырые» значения атрибутов и
+конвертирует только изменившиеся.
+
+Для JSON-полей (ConstructionObject.polygon, OpeningChecklist.data, ...) при
+изменении пишется компактный поэлементный diff вместо полных копий:
+
+    {'changes': [{'path': ['fields', 0, 'value'], 'from': 1, 'to': 2}, ...]}
+
+Формат остальных полей прежний: {'field': {'from': old, 'to': new}}.
+"""
+from __future__ import annotations
+
+import datetime
+import decimal
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import models
+
+# Поля, которые не попадают в diff изменения (снимок при создании пишет все поля)
+EXCLUDED_ON_UPDATE = frozenset({'created_at', 'updated_at'})
+# Глубина рекурсии поэлементного diff; глубже — значение целиком
+JSON_DIFF_MAX_DEPTH = 8
+# Если изменений больше — компактный diff не компактен, пишем from/to целиком
+JSON_DIFF_MAX_CHANGES = 50
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _to_str(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+def _isoformat(value: Any) -> Any:
+    return None if value is None else value.isoformat()
+
+
+def _file_name(value: Any) -> Any:
+    return getattr(value, 'name', None) or None
+
+
+def _generic(value: Any) -> Any:
+    """Конвертер для полей без специального правила."""
+    if isinstance(value, _PRIMITIVES):
+        return value
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):  # datetime — подкласс date
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return value
+    return repr(value)
+
+
+def _converter(field: models.Field) -> Callable[[Any], Any]:
+    if isinstance(field, models.ForeignKey):
+        return _converter(field.target_field)
+    if isinstance(field, (models.UUIDField, models.DecimalField)):
+        return _to_str
+    if isinstance(field, (models.DateTimeField, models.DateField, models.TimeField)):
+        return _isoformat
+    if isinstance(field, models.FileField):
+        return _file_name
+    if isinstance(field, (models.CharField, models.TextField, models.IntegerField, models.FloatField,
+                          models.BooleanField, models.JSONField)):
+        return _identity
+    return _generic
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    name: str
+    attname: str
+    convert: Callable[[Any], Any]
+    is_json: bool
+
+
+@dataclass(frozen=True)
+class DiffPlan:
+    fields: Tuple[FieldPlan, ...]
+
+    def snapshot(self, instance: models.Model, include: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Diff создания: все поля {'from': None, 'to': value}."""
+        include = set(include) if include else None
+        return {
+            f.name: {'from': None, 'to': f.convert(getattr(instance, f.attname))}
+            for f in self.fields
+            if include is None or f.name in include
+        }
+
+    def diff(self, before: models.Model, after: models.Model, include: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        include = set(include) if include else None
+        result: Dict[str, Any] = {}
+        for f in self.fields:
+            if f.name in EXCLUDED_ON_UPDATE or (include is not None and f.name not in include):
+                continue
+            old = getattr(before, f.attname)
+            new = getattr(after, f.attname)
+            if old == new:
+                continue
+            if f.is_json:
+                changes = json_changes(old, new)
+                if changes is not None:
+                    result[f.name] = {'changes': changes}
+                    continue
+            result[f.name] = {'from': f.convert(old), 'to': f.convert(new)}
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_plan(model) -> DiffPlan:
+    return DiffPlan(fields=tuple(
+        FieldPlan(
+            name=f.name,
+            attname=f.attname,
+            convert=_converter(f),
+            is_json=isinstance(f, models.JSONField),
+        )
+        for f in model._meta.concrete_fields
+    ))
+
+
+def json_changes(old: Any, new: Any) -> Optional[List[Dict[str, Any]]]:
+    """Поэлементный diff двух JSON-значений; None — если компактный diff не имеет смысла."""
+    if not isinstance(old, (dict, list)) or type(old) is not type(new):
+        return None
+    changes: List[Dict[str, Any]] = []
+    _walk(old, new, [], changes, 0)
+    if len(changes) > JSON_DIFF_MAX_CHANGES:
+        return None
+    return changes
+
+
+def _walk(old: Any, new: Any, path: List[Any], out: List[Dict[str, Any]], depth: int) -> None:
+    if len(out) > JSON_DIFF_MAX_CHANGES:
+        return
+    if old == new:
+        return
+    if depth < JSON_DIFF_MAX_DEPTH and type(old) is type(new):
+        if isinstance(old, dict):
+            for key, value in old.items():
+                if key in new:
+                    _walk(value, new[key], path + [key], out, depth + 1)
+                else:
+                    out.append({'path': path + [key], 'from': value, 'to': None})
+            for key, value in new.items():
+                if key not in old:
+                    out.append({'path': path + [key], 'from': None, 'to': value})
+            return
+        if isinstance(old, list):
+            common = min(len(old), len(new))
+            for i in range(common):
+                _walk(old[i], new[i], path + [i], out, depth + 1)
+            for i in range(common, len(old)):
+                out.append({'path': path + [i], 'from': old[i], 'to': None})
+            for i in range(common, len(new)):
+                out.append({'path': path + [i], 'from': None, 'to': new[i]})
+            return
+    out.append({'path': path, 'from': old, 'to': new})
+
+
+def build_diff(before: Optional[models.Model], after: models.Model, include: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    plan = get_plan(type(after))
+    if before is None:
+        return plan.snapshot(after, include)
+    assert before.__class__ is after.__class__
+    return plan.diff(before, after, include)
+
+
+__all__ = ['DiffPlan', 'FieldPlan', 'get_plan', 'build_diff', 'json_changes']
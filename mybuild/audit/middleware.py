@@ -0,0 +1,12 @@
+from audit.writer import audit_buffer
+
+
+class AuditBufferMiddleware:
+    """Открывает буфер аудита на время запроса (см. audit.writer)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_buffer():
+            return self.get_response(request)
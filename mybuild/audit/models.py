@@ -18,6 +18,10 @@ class AuditLog(BaseModel):
         verbose_name = 'Запись аудита'
         verbose_name_plural = 'Записи аудита'
         ordering = ['-created_at']
+        indexes = [
+            # лента объекта: фильтр (model, object_id) + keyset по (created_at, id), см. audit.timeline
+            models.Index(fields=['model', 'object_id', 'created_at', 'id'], name='audit_object_timeline_idx'),
+        ]
         permissions = [
             ("can_view_auditlog", "Может просматривать аудит"),
         ]
@@ -0,0 +1,255 @@
+"""Хранение AuditLog: холодный архив и чтение ленты с учетом архива.
+
+Горячая таблица audit_auditlog хранит последние AUDIT_RETENTION_DAYS дней.
+Более старые записи команда archive_auditlog переносит в архив:
+
+    AUDIT_ARCHIVE_DIR/
+        auditlog-<from>-<to>-<run>.ndjson.gz   — записи, одна JSON-строка на запись
+        auditlog-<from>-<to>-<run>.idx.json    — сайдкар: диапазон created_at,
+                                                  {"model|object_id": [номера строк]}
+
+Файл и сайдкар пишутся во временные имена и переименовываются, и только
+после этого строки удаляются из таблицы — сбой посередине может дать
+дубликат (читатель дедуплицирует по id), но не потерю.
+
+read_timeline() читает горячую таблицу и, если лента уходит дальше самой
+старой горячей записи (или архив пересекается с запрошенным периодом),
+дочитывает архив по сайдкарам — распаковываются только файлы, в которых
+есть ключ (model, object_id).
+
+На PostgreSQL таблица может быть секционирована по месяцам (см. команду
+audit_partitions); архивирование работает одинаково для обоих вариантов.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_RETENTION_DAYS = 180
+ARCHIVE_BATCH = 5000
+
+_FIELDS = (
+    'id', 'created_at', 'updated_at', 'actor_id', 'action', 'model', 'object_id', 'context',
+    'client_created_at', 'client_lat', 'client_lon', 'offline_batch_id', 'was_offline',
+)
+_DATETIME_FIELDS = ('created_at', 'updated_at', 'client_created_at')
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'audit_archive')))
+
+
+def _key(model: str, object_id: str) -> str:
+    return f'{model}|{object_id}'
+
+
+def _row_to_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    record = dict(row)
+    record['id'] = str(record['id'])
+    for name in _DATETIME_FIELDS:
+        if record.get(name) is not None:
+            record[name] = record[name].isoformat()
+    return record
+
+
+def _record_from_json(line: bytes) -> Dict[str, Any]:
+    record = json.loads(line)
+    for name in _DATETIME_FIELDS:
+        if record.get(name):
+            record[name] = parse_datetime(record[name])
+    return record
+
+
+# ---------- запись архива ----------
+def _write_archive(rows: List[Dict[str, Any]]) -> Path:
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    first, last = rows[0]['created_at'], rows[-1]['created_at']
+    stem = f"auditlog-{first:%Y%m%d%H%M%S}-{last:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    data_path = directory / f'{stem}.ndjson.gz'
+    index_path = directory / f'{stem}.idx.json'
+    keys: Dict[str, List[int]] = {}
+    tmp_data = data_path.with_suffix('.gz.tmp')
+    with gzip.open(tmp_data, 'wb') as fh:
+        for lineno, row in enumerate(rows):
+            fh.write(json.dumps(_row_to_record(row), ensure_ascii=False, separators=(',', ':')).encode() + b'\n')
+            keys.setdefault(_key(row['model'], row['object_id']), []).append(lineno)
+    index = {
+        'file': data_path.name,
+        'count': len(rows),
+        'min_created_at': first.isoformat(),
+        'max_created_at': last.isoformat(),
+        'keys': keys,
+    }
+    tmp_index = index_path.with_suffix('.json.tmp')
+    tmp_index.write_text(json.dumps(index, separators=(',', ':')))
+    for tmp in (tmp_data, tmp_index):
+        with open(tmp, 'rb') as fh:
+            os.fsync(fh.fileno())
+    # данные переименовываются раньше индекса: индекс без файла невозможен
+    os.replace(tmp_data, data_path)
+    os.replace(tmp_index, index_path)
+    return data_path
+
+
+def archive_older_than(days: int, batch_size: int = ARCHIVE_BATCH, now: Optional[datetime] = None) -> Tuple[int, List[Path]]:
+    """Переносит записи старше days дней в архив; возвращает (число записей, файлы)."""
+    from audit.models import AuditLog
+
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    moved, files = 0, []
+    while True:
+        rows = list(
+            AuditLog.objects.filter(created_at__lt=cutoff).order_by('created_at', 'id').values(*_FIELDS)[:batch_size]
+        )
+        if not rows:
+            break
+        files.append(_write_archive(rows))
+        AuditLog.objects.filter(pk__in=[r['id'] for r in rows]).delete()
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+    if files:
+        _manifest.invalidate()
+    return moved, files
+
+
+# ---------- чтение архива ----------
+@dataclass(frozen=True)
+class ArchiveIndex:
+    path: Path
+    min_created_at: datetime
+    max_created_at: datetime
+    keys: Dict[str, List[int]]
+
+
+class _Manifest:
+    """Кеш сайдкаров архива в процессе (перечитывается при изменении каталога)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[str, float]] = None
+        self._indexes: List[ArchiveIndex] = []
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stamp = None
+
+    def indexes(self) -> List[ArchiveIndex]:
+        directory = archive_dir()
+        try:
+            stamp = (str(directory), directory.stat().st_mtime)
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            if stamp != self._stamp:
+                loaded = []
+                for path in sorted(directory.glob('*.idx.json')):
+                    data = json.loads(path.read_text())
+                    loaded.append(ArchiveIndex(
+                        path=directory / data['file'],
+                        min_created_at=parse_datetime(data['min_created_at']),
+                        max_created_at=parse_datetime(data['max_created_at']),
+                        keys=data['keys'],
+                    ))
+                self._indexes = loaded
+                self._stamp = stamp
+            return list(self._indexes)
+
+
+_manifest = _Manifest()
+
+
+def archive_horizon() -> Optional[datetime]:
+    """Самая поздняя created_at в архиве (None — архива нет)."""
+    indexes = _manifest.indexes()
+    return max((i.max_created_at for i in indexes), default=None)
+
+
+def _read_lines(path: Path, wanted: List[int]) -> Iterator[Dict[str, Any]]:
+    targets = set(wanted)
+    last = max(targets)
+    with gzip.open(path, 'rb') as fh:
+        for lineno, line in enumerate(fh):
+            if lineno in targets:
+                yield _record_from_json(line)
+            if lineno >= last:
+                return
+
+
+def read_archive(model: str, object_id: str, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    key = _key(model, str(object_id))
+    records: List[Dict[str, Any]] = []
+    for index in _manifest.indexes():
+        lines = index.keys.get(key)
+        if not lines:
+            continue
+        if since is not None and index.max_created_at < since:
+            continue
+        if until is not None and index.min_created_at >= until:
+            continue
+        for record in _read_lines(index.path, lines):
+            created = record['created_at']
+            if (since is None or created >= since) and (until is None or created < until):
+                records.append(record)
+    return records
+
+
+def read_model_archive(model: str, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Архивные записи всех строк модели за [since, until) (для восстановления истории)."""
+    prefix = _key(model, '')
+    records: List[Dict[str, Any]] = []
+    for index in _manifest.indexes():
+        if since is not None and index.max_created_at < since:
+            continue
+        if until is not None and index.min_created_at >= until:
+            continue
+        lines = [n for key, numbers in index.keys.items() if key.startswith(prefix) for n in numbers]
+        if not lines:
+            continue
+        for record in _read_lines(index.path, lines):
+            created = record['created_at']
+            if (since is None or created >= since) and (until is None or created < until):
+                records.append(record)
+    return records
+
+
+def read_timeline(model: str, object_id: str, since: Optional[datetime] = None,
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Лента аудита объекта (новые сверху): горячая таблица + архив при необходимости."""
+    from audit.models import AuditLog
+
+    qs = AuditLog.objects.filter(model=model, object_id=str(object_id)).order_by('-created_at', '-id')
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+    hot = list(qs.values(*_FIELDS)[:limit] if limit else qs.values(*_FIELDS))
+    for row in hot:
+        row['id'] = str(row['id'])
+    if limit and len(hot) >= limit:
+        return hot
+    horizon = archive_horizon()
+    if horizon is None or (since is not None and since > horizon):
+        return hot
+    # после сбоя при архивировании запись может оказаться и в таблице, и в архиве
+    seen = {row['id'] for row in hot}
+    cold = [r for r in read_archive(model, object_id, since=since) if r['id'] not in seen]
+    merged = sorted(hot + cold, key=lambda r: (r['created_at'], r['id']), reverse=True)
+    return merged[:limit] if limit else merged
+
+
+__all__ = [
+    'archive_dir', 'archive_older_than', 'archive_horizon', 'read_archive', 'read_model_archive', 'read_timeline',
+]
@@ -1,61 +1,19 @@
 """Сервис аудита действий.
 
 log_action фиксирует изменение состояния бизнес‑объекта.
-Минимальный формат diff: {'field': {'from': old, 'to': new}}.
+Минимальный формат diff: {'field': {'from': old, 'to': new}};
+для JSON-полей — поэлементный {'field': {'changes': [...]}} (см. audit.diff).
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, Optional
-import uuid
+from typing import Any, Dict, Optional
 
-
-def _jsonable(value: Any) -> Any:
-    """Convert value into JSON‑serializable primitive.
-
-    - UUID -> str
-    - model instance -> str(pk)
-    - other unsupported types -> repr()
-    """
-    if isinstance(value, uuid.UUID):
-        return str(value)
-    from django.db import models as _m
-    if isinstance(value, _m.Model):
-        return str(getattr(value, 'pk', value))
-    try:
-        # basic types pass through
-        import json as _json
-        _json.dumps(value)
-        return value
-    except Exception:  # pragma: no cover - fallback path
-        return repr(value)
 from django.contrib.auth.models import User
 from django.db import models
 
+from .diff import build_diff
 from .models import AuditLog
-
-
-def build_diff(before: Optional[models.Model], after: models.Model, include: Optional[Iterable[str]] = None) -> Dict[str, Any]:
-    diff: Dict[str, Any] = {}
-    if before is None:
-        # создание: фиксируем initial snapshot
-        for f in after._meta.fields:
-            name = f.name
-            if include and name not in include:
-                continue
-            diff[name] = {'from': None, 'to': _jsonable(getattr(after, name))}
-        return diff
-    assert before.__class__ is after.__class__
-    for f in after._meta.fields:
-        name = f.name
-        if name in ('created_at', 'updated_at'):
-            continue
-        if include and name not in include:
-            continue
-        old = _jsonable(getattr(before, name))
-        new = _jsonable(getattr(after, name))
-        if old != new:
-            diff[name] = {'from': old, 'to': new}
-    return diff
+from .writer import submit
 
 
 def log_action(
@@ -78,7 +36,7 @@ def log_action(
         context['extra'] = extra
     if client_payload:
         context['client'] = client_payload
-    return AuditLog.objects.create(
+    entry = AuditLog(
         actor=actor,
         action=action,
         model=instance._meta.label_lower,
@@ -90,3 +48,6 @@ def log_action(
         offline_batch_id=getattr(instance, 'offline_batch_id', None),
         was_offline=getattr(instance, 'was_offline', False),
     )
+    # Внутри запроса запись буферизуется и сбрасывается пачкой (см. audit.writer)
+    submit(entry)
+    return entry
@@ -0,0 +1,58 @@
+import copy
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from audit.diff import build_diff, get_plan, json_changes
+from objects.models import ConstructionObject, OpeningChecklist
+from orgs.models import Organization
+
+
+class DiffPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='differ', password='pass123')
+        self.org = Organization.objects.create(name='Diff Org')
+        polygon = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+        self.obj = ConstructionObject.objects.create(org=self.org, name='Diff Obj', polygon=polygon)
+
+    def test_plan_is_cached_per_model(self):
+        self.assertIs(get_plan(ConstructionObject), get_plan(ConstructionObject))
+
+    def test_create_snapshot_uses_raw_fk_and_isoformat(self):
+        obj = ConstructionObject.objects.get(pk=self.obj.pk)
+        with self.assertNumQueries(0):
+            diff = build_diff(None, obj)
+        self.assertEqual(diff['org']['to'], str(self.org.pk))
+        self.assertEqual(diff['id']['to'], str(self.obj.pk))
+        self.assertEqual(diff['created_at']['to'], obj.created_at.isoformat())
+
+    def test_update_diff_skips_unchanged_and_fk_without_query(self):
+        before = ConstructionObject.objects.get(pk=self.obj.pk)
+        after = ConstructionObject.objects.get(pk=self.obj.pk)
+        after.name = 'Renamed'
+        after.activated_by_id = self.user.pk
+        with self.assertNumQueries(0):
+            diff = build_diff(before, after)
+        self.assertEqual(diff, {
+            'name': {'from': 'Diff Obj', 'to': 'Renamed'},
+            'activated_by': {'from': None, 'to': self.user.pk},
+        })
+
+    def test_json_fields_get_item_level_changes(self):
+        data = {'fields': [{'name': 'a', 'value': 1}, {'name': 'b', 'value': 2}], 'note': 'x'}
+        before = OpeningChecklist.objects.create(object=self.obj, data=data)
+        after = copy.deepcopy(before)
+        after.data = copy.deepcopy(data)
+        after.data['fields'][1]['value'] = 3
+        after.data['extra'] = True
+        del after.data['note']
+        diff = build_diff(before, after)
+        self.assertEqual(diff['data'], {'changes': [
+            {'path': ['fields', 1, 'value'], 'from': 2, 'to': 3},
+            {'path': ['note'], 'from': 'x', 'to': None},
+            {'path': ['extra'], 'from': None, 'to': True},
+        ]})
+
+    def test_json_type_change_falls_back_to_full_values(self):
+        self.assertIsNone(json_changes([1, 2], {'a': 1}))
+        self.assertEqual(json_changes([1, 2], [1, 2, 3]), [{'path': [2], 'from': None, 'to': 3}])
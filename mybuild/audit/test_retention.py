@@ -0,0 +1,64 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from audit.models import AuditLog
+from audit.retention import read_timeline
+
+
+class AuditRetentionTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(AUDIT_ARCHIVE_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='retention', password='pass123')
+        now = timezone.now()
+        self.entries = []
+        for age_days, action in ((400, 'old_a'), (200, 'old_b'), (10, 'recent'), (1, 'latest')):
+            entry = AuditLog.objects.create(actor=self.user, action=action, model='objects.constructionobject',
+                                            object_id='obj-1', context={'action': action})
+            AuditLog.objects.filter(pk=entry.pk).update(created_at=now - timedelta(days=age_days))
+            self.entries.append(entry)
+        AuditLog.objects.create(action='other', model='objects.constructionobject', object_id='obj-2', context={})
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_archive_moves_old_rows_with_sidecar(self):
+        out = StringIO()
+        call_command('archive_auditlog', '--days', '90', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(set(AuditLog.objects.values_list('action', flat=True)), {'recent', 'latest', 'other'})
+        data_files = list(Path(self.tmp.name).glob('*.ndjson.gz'))
+        index_files = list(Path(self.tmp.name).glob('*.idx.json'))
+        self.assertEqual((len(data_files), len(index_files)), (1, 1))
+        index = json.loads(index_files[0].read_text())
+        self.assertEqual(index['keys'], {'objects.constructionobject|obj-1': [0, 1]})
+        with gzip.open(data_files[0], 'rt') as fh:
+            self.assertEqual([json.loads(line)['action'] for line in fh], ['old_a', 'old_b'])
+
+    def test_timeline_reads_hot_table_and_archive(self):
+        call_command('archive_auditlog', '--days', '90', stdout=StringIO())
+        timeline = read_timeline('objects.constructionobject', 'obj-1')
+        self.assertEqual([r['action'] for r in timeline], ['latest', 'recent', 'old_b', 'old_a'])
+        self.assertEqual(timeline[-1]['context'], {'action': 'old_a'})
+        # лимит, покрываемый горячей таблицей, не читает архив
+        self.assertEqual([r['action'] for r in read_timeline('objects.constructionobject', 'obj-1', limit=2)],
+                         ['latest', 'recent'])
+        since = timezone.now() - timedelta(days=300)
+        self.assertEqual([r['action'] for r in read_timeline('objects.constructionobject', 'obj-1', since=since)],
+                         ['latest', 'recent', 'old_b'])
+
+    def test_partitions_command_is_postgres_only(self):
+        out = StringIO()
+        call_command('audit_partitions', stdout=out)
+        self.assertIn('PostgreSQL', out.getvalue())
@@ -0,0 +1,93 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit.models import AuditLog
+from audit.timeline import diff_events, timeline_page
+from objects.models import ConstructionObject
+from orgs.models import Organization, Membership
+
+MODEL = 'objects.constructionobject'
+
+
+class AuditTimelineTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(AUDIT_ARCHIVE_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.org = Organization.objects.create(name="Timeline Org")
+        self.other = Organization.objects.create(name="Timeline Other")
+        self.user = User.objects.create_user(username="timeline", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="INSPECTOR")
+        self.obj = ConstructionObject.objects.create(name="Site", org=self.org, polygon={})
+        self.foreign = ConstructionObject.objects.create(name="Foreign", org=self.other, polygon={})
+        now = timezone.now()
+        # пять записей; две последние с одинаковым created_at — порядок по id
+        stamps = [now - timedelta(days=d) for d in (300, 200, 3, 1, 1)]
+        for i, stamp in enumerate(stamps):
+            entry = AuditLog.objects.create(
+                actor=self.user, action=f'step_{i}', model=MODEL, object_id=str(self.obj.pk),
+                context={'diff': {'status': {'from': i, 'to': i + 1}}},
+            )
+            AuditLog.objects.filter(pk=entry.pk).update(created_at=stamp)
+        AuditLog.objects.create(action='noise', model=MODEL, object_id=str(self.foreign.pk), context={})
+        self.api = APIClient()
+        self.api.login(username="timeline", password="pass123")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def _walk(self, limit):
+        pages, cursor = [], None
+        while True:
+            page = timeline_page(MODEL, self.obj.pk, cursor=cursor, limit=limit)
+            pages.append([r['id'] for r in page['results']])
+            cursor = page['next']
+            if cursor is None:
+                return pages
+
+    def test_pages_follow_keyset_order(self):
+        expected = [str(pk) for pk in AuditLog.objects.filter(object_id=str(self.obj.pk))
+                    .order_by('-created_at', '-id').values_list('id', flat=True)]
+        pages = self._walk(limit=2)
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_pages_continue_into_archive(self):
+        expected = sum(self._walk(limit=2), [])
+        call_command('archive_auditlog', '--days', '90', stdout=StringIO())
+        self.assertEqual(AuditLog.objects.filter(object_id=str(self.obj.pk)).count(), 3)
+        self.assertEqual(sum(self._walk(limit=2), []), expected)
+        self.assertEqual(sum(self._walk(limit=3), []), expected)
+
+    def test_endpoint_events_and_scope(self):
+        url = f'/api/objects/{self.obj.pk}/timeline/'
+        resp = self.api.get(url, {'limit': 1, 'events': 'fields'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data['results']), 1)
+        newest = AuditLog.objects.filter(object_id=str(self.obj.pk)).order_by('-created_at', '-id').first()
+        self.assertEqual(resp.data['results'][0]['id'], str(newest.pk))
+        self.assertEqual(resp.data['results'][0]['events'], [{'field': 'status', **newest.context['diff']['status']}])
+        self.assertIsNotNone(resp.data['next'])
+        resp = self.api.get(url, {'cursor': resp.data['next'], 'limit': 10})
+        self.assertEqual(len(resp.data['results']), 4)
+        self.assertIsNone(resp.data['next'])
+        self.assertEqual(self.api.get(url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.api.get(f'/api/objects/{self.foreign.pk}/timeline/').status_code, 404)
+
+    def test_diff_events_expand_json_changes(self):
+        diff = {
+            'name': {'from': 'a', 'to': 'b'},
+            'polygon': {'changes': [{'path': ['coordinates', 0], 'from': 1, 'to': 2}]},
+        }
+        self.assertEqual(diff_events(diff), [
+            {'field': 'name', 'from': 'a', 'to': 'b'},
+            {'field': 'polygon', 'path': ['coordinates', 0], 'from': 1, 'to': 2},
+        ])
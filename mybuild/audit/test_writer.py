@@ -0,0 +1,86 @@
+import queue
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+
+from audit.models import AuditLog
+from audit.services import log_action
+from audit.writer import BackgroundWriter, _write as real_write, audit_buffer
+from orgs.models import Organization
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auditor', password='pass123')
+        self.org = Organization.objects.create(name='Audit Org')
+
+    def test_without_buffer_writes_immediately(self):
+        log_action(actor=self.user, action='direct', instance=self.org)
+        self.assertTrue(AuditLog.objects.filter(action='direct').exists())
+
+    def test_buffer_flushes_with_one_insert(self):
+        with self.assertNumQueries(1):
+            with audit_buffer():
+                for i in range(5):
+                    log_action(actor=self.user, action=f'buffered_{i}', instance=self.org)
+        self.assertEqual(AuditLog.objects.filter(action__startswith='buffered_').count(), 5)
+
+    def test_rolled_back_transaction_drops_entries(self):
+        with audit_buffer():
+            log_action(actor=self.user, action='kept', instance=self.org)
+            try:
+                with transaction.atomic():
+                    log_action(actor=self.user, action='rolled_back', instance=self.org)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    log_action(actor=self.user, action='committed', instance=self.org)
+        actions = set(AuditLog.objects.values_list('action', flat=True))
+        self.assertEqual(actions, {'kept', 'committed'})
+
+    def test_buffer_flushed_on_exception(self):
+        with self.assertRaises(ValueError):
+            with audit_buffer():
+                log_action(actor=self.user, action='before_error', instance=self.org)
+                raise ValueError
+        self.assertTrue(AuditLog.objects.filter(action='before_error').exists())
+
+    def test_background_writer_overflow_is_written_synchronously(self):
+        writer = BackgroundWriter.__new__(BackgroundWriter)  # без потока: проверяем очередь и переполнение
+        writer.queue = queue.Queue(maxsize=2)
+        writer.batch_size = 10
+        entries = [AuditLog(actor=self.user, action=f'bg_{i}', model='orgs.organization', object_id='x', context={})
+                   for i in range(3)]
+        writer.put(entries)
+        self.assertEqual(list(AuditLog.objects.filter(action__startswith='bg_').values_list('action', flat=True)), ['bg_2'])
+        writer.flush()
+        self.assertEqual(AuditLog.objects.filter(action__startswith='bg_').count(), 3)
+
+    def test_background_writer_failed_batch_is_not_lost(self):
+        writer = BackgroundWriter.__new__(BackgroundWriter)
+        writer.retries, writer.retry_delay = 2, 0
+        entries = [AuditLog(actor=self.user, action=f'retry_{i}', model='orgs.organization', object_id='x', context={})
+                   for i in range(3)]
+        with mock.patch('audit.writer.close_old_connections'):
+            # пачка не пишется ни разу — записи сохраняются по одной
+            with mock.patch('audit.writer._write', side_effect=RuntimeError('db down')) as failing:
+                writer._persist(entries[:2])
+            self.assertEqual(failing.call_count, 2)
+            self.assertEqual(AuditLog.objects.filter(action__startswith='retry_').count(), 2)
+            # временная ошибка — пачка записывается повтором целиком
+            calls = []
+
+            def flaky(batch):
+                calls.append(len(batch))
+                if len(calls) == 1:
+                    raise RuntimeError('timeout')
+                real_write(batch)
+
+            with mock.patch('audit.writer._write', side_effect=flaky):
+                writer._persist(entries[2:])
+        self.assertEqual(calls, [1, 1])
+        self.assertEqual(AuditLog.objects.filter(action__startswith='retry_').count(), 3)
@@ -0,0 +1,146 @@
+"""Лента аудита одного объекта с keyset-пагинацией.
+
+Страница выбирается по составному индексу audit_object_timeline_idx
+(model, object_id, created_at, id): фильтр по (model, object_id), условие
+«(created_at, id) < курсор» и сортировка по тому же ключу — БД читает ровно
+limit + 1 записей индекса, независимо от глубины страницы.
+
+Когда горячая таблица исчерпана, лента продолжается в холодном архиве
+(audit.retention) с тем же курсором — клиент не видит границы.
+
+events=True раскладывает context['diff'] записи на события по полям:
+
+    {'field': 'status', 'from': 'DRAFT', 'to': 'PLANNED'}
+    {'field': 'polygon', 'path': ['coordinates', 0], 'from': ..., 'to': ...}
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.core.exceptions import ValidationError
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from rest_framework import decorators, response
+
+from core.services.cursors import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+
+from .retention import _FIELDS, archive_horizon, read_archive
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+KEY = ('created_at', 'id')
+
+
+def diff_events(diff: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Diff записи аудита -> список событий по полям."""
+    events: List[Dict[str, Any]] = []
+    for field, change in (diff or {}).items():
+        if isinstance(change, dict) and 'changes' in change:
+            for item in change['changes']:
+                events.append({'field': field, 'path': item.get('path', []), 'from': item.get('from'), 'to': item.get('to')})
+        elif isinstance(change, dict):
+            events.append({'field': field, 'from': change.get('from'), 'to': change.get('to')})
+    return events
+
+
+def _entry(row: Dict[str, Any], events: bool) -> Dict[str, Any]:
+    context = row.get('context') or {}
+    created = row['created_at']
+    client_created = row.get('client_created_at')
+    item = {
+        'id': str(row['id']),
+        'created_at': created.isoformat() if created else None,
+        'action': row['action'],
+        'actor': row.get('actor_id'),
+        'was_offline': row.get('was_offline', False),
+        'client_created_at': client_created.isoformat() if client_created else None,
+    }
+    if events:
+        item['events'] = diff_events(context.get('diff'))
+    else:
+        item['diff'] = context.get('diff', {})
+    if context.get('extra'):
+        item['extra'] = context['extra']
+    return item
+
+
+def _archive_tail(model: str, object_id: str, after: Optional[tuple], need: int, seen: set) -> List[Dict[str, Any]]:
+    """Записи архива строго старше ключа after (None — с самого нового)."""
+    if after is None:
+        cold = read_archive(model, object_id)
+    else:
+        # until исключает границу, а равные created_at различаются по id
+        cold = read_archive(model, object_id, until=after[0] + timedelta(microseconds=1))
+        key = (after[0], str(after[1]))
+        cold = [r for r in cold if (r['created_at'], r['id']) < key]
+    cold = [r for r in cold if r['id'] not in seen]
+    cold.sort(key=lambda r: (r['created_at'], r['id']), reverse=True)
+    return cold[:need]
+
+
+def timeline_page(model: str, object_id: Any, cursor: Optional[str] = None,
+                  limit: int = DEFAULT_PAGE_SIZE, events: bool = False) -> Dict[str, Any]:
+    """Страница ленты (новые сверху): {'results': [...], 'next': курсор или None}."""
+    from audit.models import AuditLog
+
+    object_id = str(object_id)
+    qs = AuditLog.objects.filter(model=model, object_id=object_id).values(*_FIELDS)
+    rows, next_cursor = keyset_page(qs, KEY, cursor, limit)
+    if next_cursor is None and archive_horizon() is not None:
+        # горячая часть закончилась на этой странице — добираем из архива
+        if rows:
+            after = (rows[-1]['created_at'], rows[-1]['id'])
+        elif cursor:
+            after = decode_cursor(cursor, len(KEY))
+        else:
+            after = None
+        seen = {str(r['id']) for r in rows}
+        tail = _archive_tail(model, object_id, after, limit - len(rows) + 1, seen)
+        rows += tail
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]['created_at'], rows[-1]['id']])
+    return {'results': [_entry(r, events) for r in rows], 'next': next_cursor}
+
+
+def _page_size(raw: Optional[str]) -> int:
+    try:
+        value = int(raw) if raw else DEFAULT_PAGE_SIZE
+    except ValueError:
+        value = DEFAULT_PAGE_SIZE
+    return max(1, min(value, MAX_PAGE_SIZE))
+
+
+class TimelineMixin:
+    """Добавляет ViewSet'у detail-экшен timeline: лента аудита объекта.
+
+    Доступ — как к самому объекту (get_object: скоуп + object permissions).
+    """
+
+    @decorators.action(detail=True, methods=['get'])
+    @extend_schema(
+        summary="Лента аудита объекта",
+        parameters=[
+            OpenApiParameter('cursor', str, required=False, description='Курсор из поля next предыдущей страницы'),
+            OpenApiParameter('limit', int, required=False, description=f'Размер страницы (до {MAX_PAGE_SIZE})'),
+            OpenApiParameter('events', bool, required=False, description='Разложить diff на события по полям'),
+        ],
+        responses={200: OpenApiResponse(description="Страница ленты"), 400: OpenApiResponse(description="Неверный курсор")},
+    )
+    def timeline(self, request, pk=None):
+        obj = self.get_object()
+        params = request.query_params
+        try:
+            page = timeline_page(
+                obj._meta.label_lower,
+                obj.pk,
+                cursor=params.get('cursor') or None,
+                limit=_page_size(params.get('limit')),
+                events=params.get('events', '').lower() in ('1', 'true', 'yes', 'fields'),
+            )
+        except (InvalidCursor, ValidationError):
+            return response.Response({'detail': 'Неверный курсор.'}, status=400)
+        return response.Response(page)
+
+
+__all__ = ['TimelineMixin', 'timeline_page', 'diff_events']
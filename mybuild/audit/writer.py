@@ -0,0 +1,196 @@
+"""Буферизованная запись AuditLog.
+
+log_action раньше делал AuditLog.objects.create на каждое действие прямо в
+запросе. Теперь записи копятся в буфере запроса (audit_buffer, открывается
+AuditBufferMiddleware) и сбрасываются одним bulk_create в конце запроса.
+
+Гарантия «записи не теряются для зафиксированных изменений»:
+- запись, сделанная внутри транзакции, попадает в буфер только в
+  transaction.on_commit — откат транзакции отбрасывает и аудит;
+- записи вне транзакции (autocommit) относятся к уже зафиксированным
+  изменениям и попадают в буфер сразу;
+- сброс буфера выполняется и при исключении в view.
+
+Режим сброса задается AUDIT_WRITER:
+- 'inline' (по умолчанию) — bulk_create в конце запроса;
+- 'background' — записи передаются фоновому потоку (очередь на
+  AUDIT_QUEUE_MAX записей, сброс раз в AUDIT_FLUSH_INTERVAL сек. или по
+  заполнении пачки). При переполнении очереди запись выполняется синхронно,
+  при остановке процесса очередь дописывается (atexit). Пачка, которую не
+  удалось записать, повторяется с нарастающей паузой (AUDIT_WRITE_RETRIES
+  попыток), затем пишется по одной записи, чтобы одна ошибочная запись не
+  теряла остальные. Записи в очереди не переживают аварийное завершение
+  процесса.
+
+Вне буфера (management-команды, сервисы, фоновые задачи) log_action пишет
+сразу, как и раньше.
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from core.services.transactions import in_transaction
+
+logger = logging.getLogger(__name__)
+
+_buffer: contextvars.ContextVar[Optional[List]] = contextvars.ContextVar('audit_buffer', default=None)
+
+DEFAULT_QUEUE_MAX = 10000
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WRITE_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.5
+
+
+def _write(entries: List) -> None:
+    from audit.models import AuditLog
+
+    if entries:
+        AuditLog.objects.bulk_create(entries, batch_size=DEFAULT_BATCH_SIZE)
+
+
+def _append(entry) -> None:
+    buf = _buffer.get()
+    if buf is None:
+        # буфер уже закрыт (или не открывался) — пишем сразу
+        _write([entry])
+    else:
+        buf.append(entry)
+
+
+def submit(entry) -> None:
+    """Принимает несохраненный AuditLog: буферизует или пишет сразу."""
+    if _buffer.get() is None:
+        entry.save(force_insert=True)
+        return
+    if in_transaction():
+        transaction.on_commit(lambda: _append(entry))
+    else:
+        _append(entry)
+
+
+class BackgroundWriter:
+    """Фоновый поток записи с ограниченной очередью."""
+
+    retries = DEFAULT_WRITE_RETRIES
+    retry_delay = DEFAULT_RETRY_DELAY
+
+    def __init__(self, maxsize: int, interval: float, batch_size: int = DEFAULT_BATCH_SIZE,
+                 retries: int = DEFAULT_WRITE_RETRIES) -> None:
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retries = retries
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, entries: List) -> None:
+        for i, entry in enumerate(entries):
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                # не теряем записи: остаток пишем синхронно в потоке запроса
+                _write(entries[i:])
+                return
+
+    def _drain(self, first=None) -> List:
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self.queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            try:
+                self._persist(self._drain(first))
+            finally:
+                close_old_connections()
+
+    def _persist(self, batch: List) -> None:
+        """Пишет пачку с повторами; если пачка так и не записалась — по одной записи."""
+        delay = self.retry_delay
+        for attempt in range(1, self.retries + 1):
+            try:
+                _write(batch)
+                return
+            except Exception:
+                logger.warning('audit writer: попытка %s записать %s записей не удалась', attempt, len(batch),
+                               exc_info=True)
+                close_old_connections()
+                time.sleep(delay)
+                delay *= 2
+        for entry in batch:
+            try:
+                entry.save(force_insert=True)
+            except Exception:
+                logger.exception('audit writer: запись аудита %s потеряна', entry.action)
+
+    def flush(self) -> None:
+        """Синхронно дописывает все, что осталось в очереди."""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._persist(batch)
+
+
+_writer: Optional[BackgroundWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_background_writer() -> BackgroundWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = BackgroundWriter(
+                    maxsize=getattr(settings, 'AUDIT_QUEUE_MAX', DEFAULT_QUEUE_MAX),
+                    interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+                    retries=getattr(settings, 'AUDIT_WRITE_RETRIES', DEFAULT_WRITE_RETRIES),
+                )
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def flush(entries: List) -> None:
+    if not entries:
+        return
+    if getattr(settings, 'AUDIT_WRITER', 'inline') == 'background':
+        get_background_writer().put(entries)
+    else:
+        _write(entries)
+
+
+@contextmanager
+def audit_buffer():
+    """Буфер записей аудита; вложенные вызовы используют внешний буфер."""
+    if _buffer.get() is not None:
+        yield
+        return
+    entries: List = []
+    token = _buffer.set(entries)
+    try:
+        yield
+    finally:
+        _buffer.reset(token)
+        flush(entries)
+
+
+__all__ = ['audit_buffer', 'submit', 'flush', 'BackgroundWriter', 'get_background_writer']
@@ -1,3 +1,9 @@
+"""ASGI-приложение.
+
+Обязательно для потока уведомлений /api/notifications/stream/ (SSE,
+notifications.stream): под WSGI он отвечает 501. Запуск, например:
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+"""
 import os
 from django.core.asgi import get_asgi_application
 
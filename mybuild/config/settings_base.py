@@ -1,6 +1,6 @@
 """Base settings formerly in mybuild.mybuild.settings (extracted)."""
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,6 +41,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'audit.middleware.AuditBufferMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -51,8 +52,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны кешируются в процессе (в DEBUG сбрасываются автоперезагрузкой)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -85,6 +92,80 @@ else:
         }
     }
 
+# Cache: Redis (общий для всех воркеров) если задан REDIS_URL, иначе локальная память процесса
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'mybuild',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Время жизни снимка скоупа пользователя (группы, членства, назначения) в кеше, сек.
+SCOPE_CACHE_TIMEOUT = config("SCOPE_CACHE_TIMEOUT", cast=int, default=3600)
+
+# Пространственный индекс геозон: размер ячейки сетки (градусы) и период
+# проверки версии индекса в общем кеше (сек.)
+SPATIAL_GRID_CELL_DEG = config("SPATIAL_GRID_CELL_DEG", cast=float, default=0.01)
+SPATIAL_INDEX_CHECK_INTERVAL = config("SPATIAL_INDEX_CHECK_INTERVAL", cast=float, default=1.0)
+
+# Реестр активных инспекционных визитов: TTL записи в кеше (сек.) и возраст
+# открытого визита, после которого close_stale_visits закрывает его (ч.)
+ACTIVE_VISIT_CACHE_TIMEOUT = config("ACTIVE_VISIT_CACHE_TIMEOUT", cast=int, default=600)
+INSPECTION_VISIT_MAX_HOURS = config("INSPECTION_VISIT_MAX_HOURS", cast=float, default=12)
+
+# Запись аудита: 'inline' — одним bulk_create в конце запроса,
+# 'background' — фоновым потоком (очередь AUDIT_QUEUE_MAX, сброс раз в AUDIT_FLUSH_INTERVAL сек.,
+# AUDIT_WRITE_RETRIES повторов пачки при ошибке записи)
+AUDIT_WRITER = config("AUDIT_WRITER", default="inline")
+AUDIT_QUEUE_MAX = config("AUDIT_QUEUE_MAX", cast=int, default=10000)
+AUDIT_FLUSH_INTERVAL = config("AUDIT_FLUSH_INTERVAL", cast=float, default=1.0)
+AUDIT_WRITE_RETRIES = config("AUDIT_WRITE_RETRIES", cast=int, default=3)
+
+# Хранение аудита: записи старше AUDIT_RETENTION_DAYS дней archive_auditlog переносит
+# в AUDIT_ARCHIVE_DIR (gzip NDJSON + индекс по model/object_id)
+AUDIT_RETENTION_DAYS = config("AUDIT_RETENTION_DAYS", cast=int, default=180)
+AUDIT_ARCHIVE_DIR = config("AUDIT_ARCHIVE_DIR", default=os.path.join(BASE_DIR, 'audit_archive'))
+
+# Пакетная офлайн-синхронизация (/api/sync/batch/): максимум записей в одном пакете
+SYNC_BATCH_MAX = config("SYNC_BATCH_MAX", cast=int, default=500)
+# Лента изменений (/api/sync/changes/): задержка выдачи свежих строк (сек.)
+# и срок хранения записей об удалениях (дней, команда purge_tombstones)
+SYNC_CHANGES_LAG_SECONDS = config("SYNC_CHANGES_LAG_SECONDS", cast=int, default=2)
+SYNC_TOMBSTONE_DAYS = config("SYNC_TOMBSTONE_DAYS", cast=int, default=30)
+
+# Офлайн-пакет объекта: глубина ежедневных чек-листов (дней) и TTL кеша (сек.)
+BUNDLE_DAILY_DAYS = config("BUNDLE_DAILY_DAYS", cast=int, default=14)
+BUNDLE_CACHE_TIMEOUT = config("BUNDLE_CACHE_TIMEOUT", cast=int, default=86400)
+
+# Уведомления (outbox): кто рассылает ('inline' — сразу после коммита,
+# 'worker' — команда dispatch_notifications), каналы доставки, окно склейки
+# серий *.updated (сек.) и адрес webhook
+NOTIFICATION_DISPATCH = config("NOTIFICATION_DISPATCH", default="inline")
+NOTIFICATION_BACKENDS = config("NOTIFICATION_BACKENDS", cast=Csv(), default="notifications.backends.InboxBackend")
+NOTIFICATION_COALESCE_WINDOW = config("NOTIFICATION_COALESCE_WINDOW", cast=int, default=30)
+NOTIFICATION_WEBHOOK_URL = config("NOTIFICATION_WEBHOOK_URL", default="")
+# TTL кеша получателей уведомлений по объекту (сек.)
+NOTIFICATION_RECIPIENTS_CACHE_TIMEOUT = config("NOTIFICATION_RECIPIENTS_CACHE_TIMEOUT", cast=int, default=3600)
+# SSE-поток уведомлений (ASGI): интервал heartbeat (сек.) и лимит соединений на процесс
+NOTIFICATION_STREAM_HEARTBEAT = config("NOTIFICATION_STREAM_HEARTBEAT", cast=int, default=15)
+NOTIFICATION_STREAM_MAX_CONNECTIONS = config("NOTIFICATION_STREAM_MAX_CONNECTIONS", cast=int, default=1000)
+# Окно перекрытия потока (сек.): строки, зафиксированные позже более новых, но не позднее
+# окна после INSERT, дочитываются по created_at
+NOTIFICATION_STREAM_OVERLAP_SECONDS = config("NOTIFICATION_STREAM_OVERLAP_SECONDS", cast=int, default=5)
+# Кеш фрагментов панели и списков (core.services.page_cache): TTL (0 — выключен) и
+# время, которое запросы ждут фрагмент, уже строящийся другим запросом (сек.)
+PAGE_CACHE_TIMEOUT = config("PAGE_CACHE_TIMEOUT", cast=int, default=300)
+PAGE_CACHE_LOCK_TIMEOUT = config("PAGE_CACHE_LOCK_TIMEOUT", cast=int, default=5)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
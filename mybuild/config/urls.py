@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from core import api as core_api
+from dashboard.views import dashboard_api
+from notifications.views import notification_stream
 from materials.views import delivery_list
 from issues.views import remarks_list, checklists_list
 
@@ -16,6 +18,8 @@ urlpatterns = [
 	path('remarks/', remarks_list, name='remarks_list'),
 	path('checklists/', checklists_list, name='checklists_list'),
 	path('playground/', include('playground.urls')),
+	path('api/dashboard/', dashboard_api, name='dashboard_api'),
+	path('api/notifications/stream/', notification_stream, name='notifications_stream'),
 	path('api/', include(core_api.router.urls)),
 ]
 
@@ -13,9 +13,11 @@ from __future__ import annotations
 
 from rest_framework import routers, viewsets, mixins, decorators, response, status
 from rest_framework.permissions import IsAuthenticated
-from drf_spectacular.utils import extend_schema, OpenApiResponse
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 
-from core.services.scoping import ScopedQuerySetMixin
+from audit.timeline import TimelineMixin
+from core.services.object_permissions import AllowedActionsMixin
+from core.services.scoping import ScopedQuerySetMixin, scope_predicate
 from core.permissions import MatrixPermission
 
 from objects.models import ConstructionObject, OpeningChecklist, DailyChecklist
@@ -24,7 +26,7 @@ from materials.models import Delivery, OCRResult, TTNDocument, LabSampleRequest
 from issues.models import Remark, Violation
 
 
-class ConstructionObjectViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class ConstructionObjectViewSet(AllowedActionsMixin, TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = ConstructionObject.objects.all()
     permission_classes = [IsAuthenticated, MatrixPermission]
     role_map = {
@@ -64,6 +66,59 @@ class ConstructionObjectViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         log_action(actor=self.request.user, action='update_object', instance=instance, before=old)
         notify([self.request.user], OBJECT_UPDATED, build_basic_payload(instance))
 
+    @decorators.action(detail=False, methods=['get'])
+    @extend_schema(
+        summary="Объекты, геозона которых содержит точку",
+        parameters=[
+            OpenApiParameter('lat', float, required=True),
+            OpenApiParameter('lon', float, required=True),
+        ],
+        responses={200: OpenApiResponse(description="Список объектов"), 400: OpenApiResponse(description="Неверные координаты")},
+    )
+    def locate(self, request):
+        from core.services.principal import get_principal
+        from core.services.spatial_index import locate_objects
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+        except (KeyError, TypeError, ValueError):
+            return response.Response({'detail': 'Параметры lat и lon обязательны.'}, status=400)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return response.Response({'detail': 'Координаты вне допустимого диапазона.'}, status=400)
+        # Кандидатов фильтруем по организациям пользователя до запроса к БД; у суперпользователя
+        # и системных ролей (ADMIN, INSPECTOR) скоуп не ограничен (scope_predicate -> None)
+        org_ids = None
+        if scope_predicate(ConstructionObject, request.user) is not None:
+            org_ids = get_principal(request.user).org_ids
+        object_ids = locate_objects(lon, lat, org_ids)
+        objs = self.get_queryset().filter(pk__in=object_ids) if object_ids else []
+        from objects.serializers import ConstructionObjectListSerializer
+        return response.Response(ConstructionObjectListSerializer(objs, many=True).data)
+
+    @decorators.action(detail=True, methods=['get'], url_path='offline-bundle')
+    @extend_schema(
+        summary="Офлайн-пакет объекта",
+        description="Объект, чек-листы, незакрытые замечания и нарушения, справочники одним сжатым JSON. "
+                    "Поддерживает If-None-Match (ETag — хеш содержимого).",
+        responses={200: OpenApiResponse(description="Пакет (gzip при Accept-Encoding: gzip)"), 304: OpenApiResponse(description="Не изменился")},
+    )
+    def offline_bundle(self, request, pk=None):
+        from django.http import HttpResponse
+        from django.utils.cache import patch_vary_headers
+        from objects.services.bundle import get_bundle
+        bundle = get_bundle(self.get_object())
+        if bundle.etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+            resp = HttpResponse(status=304)
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            resp = HttpResponse(bundle.body, content_type='application/json')
+            resp['Content-Encoding'] = 'gzip'
+        else:
+            resp = HttpResponse(bundle.raw(), content_type='application/json')
+        resp['ETag'] = bundle.etag
+        resp['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(resp, ['Accept-Encoding'])
+        return resp
+
     # ---------- FSM actions ----------
     @decorators.action(detail=True, methods=['post'])
     @extend_schema(summary="Планирование объекта", responses={200: OpenApiResponse(description="Успех"), 400: OpenApiResponse(description="Неверный статус")})
@@ -150,7 +205,7 @@ class WorkItemViewSet(ScopedQuerySetMixin, mixins.ListModelMixin, mixins.Retriev
         return WorkItemDetailSerializer
 
 
-class DeliveryViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class DeliveryViewSet(TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = Delivery.objects.select_related('object').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
 
@@ -168,6 +223,7 @@ class DeliveryViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
             defaults['created_by'] = self.request.user
         from core.services.offline import create_or_get_offline
         instance, created = create_or_get_offline(serializer.Meta.model, offline_batch_id=offline_batch_id, user=self.request.user, defaults=defaults)
+        self._offline_replay = not created
         from audit.services import log_action
         from notifications.services import notify, build_basic_payload, DELIVERY_CREATED, DELIVERY_UPDATED
         if created:
@@ -191,13 +247,10 @@ class DeliveryViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         # perform_create sets instance & logs actions
         self.perform_create(serializer)
         status_code = status.HTTP_201_CREATED
-        if 'offline_batch_id' in serializer.validated_data:
-            offline_id = serializer.validated_data.get('offline_batch_id')
-            # replay marked by existing AuditLog action replay_delivery OR instance pre-existence
-            # Simplistic: if replay_delivery just logged OR instance already existed
-            from audit.models import AuditLog
-            if AuditLog.objects.filter(action='replay_delivery', object_id=str(serializer.instance.pk)).exists():
-                status_code = status.HTTP_200_OK
+        # Повтор (запись с этим offline_batch_id уже существовала) — 200.
+        # Аудит буферизуется до конца запроса, поэтому флаг берем из perform_create.
+        if getattr(self, '_offline_replay', False):
+            status_code = status.HTTP_200_OK
         headers = self.get_success_headers(serializer.data)
         return response.Response(serializer.data, status=status_code, headers=headers)
 
@@ -219,7 +272,7 @@ class OCRResultViewSet(ScopedQuerySetMixin, mixins.RetrieveModelMixin, mixins.Li
         return OCRResultSerializer
 
 
-class TTNDocumentViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class TTNDocumentViewSet(TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = TTNDocument.objects.select_related('attachment', 'ocr').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
 
@@ -228,7 +281,7 @@ class TTNDocumentViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         return TTNDocumentSerializer
 
 
-class LabSampleRequestViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class LabSampleRequestViewSet(TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = LabSampleRequest.objects.select_related('material', 'delivery').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
 
@@ -237,7 +290,7 @@ class LabSampleRequestViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         return LabSampleRequestSerializer
 
 
-class RemarkViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class RemarkViewSet(TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = Remark.objects.select_related('object').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
 
@@ -266,7 +319,7 @@ class RemarkViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         notify([self.request.user], REMARK_UPDATED, build_basic_payload(instance))
 
 
-class ViolationViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class ViolationViewSet(TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = Violation.objects.select_related('object').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
 
@@ -295,7 +348,7 @@ class ViolationViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         notify([self.request.user], VIOLATION_UPDATED, build_basic_payload(instance))
 
 
-class OpeningChecklistViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class OpeningChecklistViewSet(AllowedActionsMixin, TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = OpeningChecklist.objects.select_related('object').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
     role_map = {
@@ -367,7 +420,7 @@ class OpeningChecklistViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         return response.Response({'status': checklist.status})
 
 
-class DailyChecklistViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
+class DailyChecklistViewSet(AllowedActionsMixin, TimelineMixin, ScopedQuerySetMixin, viewsets.ModelViewSet):
     queryset = DailyChecklist.objects.select_related('object').all()
     permission_classes = [IsAuthenticated, MatrixPermission]
     role_map = {
@@ -401,6 +454,184 @@ class DailyChecklistViewSet(ScopedQuerySetMixin, viewsets.ModelViewSet):
         return response.Response({'status': checklist.status})
 
 
+class SyncViewSet(viewsets.ViewSet):
+    """Пакетная офлайн-синхронизация (см. core.services.sync)."""
+    # Права на каждый вид записей проверяются в сервисе (как MatrixPermission для create)
+    permission_classes = [IsAuthenticated]
+
+    @decorators.action(detail=False, methods=['post'])
+    @extend_schema(
+        summary="Пакетная синхронизация офлайн-записей",
+        description="Принимает упорядоченный массив записей (поставки, замечания, нарушения, визиты, "
+                    "подтверждения присутствия) и возвращает результат по каждой: created, replayed или failed.",
+        responses={200: OpenApiResponse(description="Результаты по записям"), 400: OpenApiResponse(description="Неверный пакет")},
+    )
+    def batch(self, request):
+        from core.services.sync import SyncError, apply_batch
+        try:
+            result = apply_batch(request.user, request.data)
+        except SyncError as exc:
+            return response.Response({'detail': str(exc)}, status=400)
+        return response.Response(result)
+
+    @decorators.action(detail=False, methods=['get'])
+    @extend_schema(
+        summary="Лента изменений модели для дельта-синхронизации",
+        parameters=[
+            OpenApiParameter('model', str, required=True, description='Префикс API: objects, deliveries, remarks, ...'),
+            OpenApiParameter('cursor', str, required=False, description='Курсор next из предыдущего ответа'),
+            OpenApiParameter('limit', int, required=False),
+        ],
+        responses={
+            200: OpenApiResponse(description="Измененные строки и удаленные id"),
+            400: OpenApiResponse(description="Неизвестная модель или неверный курсор"),
+            410: OpenApiResponse(description="Курсор устарел — нужна полная синхронизация"),
+        },
+    )
+    def changes(self, request):
+        from core.services.changes import (
+            DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FEED_PREFIXES, CursorExpired, changes_page,
+        )
+        from core.services.cursors import InvalidCursor
+        from django.core.exceptions import ValidationError
+        prefix = request.query_params.get('model')
+        if prefix not in FEED_PREFIXES:
+            return response.Response({'detail': f'Параметр model: одно из {", ".join(FEED_PREFIXES)}.'}, status=400)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit') or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        except ValueError:
+            return response.Response({'detail': 'Неверный limit.'}, status=400)
+        try:
+            page = changes_page(request, prefix, cursor=request.query_params.get('cursor') or None, limit=limit)
+        except (InvalidCursor, ValidationError):
+            return response.Response({'detail': 'Неверный курсор.'}, status=400)
+        except CursorExpired:
+            return response.Response({'detail': 'Курсор устарел, выполните полную синхронизацию.'}, status=410)
+        return response.Response(page)
+
+
+class NotificationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Входящие уведомления текущего пользователя (см. notifications.inbox)."""
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        from notifications.models import Notification
+        return Notification.objects.filter(user=self.request.user)
+
+    def get_serializer_class(self):
+        from notifications.serializers import MarkReadSerializer, NotificationSerializer
+        return MarkReadSerializer if self.action == 'mark_read' else NotificationSerializer
+
+    @extend_schema(
+        summary="Лента уведомлений (keyset)",
+        parameters=[
+            OpenApiParameter('cursor', str, required=False, description='Курсор next из предыдущего ответа'),
+            OpenApiParameter('limit', int, required=False),
+            OpenApiParameter('unread', bool, required=False, description='Только непрочитанные'),
+        ],
+        responses={200: OpenApiResponse(description="{'results', 'next'}"), 400: OpenApiResponse(description="Неверный курсор")},
+    )
+    def list(self, request, *args, **kwargs):
+        from core.services.cursors import InvalidCursor, keyset_page
+        from django.core.exceptions import ValidationError
+        try:
+            limit = max(1, min(int(request.query_params.get('limit') or 50), 200))
+        except ValueError:
+            return response.Response({'detail': 'Неверный limit.'}, status=400)
+        qs = self.get_queryset()
+        if request.query_params.get('unread') in ('1', 'true'):
+            qs = qs.filter(is_read=False)
+        try:
+            rows, next_cursor = keyset_page(qs, ('created_at', 'id'), request.query_params.get('cursor') or None, limit)
+        except (InvalidCursor, ValidationError):
+            return response.Response({'detail': 'Неверный курсор.'}, status=400)
+        return response.Response({'results': self.get_serializer(rows, many=True).data, 'next': next_cursor})
+
+    @decorators.action(detail=False, methods=['get'])
+    @extend_schema(
+        summary="Число непрочитанных (для опроса)",
+        description="Поддерживает If-None-Match: ETag — версия входящих пользователя, "
+                    "при неизменных входящих ответ 304 без обращения к таблицам уведомлений.",
+        responses={200: OpenApiResponse(description="{'unread', 'version'}"), 304: OpenApiResponse(description="Без изменений")},
+    )
+    def unread(self, request):
+        from django.http import HttpResponse
+        from notifications.inbox import etag_for, poll_state
+        etag = etag_for(request.user)
+        if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+            resp = HttpResponse(status=304)
+        else:
+            state = poll_state(request.user)
+            etag = state['etag']
+            resp = response.Response({'unread': state['unread'], 'version': state['version']})
+        resp['ETag'] = etag
+        resp['Cache-Control'] = 'private, no-cache'
+        return resp
+
+    @decorators.action(detail=False, methods=['post'], url_path='mark-read')
+    @extend_schema(
+        summary="Отметить прочитанными",
+        description="ids — список уведомлений или all=true — все непрочитанные; выполняется одним UPDATE.",
+        responses={200: OpenApiResponse(description="{'marked', 'unread'}"), 400: OpenApiResponse(description="Неверный запрос")},
+    )
+    def mark_read(self, request):
+        from notifications.inbox import mark_read, unread_count
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = None if serializer.validated_data['all'] else serializer.validated_data['ids']
+        marked = mark_read(request.user, ids)
+        return response.Response({'marked': marked, 'unread': unread_count(request.user)})
+
+
+class KpiSeriesViewSet(viewsets.ViewSet):
+    """Временные ряды KPI объекта или организации из ежедневных снимков (см. dashboard.rollups)."""
+    permission_classes = [IsAuthenticated]
+    MAX_DAYS = 3660
+
+    @extend_schema(
+        summary="Ряд KPI по дням",
+        description="Читает только таблицу снимков KpiSnapshot: одна строка на день. "
+                    "Нужен ровно один из параметров object/org; диапазон — start/end или последние days дней.",
+        parameters=[
+            OpenApiParameter('object', str, required=False, description='ID объекта'),
+            OpenApiParameter('org', str, required=False, description='ID организации (итог по ее объектам)'),
+            OpenApiParameter('days', int, required=False, description='Последние N дней (по умолчанию 90)'),
+            OpenApiParameter('start', str, required=False, description='Начало, YYYY-MM-DD'),
+            OpenApiParameter('end', str, required=False, description='Конец, YYYY-MM-DD (по умолчанию вчера)'),
+            OpenApiParameter('fields', str, required=False, description='Поля через запятую'),
+        ],
+        responses={200: OpenApiResponse(description="{'fields', 'points': [{'date', ...}]}"), 400: OpenApiResponse(description="Неверные параметры")},
+    )
+    def list(self, request):
+        import datetime
+        from django.core.exceptions import ValidationError
+        from django.utils import timezone
+        from dashboard.rollups import DEFAULT_SERIES_FIELDS, SERIES_FIELDS, series
+        params = request.query_params
+        object_id, org_id = params.get('object'), params.get('org')
+        if bool(object_id) == bool(org_id):
+            return response.Response({'detail': 'Укажите object или org.'}, status=400)
+        fields = [f for f in (params.get('fields') or '').split(',') if f] or list(DEFAULT_SERIES_FIELDS)
+        unknown = [f for f in fields if f not in SERIES_FIELDS]
+        if unknown:
+            return response.Response({'detail': 'Неизвестные поля.', 'unknown': unknown, 'available': SERIES_FIELDS}, status=400)
+        try:
+            end = datetime.date.fromisoformat(params['end']) if params.get('end') else timezone.now().date() - datetime.timedelta(days=1)
+            if params.get('start'):
+                start = datetime.date.fromisoformat(params['start'])
+            else:
+                start = end - datetime.timedelta(days=int(params.get('days') or 90) - 1)
+        except ValueError:
+            return response.Response({'detail': 'Неверный диапазон дат.'}, status=400)
+        if start > end or (end - start).days >= self.MAX_DAYS:
+            return response.Response({'detail': 'Неверный диапазон дат.'}, status=400)
+        try:
+            points = series(request.user, org_id=org_id, object_id=object_id, start=start, end=end, fields=fields)
+        except ValidationError:
+            return response.Response({'detail': 'Неверный идентификатор.'}, status=400)
+        return response.Response({'fields': fields, 'points': points})
+
+
 router = routers.DefaultRouter()
 router.register('objects', ConstructionObjectViewSet, basename='object')
 router.register('work-items', WorkItemViewSet, basename='workitem')
@@ -412,3 +643,6 @@ router.register('remarks', RemarkViewSet, basename='remark')
 router.register('violations', ViolationViewSet, basename='violation')
 router.register('opening-checklists', OpeningChecklistViewSet, basename='openingchecklist')
 router.register('daily-checklists', DailyChecklistViewSet, basename='dailychecklist')
+router.register('sync', SyncViewSet, basename='sync')
+router.register('notifications', NotificationViewSet, basename='notification')
+router.register('kpi-series', KpiSeriesViewSet, basename='kpi-series')
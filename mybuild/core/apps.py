@@ -12,3 +12,12 @@ class CoreConfig(AppConfig):
         except Exception:
             # Fail silently to not break migrations in edge cases
             pass
+        # Инвалидация кеша скоупа пользователей
+        from . import signals  # noqa: F401
+        # Компиляция матрицы прав (role_map + MODEL_PERMS_MAP) один раз при старте
+        try:
+            from .services.permission_matrix import get_permission_matrix
+            get_permission_matrix()
+        except Exception:
+            # матрица будет собрана лениво при первой проверке прав
+            pass
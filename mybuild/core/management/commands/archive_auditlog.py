@@ -0,0 +1,30 @@
+"""Перенос старых записей AuditLog в холодный архив (gzip NDJSON + сайдкар-индекс).
+
+Записи старше --days дней (по умолчанию AUDIT_RETENTION_DAYS) пачками
+записываются в AUDIT_ARCHIVE_DIR и удаляются из таблицы. Работает на любой
+БД; на SQLite это и есть «скользящее окно» хранения. Запускать по расписанию.
+
+Пример:
+    python manage.py archive_auditlog --days 180
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from audit.retention import ARCHIVE_BATCH, DEFAULT_RETENTION_DAYS, archive_dir, archive_older_than
+
+
+class Command(BaseCommand):
+    help = 'Переносит записи аудита старше N дней в сжатый архив.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Сколько дней хранить в таблице')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH)
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        days = opts['days'] if opts['days'] is not None else getattr(settings, 'AUDIT_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+        moved, files = archive_older_than(days, batch_size=opts['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Архивировано записей: {moved}, файлов: {len(files)} ({archive_dir()})'
+        ))
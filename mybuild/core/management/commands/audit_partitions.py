@@ -0,0 +1,155 @@
+"""Помесячные секции AuditLog на PostgreSQL.
+
+Команда идемпотентна:
+- --convert: однократно превращает audit_auditlog в таблицу, секционированную
+  по RANGE (created_at). Текущая таблица становится секцией «до начала
+  текущего месяца». Первичный ключ секционированной таблицы обязан включать
+  ключ секционирования, поэтому PK становится (id, created_at); id остается
+  UUID и уникален на практике.
+- создает секции на --ahead месяцев вперед (по умолчанию 3);
+- --drop-before YYYY-MM: удаляет секции, целиком лежащие раньше месяца
+  (сначала выполните archive_auditlog — удаление секции необратимо).
+
+На других СУБД (SQLite) секционирования нет: хранение ограничивается
+командой archive_auditlog. --dry-run печатает SQL, ничего не выполняя.
+
+Пример:
+    python manage.py audit_partitions --convert --ahead 6
+    python manage.py audit_partitions --drop-before 2025-01
+"""
+from __future__ import annotations
+
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+TABLE = 'audit_auditlog'
+_INDEXED_COLUMNS = (
+    'created_at', 'actor_id', 'action', 'model', 'object_id', 'client_created_at', 'offline_batch_id', 'was_offline',
+)
+# составной индекс ленты объекта (Meta.indexes, audit_object_timeline_idx)
+_TIMELINE_INDEX = ('model', 'object_id', 'created_at', 'id')
+_PARTITION_RE = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+_UPPER_RE = re.compile(r"TO \('(\d{4}-\d{2}-\d{2})")
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def convert_sql(first_month: date) -> list:
+    """SQL перевода обычной таблицы в секционированную."""
+    legacy = f'{TABLE}_legacy'
+    return [
+        f'ALTER TABLE {TABLE} RENAME TO {legacy}',
+        f'CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (created_at)',
+        f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)',
+        f'ALTER TABLE {TABLE} ADD FOREIGN KEY (actor_id) REFERENCES auth_user (id) '
+        f'ON DELETE SET NULL DEFERRABLE INITIALLY DEFERRED',
+        # индексы модели (db_index=True); на секционированной таблице создаются явно
+        *[f'CREATE INDEX ON {TABLE} ({column})' for column in _INDEXED_COLUMNS],
+        f'CREATE INDEX ON {TABLE} ({", ".join(_TIMELINE_INDEX)})',
+        # существующие строки — одна секция до начала текущего месяца
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{first_month.isoformat()}')",
+    ]
+
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {TABLE} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    )
+
+
+class Command(BaseCommand):
+    help = 'Управляет помесячными секциями таблицы аудита (PostgreSQL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3, help='Сколько будущих месяцев подготовить')
+        parser.add_argument('--convert', action='store_true', help='Перевести таблицу в секционированную')
+        parser.add_argument('--drop-before', default=None, help='YYYY-MM: удалить секции раньше этого месяца')
+        parser.add_argument('--dry-run', action='store_true', help='Только напечатать SQL')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        if connection.vendor != 'postgresql' and not opts['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Секционирование доступно только на PostgreSQL (текущая СУБД: {connection.vendor}). '
+                'Используйте archive_auditlog.'
+            ))
+            return
+        current = timezone.now().date().replace(day=1)
+        statements = []
+        partitioned = self._is_partitioned() if connection.vendor == 'postgresql' else False
+        if opts['convert'] and not partitioned:
+            # прежняя таблица покрывает все до начала следующего месяца (включая текущий)
+            first = _add_months(current, 1)
+            statements += convert_sql(first)
+        elif partitioned:
+            first = max(current, self._covered_until() or current)
+        else:
+            raise CommandError(f'{TABLE} не секционирована; запустите с --convert.')
+        statements += [create_partition_sql(_add_months(first, i)) for i in range(opts['ahead'] + 1)]
+        if opts['drop_before']:
+            try:
+                year, month = (int(p) for p in opts['drop_before'].split('-'))
+                boundary = date(year, month, 1)
+            except ValueError:
+                raise CommandError('--drop-before ожидает формат YYYY-MM')
+            statements += [f'DROP TABLE IF EXISTS {name}' for name in self._partitions_before(boundary)]
+
+        if opts['dry_run']:
+            for sql in statements:
+                self.stdout.write(sql + ';')
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(f'Выполнено команд: {len(statements)}'))
+
+    def _is_partitioned(self) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s',
+                [TABLE],
+            )
+            return cursor.fetchone() is not None
+
+    def _bounds(self) -> list:
+        """[(имя секции, выражение границ)] секций таблицы."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s',
+                [TABLE],
+            )
+            return cursor.fetchall()
+
+    def _covered_until(self):
+        """Верхняя граница секций, не являющихся помесячными (бывшая таблица)."""
+        upper = None
+        for name, bound in self._bounds():
+            match = _UPPER_RE.search(bound or '')
+            if match and not _PARTITION_RE.match(name):
+                value = date.fromisoformat(match.group(1))
+                upper = value if upper is None else max(upper, value)
+        return upper
+
+    def _partitions_before(self, boundary: date) -> list:
+        if connection.vendor != 'postgresql':
+            return []
+        result = []
+        for name, _bound in self._bounds():
+            match = _PARTITION_RE.match(name)
+            if match and _add_months(date(int(match.group(1)), int(match.group(2)), 1), 1) <= boundary:
+                result.append(name)
+        return sorted(result)
@@ -0,0 +1,117 @@
+"""Бенчмарк объектного скоупинга.
+
+Создает синтетические данные внутри транзакции (которая в конце откатывается),
+печатает планы запросов (EXPLAIN) и время выполнения для прежней стратегии
+(материализованные списки ID + JOIN + DISTINCT) и текущей (scope_qs_to_user).
+
+Пример:
+    python manage.py bench_scoping --orgs 3 --objects 10000 --assigned 500
+"""
+from __future__ import annotations
+
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from core.services.principal import get_principal
+from core.services.scope_cache import invalidate_scope
+from core.services.scoping import scope_qs_to_user
+from issues.models import Remark
+from objects.models import ConstructionObject, ObjectAssignment
+from orgs.models import Membership, Organization
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_scope(qs, user):
+    """Прежняя реализация scope_qs_to_user — только для сравнения."""
+    principal = get_principal(user)
+    names = {f.name for f in qs.model._meta.fields}
+    q = Q()
+    if 'org' in names:
+        q |= Q(org_id__in=set(principal.org_ids))
+    if 'object' in names:
+        obj_ids = set(principal.object_ids)
+        if obj_ids:
+            q |= Q(object_id__in=obj_ids)
+        org_ids = set(principal.org_ids)
+        if org_ids:
+            q |= Q(object__org_id__in=org_ids)
+    return qs.filter(q).distinct()
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает планы и время запросов скоупинга на синтетических данных (транзакция откатывается).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orgs', type=int, default=3, help='Организаций пользователя')
+        parser.add_argument('--foreign-orgs', type=int, default=3, help='Чужих организаций')
+        parser.add_argument('--objects', type=int, default=10000, help='Объектов на организацию')
+        parser.add_argument('--remarks', type=int, default=2, help='Нарушений на объект')
+        parser.add_argument('--assigned', type=int, default=500, help='Прямых назначений в чужих организациях')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--no-explain', action='store_true')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS('Синтетические данные откатаны.'))
+
+    def _run(self, opts):
+        started = time.perf_counter()
+        user = User.objects.create_user(username=f'bench-scope-{time.time_ns()}')
+        own_objects, foreign_objects = [], []
+        for i in range(opts['orgs'] + opts['foreign_orgs']):
+            org = Organization.objects.create(name=f'bench-scope-org-{time.time_ns()}-{i}')
+            own = i < opts['orgs']
+            if own:
+                Membership.objects.create(org=org, user=user, role='FOREMAN')
+            batch = [
+                ConstructionObject(org=org, name=f'bench-{i}-{n}', polygon=POLYGON)
+                for n in range(opts['objects'])
+            ]
+            ConstructionObject.objects.bulk_create(batch, batch_size=1000)
+            (own_objects if own else foreign_objects).extend(batch)
+        ObjectAssignment.objects.bulk_create(
+            [ObjectAssignment(object=o, user=user, role='FOREMAN') for o in foreign_objects[:opts['assigned']]],
+            batch_size=1000,
+        )
+        Remark.objects.bulk_create(
+            [Remark(object=o) for o in own_objects + foreign_objects for _ in range(opts['remarks'])],
+            batch_size=2000,
+        )
+        invalidate_scope(user.pk)
+        user = User.objects.get(pk=user.pk)
+        self.stdout.write(f'Данные: {ConstructionObject.objects.count()} объектов, '
+                          f'{Remark.objects.count()} нарушений, подготовка {time.perf_counter() - started:.1f}s')
+
+        for model in (ConstructionObject, Remark):
+            for label, scope in (('legacy', legacy_scope), ('subquery', scope_qs_to_user)):
+                qs = scope(model.objects.all(), user)
+                if not opts['no_explain']:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'{model.__name__} / {label}: EXPLAIN'))
+                    self.stdout.write(qs.explain())
+                timings, rows = [], 0
+                for _ in range(opts['repeat']):
+                    t0 = time.perf_counter()
+                    rows = len(list(qs.values_list('pk', flat=True)))
+                    timings.append((time.perf_counter() - t0) * 1000)
+                t0 = time.perf_counter()
+                count = qs.count()
+                count_ms = (time.perf_counter() - t0) * 1000
+                self.stdout.write(
+                    f'{model.__name__:<20} {label:<9} rows={rows:<7} count={count:<7} '
+                    f'median={statistics.median(timings):8.2f}ms min={min(timings):8.2f}ms count()={count_ms:8.2f}ms '
+                    f'sql={len(str(qs.query))}B'
+                )
@@ -0,0 +1,28 @@
+"""Автозакрытие зависших инспекционных визитов.
+
+Закрывает открытые визиты (ended_at IS NULL), начатые раньше чем --hours
+часов назад (по умолчанию INSPECTION_VISIT_MAX_HOURS), и сбрасывает их
+записи в реестре активных визитов. Запускать по расписанию (cron).
+
+Пример:
+    python manage.py close_stale_visits --hours 12
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from inspections.services import close_stale_visits
+
+
+class Command(BaseCommand):
+    help = 'Закрывает открытые инспекционные визиты старше заданного возраста.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=None, help='Максимальная длительность визита, ч')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        max_age = timedelta(hours=opts['hours']) if opts['hours'] is not None else None
+        closed = close_stale_visits(max_age)
+        self.stdout.write(self.style.SUCCESS(f'Закрыто визитов: {closed}'))
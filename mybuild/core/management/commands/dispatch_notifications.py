@@ -0,0 +1,39 @@
+"""Диспетчер исходящих уведомлений (notifications.NotificationOutbox).
+
+Забирает пачки созревших событий (SELECT ... FOR UPDATE SKIP LOCKED — можно
+запускать несколько процессов), склеивает серии и рассылает по
+NOTIFICATION_BACKENDS. Нужен при NOTIFICATION_DISPATCH=worker; в режиме
+inline с --once дочищает то, что не успело уйти после коммита.
+
+Пример:
+    python manage.py dispatch_notifications --batch-size 200 --interval 2
+    python manage.py dispatch_notifications --once
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatcher import DEFAULT_BATCH_SIZE, dispatch_batch, drain
+
+
+class Command(BaseCommand):
+    help = 'Рассылает уведомления из outbox по backend\'ам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Событий в одной пачке')
+        parser.add_argument('--interval', type=float, default=1.0, help='Пауза при пустой очереди, сек.')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь и завершиться')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        if opts['once']:
+            done = drain(opts['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Обработано событий: {done}'))
+            return
+        try:
+            while True:
+                if not dispatch_batch(opts['batch_size']):
+                    time.sleep(opts['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено')
@@ -0,0 +1,48 @@
+"""Диагностика: выводит скомпилированную матрицу прав.
+
+Для каждого viewset'а роутера печатает роли по действиям (role_map) и
+права модели (add/change/delete) с группами MODEL_PERMS_MAP, которые
+проходят по быстрому пути без user.has_perm.
+
+Пример:
+    python manage.py dump_permission_matrix
+    python manage.py dump_permission_matrix --json
+"""
+from __future__ import annotations
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.services.permission_matrix import get_permission_matrix
+
+
+class Command(BaseCommand):
+    help = 'Выводит скомпилированную матрицу прав (role_map + MODEL_PERMS_MAP).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Вывод в JSON')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        data = []
+        for _view_cls, rules in get_permission_matrix():
+            data.append({
+                'viewset': rules.name,
+                'model': rules.model_label,
+                'role_map': {action: sorted(roles) for action, roles in sorted(rules.role_map.items())},
+                'model_perms': {
+                    kind: {'perm': rule.perm, 'groups': sorted(rule.groups)}
+                    for kind, rule in rules.model_perms.items()
+                },
+            })
+        if opts['json']:
+            self.stdout.write(json.dumps(data, ensure_ascii=False, indent=2))
+            return
+        for row in data:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{row['viewset']} ({row['model'] or '-'})"))
+            if row['role_map']:
+                for action, roles in row['role_map'].items():
+                    self.stdout.write(f"  role   {action:<20} {', '.join(roles) or '(любой)'}")
+            else:
+                for kind, rule in row['model_perms'].items():
+                    self.stdout.write(f"  perm   {kind:<20} {rule['perm']:<40} {', '.join(rule['groups']) or '(has_perm)'}")
@@ -0,0 +1,40 @@
+"""Сверка и перестроение счетчиков объектов (objects.models.ObjectStats).
+
+Счетчики поддерживаются сигналами; изменения в обход моделей (QuerySet.update,
+сырой SQL, загрузка дампов) они не видят, а параллельные переходы одной строки
+из статуса могут применить дельту дважды (objects.services.stats). --verify сравнивает таблицу с
+данными и завершается ошибкой при расхождениях, --rebuild пересчитывает
+строки заново. Без флагов выполняется --verify.
+
+Пример:
+    python manage.py object_stats --verify
+    python manage.py object_stats --rebuild --object <uuid>
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from objects.services.stats import rebuild_stats, verify_stats
+
+
+class Command(BaseCommand):
+    help = 'Сверяет или перестраивает таблицу счетчиков объектов ObjectStats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Пересчитать счетчики из данных')
+        parser.add_argument('--verify', action='store_true', help='Сверить счетчики с данными')
+        parser.add_argument('--object', action='append', dest='objects', default=None,
+                            help='ID объекта (можно повторять); по умолчанию все объекты')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        object_ids = opts['objects']
+        if opts['rebuild']:
+            count = rebuild_stats(object_ids)
+            self.stdout.write(self.style.SUCCESS(f'Перестроено строк: {count}'))
+        if opts['verify'] or not opts['rebuild']:
+            mismatches = verify_stats(object_ids)
+            for object_id, field, stored, actual in mismatches:
+                self.stdout.write(f'{object_id} {field}: в таблице {stored}, фактически {actual}')
+            if mismatches:
+                raise CommandError(f'Расхождений: {len(mismatches)}; исправить: object_stats --rebuild')
+            self.stdout.write(self.style.SUCCESS('Счетчики совпадают с данными'))
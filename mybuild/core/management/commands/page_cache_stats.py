@@ -0,0 +1,32 @@
+"""Попадания и промахи кеша фрагментов страниц (core.services.page_cache).
+
+Счетчики общие для всех воркеров: hit — фрагмент отдан из кеша, miss —
+построен заново, wait — запрос ждал фрагмент, который строил другой запрос.
+
+Пример:
+    python manage.py page_cache_stats
+    python manage.py page_cache_stats --reset
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.services.page_cache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики кеша фрагментов панели и списков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        for page, counts in page_cache_stats().items():
+            total = counts['hit'] + counts['miss'] + counts['wait']
+            ratio = counts['hit'] / total * 100 if total else 0
+            self.stdout.write(
+                f"{page}: hit={counts['hit']} miss={counts['miss']} wait={counts['wait']} ({ratio:.1f}% попаданий)"
+            )
+        if opts['reset']:
+            reset_page_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики обнулены'))
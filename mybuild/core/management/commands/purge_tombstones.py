@@ -0,0 +1,25 @@
+"""Очистка следов удалений ленты изменений (core.models.Tombstone).
+
+Удаляет Tombstone старше --days дней (по умолчанию SYNC_TOMBSTONE_DAYS).
+Клиент с курсором старше этого горизонта получает от /api/sync/changes/
+ответ 410 и выполняет полную синхронизацию. Запускать по расписанию (cron).
+
+Пример:
+    python manage.py purge_tombstones --days 30
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.services.changes import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие записи об удалениях для ленты изменений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Горизонт хранения, дней')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        deleted = purge_tombstones(opts['days'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
@@ -0,0 +1,56 @@
+"""Ежедневные снимки KPI объектов и организаций (dashboard.rollups).
+
+Без аргументов пишет снимки за вчерашний день из текущего состояния —
+запускать по расписанию вскоре после полуночи. --backfill-from
+восстанавливает историю по AuditLog и created_at за диапазон дней; записи
+старше AUDIT_RETENTION_DAYS читаются из архива archive_auditlog
+(AUDIT_ARCHIVE_DIR), поэтому файлы архива должны быть на месте — без них
+статусы до горизонта горячей таблицы берутся текущими. Повторный запуск
+за тот же день перезаписывает его снимки.
+
+Пример:
+    python manage.py rollup_kpis
+    python manage.py rollup_kpis --date 2025-03-01
+    python manage.py rollup_kpis --backfill-from 2024-10-01 --backfill-to 2025-09-30
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.rollups import backfill, rollup_day
+
+
+def _date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Неверная дата: {value} (ожидается YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Записывает ежедневные снимки KPI (ночное задание и восстановление истории).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='День снимка из текущего состояния (по умолчанию вчера)')
+        parser.add_argument(
+            '--backfill-from',
+            help='Первый день восстановления истории; аудит старше AUDIT_RETENTION_DAYS читается из AUDIT_ARCHIVE_DIR',
+        )
+        parser.add_argument('--backfill-to', help='Последний день восстановления (по умолчанию вчера)')
+
+    def handle(self, *args, **opts):  # type: ignore[override]
+        yesterday = timezone.now().date() - timedelta(days=1)
+        if opts['backfill_from']:
+            start = _date(opts['backfill_from'])
+            end = _date(opts['backfill_to']) if opts['backfill_to'] else yesterday
+            if start > end:
+                raise CommandError('--backfill-from позже --backfill-to')
+            written = backfill(start, end)
+            self.stdout.write(self.style.SUCCESS(f'Восстановлено дней: {(end - start).days + 1}, строк: {written}'))
+            return
+        day = _date(opts['date']) if opts['date'] else yesterday
+        written = rollup_day(day)
+        self.stdout.write(self.style.SUCCESS(f'Снимки за {day}: {written} строк'))
@@ -25,3 +25,25 @@ class OfflineFieldsMixin(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Tombstone(BaseModel):
+    """След удаленной строки для ленты изменений (core.services.changes).
+
+    Строки уже нет, поэтому скоуп (организация и объект строительства)
+    сохраняется в самой записи.
+    """
+    model = models.CharField(max_length=128)
+    object_id = models.CharField(max_length=64)
+    org_id = models.UUIDField(null=True, blank=True)
+    site_id = models.UUIDField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Удаленная запись'
+        verbose_name_plural = 'Удаленные записи'
+        indexes = [
+            models.Index(fields=['model', 'updated_at', 'id'], name='tombstone_changes_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
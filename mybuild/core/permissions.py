@@ -5,30 +5,37 @@
 """
 from __future__ import annotations
 
-from typing import Iterable, Optional
+from typing import FrozenSet, Iterable, Optional
 from django.contrib.auth.models import User
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.request import Request
 
+from core.services.geofence import object_contains
+from core.services.object_permissions import effective_roles
+from core.services.permission_matrix import model_perm_rules, rules_for_view
+from core.services.principal import get_principal
 from core.services.scoping import get_user_org_ids, get_user_object_ids
 
 
-def _get_role_for_object(user: User, obj) -> Optional[str]:  # helper
-    # Пытаемся найти роль пользователя относительно объекта
-    from objects.models import ObjectAssignment
+def _get_roles_for_object(user: User, obj) -> FrozenSet[str]:  # helper
+    # Роли пользователя относительно объекта (по активным назначениям)
     if not user.is_authenticated:
-        return None
-    if hasattr(obj, 'object'):
-        target_object = getattr(obj, 'object')
+        return frozenset()
+    if any(f.name == 'object' for f in obj._meta.fields):
+        object_id = getattr(obj, 'object_id', None)
     else:
-        target_object = obj
-    try:
-        assign = ObjectAssignment.objects.filter(
-            user=user, object=target_object, is_active=True
-        ).first()
-        return assign.role if assign else None
-    except Exception:
-        return None
+        object_id = getattr(obj, 'pk', None)
+    return get_principal(user).roles_for_object(object_id)
+
+
+def _get_org_id(obj) -> Optional[object]:
+    org_id = getattr(obj, 'org_id', None)
+    if org_id is None and hasattr(obj, 'object'):
+        try:
+            org_id = getattr(getattr(obj, 'object'), 'org_id', None)
+        except Exception:
+            org_id = None
+    return org_id
 
 
 class IsOrgMember(BasePermission):
@@ -72,8 +79,7 @@ class HasObjectRole(BasePermission):
         required = getattr(view, 'required_roles', None)
         if not required:
             return True
-        role = _get_role_for_object(request.user, obj)
-        return role in required
+        return not _get_roles_for_object(request.user, obj).isdisjoint(required)
 
 
 class StatePermission(BasePermission):
@@ -108,83 +114,49 @@ class MatrixPermission(BasePermission):
         # Для list/create у нас нет объекта — частичная проверка
         if request.method in SAFE_METHODS:
             return request.user.is_authenticated
-        # Fallback на стандартные model perms если нет role_map специфики
-        model = None
-        if hasattr(view, 'queryset') and getattr(view, 'queryset') is not None:
-            try:
-                model = view.queryset.model
-            except Exception:
-                model = None
-        if model is None:
-            try:
-                model = view.get_queryset().model  # type: ignore[attr-defined]
-            except Exception:
-                model = None
+        rules = rules_for_view(view)
         action = getattr(view, 'action', request.method.lower())
-        role_map = getattr(view, 'role_map', {})
         # Если есть role_map, используем только role-based проверку, игнорируя Django perms
-        if role_map:
-            required_roles = role_map.get(action)
+        if rules.role_map:
+            required_roles = rules.required_roles(action)
             if not required_roles:
                 return True
             # Нужна хотя бы одна роль на любом доступном объекте
             # (детальная проверка будет в has_object_permission)
-            from orgs.models import Membership
-            user_roles = list(Membership.objects.filter(user=request.user).values_list('role', flat=True))
-            return bool(set(required_roles) & set(user_roles)) or request.user.is_authenticated
+            user_roles = get_principal(request.user).membership_roles
+            return not user_roles.isdisjoint(required_roles) or request.user.is_authenticated
         # Fallback на стандартные model perms если нет role_map
-        if model is not None:
-            app_label = model._meta.app_label
-            model_name = model._meta.model_name
-            if request.method == 'POST':
-                # detail custom POST actions (not create) should require change_*
-                if action != 'create':
-                    needed = f'{app_label}.change_{model_name}'
-                else:
-                    needed = f'{app_label}.add_{model_name}'
-            elif request.method in ('PUT', 'PATCH'):
-                needed = f'{app_label}.change_{model_name}'
-            elif request.method == 'DELETE':
-                needed = f'{app_label}.delete_{model_name}'
-            else:
-                needed = None
-            if needed and not request.user.has_perm(needed):
-                return False
-        return True
+        model_perms = None
+        if not rules.model_perms:
+            try:
+                model_perms = model_perm_rules(view.get_queryset().model)  # type: ignore[attr-defined]
+            except Exception:
+                return True
+        rule = rules.model_rule(request.method, action, model_perms)
+        if rule is None:
+            return True
+        # Быстрый путь: группа из MODEL_PERMS_MAP, иначе полноценный has_perm
+        if get_principal(request.user).has_any_group(rule.groups):
+            return True
+        return request.user.has_perm(rule.perm)
 
     def has_object_permission(self, request: Request, view, obj) -> bool:
         if request.user.is_superuser:
             return True
         if request.method in SAFE_METHODS:
             return True
-        role_map = getattr(view, 'role_map', {})
         action = getattr(view, 'action', request.method.lower())
-        required_roles = role_map.get(action)
+        required_roles = rules_for_view(view).required_roles(action)
         if not required_roles:
             return True
-        role = _get_role_for_object(request.user, obj)
-        if role in required_roles:
-            return True
-        # Fallback: берем роли по членству в организации, если нет назначения на объект
-        org_id = getattr(obj, 'org_id', None)
-        if org_id is None and hasattr(obj, 'object'):
-            try:
-                org_id = getattr(getattr(obj, 'object'), 'org_id', None)
-            except Exception:
-                org_id = None
-        if org_id is not None:
-            try:
-                from orgs.models import Membership
-                membership_roles = set(Membership.objects.filter(user=request.user, org_id=org_id).values_list('role', flat=True))
-                if membership_roles & set(required_roles):
-                    return True
-            except Exception as e:
-                pass
-        # Additional fallback: check Django groups if no membership found
-        user_groups = set(request.user.groups.values_list('name', flat=True))
-        if user_groups & set(required_roles):
-            return True
-        return False
+        # Роли = назначения на объект ∪ членство в организации ∪ группы Django
+        # (та же логика, что и в пакетной проверке core.services.object_permissions)
+        if any(f.name == 'object' for f in obj._meta.fields):
+            object_id = getattr(obj, 'object_id', None)
+        else:
+            object_id = getattr(obj, 'pk', None)
+        roles = effective_roles(get_principal(request.user), object_id, _get_org_id(obj))
+        return not roles.isdisjoint(required_roles)
 
 
 class IsOnSite(BasePermission):
@@ -198,7 +170,7 @@ class IsOnSite(BasePermission):
         return True  # объектная проверка далее
 
     def has_object_permission(self, request: Request, view, obj) -> bool:  # type: ignore[override]
-        from inspections.models import InspectionVisit
+        from inspections.services import get_active_visit
         from objects.models import ConstructionObject
         if request.user.is_superuser:
             return True
@@ -210,49 +182,10 @@ class IsOnSite(BasePermission):
             construction_object = getattr(obj, 'object')
         if construction_object is None:
             return True  # nothing to check
-        # Active visit for user
-        visit = (
-            InspectionVisit.objects.filter(
-                object=construction_object, inspector=request.user, ended_at__isnull=True
-            )
-            .order_by('-started_at')
-            .first()
-        )
+        # Active visit for user (реестр активных визитов, без запроса при попадании в кеш)
+        visit = get_active_visit(request.user.pk, construction_object.pk)
         if not visit:
             return False
-        # If no coordinates skip geo constraint
-        if visit.latitude is None or visit.longitude is None:
-            return True
-        polygon = getattr(construction_object, 'polygon', None)
-        if not polygon:
-            return True
-        try:
-            if polygon.get('type') != 'Polygon':
-                return True
-            rings = polygon.get('coordinates') or []
-            if not rings:
-                return True
-            outer = rings[0]
-            return _point_in_polygon(visit.longitude, visit.latitude, outer)
-        except Exception:
-            return True
-
-
-def _point_in_polygon(x: float, y: float, polygon) -> bool:
-    """Ray casting algorithm for point inclusion in simple polygon.
-
-    polygon: list of [x,y]. Assumes first==last maybe; we ignore last duplicate.
-    """
-    inside = False
-    n = len(polygon)
-    if n < 3:
-        return True
-    for i in range(n - 1):
-        x1, y1 = polygon[i]
-        x2, y2 = polygon[i + 1]
-        intersects = ((y1 > y) != (y2 > y)) and (
-            x < (x2 - x1) * (y - y1) / (y2 - y1 + 1e-9) + x1
-        )
-        if intersects:
-            inside = not inside
-    return inside
+        # Геозона: скомпилированная и закешированная геометрия объекта
+        # (без координат или без валидного полигона ограничение не применяется)
+        return object_contains(construction_object, visit.longitude, visit.latitude)
@@ -0,0 +1,148 @@
+"""Лента изменений (delta sync) для офлайн-клиентов.
+
+GET /api/sync/changes/?model=<префикс роутера>&cursor=<курсор>&limit=<n>
+
+Возвращает строки модели, созданные или измененные после курсора, и
+идентификаторы удаленных (Tombstone), в порядке (updated_at, id) по
+возрастанию. Курсор — тот же непрозрачный keyset-курсор, что и в ленте
+аудита (core.services.cursors); клиент хранит next и передает его при
+следующей синхронизации. Стоимость запроса пропорциональна числу изменений,
+а не размеру данных: обе выборки идут по индексам (updated_at, id).
+
+Скоуп строк — queryset соответствующего ViewSet (ScopedQuerySetMixin,
+scope_qs_to_user), скоуп удалений — организация/объект, сохраненные в
+Tombstone в момент удаления.
+
+Ограничения:
+- строки, обновленные через QuerySet.update() без updated_at, в ленту не
+  попадают — сервисы обязаны сохранять updated_at;
+- строка, ушедшая из скоупа пользователя (смена организации), не дает
+  удаления — клиенту нужна полная пересинхронизация;
+- свежие строки (моложе SYNC_CHANGES_LAG_SECONDS) не выдаются: транзакция,
+  начавшаяся раньше, может зафиксировать строку с меньшим updated_at уже
+  после того, как курсор ушел вперед;
+- удаления хранятся SYNC_TOMBSTONE_DAYS дней (команда purge_tombstones);
+  курсор старше горизонта получает ошибку и должен начать с нуля.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.services.cursors import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from core.services.principal import get_principal
+
+# Префиксы роутера core.api, доступные в ленте
+FEED_PREFIXES = ('objects', 'deliveries', 'remarks', 'violations', 'opening-checklists', 'daily-checklists')
+KEY = ('updated_at', 'id')
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+DEFAULT_LAG_SECONDS = 2
+DEFAULT_TOMBSTONE_DAYS = 30
+_NIL_ID = '00000000-0000-0000-0000-000000000000'
+
+
+class CursorExpired(Exception):
+    """Курсор старше горизонта хранения удалений."""
+
+
+def tombstone_days() -> int:
+    return getattr(settings, 'SYNC_TOMBSTONE_DAYS', DEFAULT_TOMBSTONE_DAYS)
+
+
+def _lag() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'SYNC_CHANGES_LAG_SECONDS', DEFAULT_LAG_SECONDS))
+
+
+def feed_viewsets() -> Dict[str, type]:
+    from core.api import router
+
+    return {prefix: viewset for prefix, viewset, _basename in router.registry if prefix in FEED_PREFIXES}
+
+
+def tombstone_predicate(user) -> Optional[Q]:
+    """Видимость удалений: как scope_predicate, но по сохраненным org_id/site_id."""
+    if user.is_superuser:
+        return None
+    principal = get_principal(user)
+    if principal.has_any_group(['ADMIN', 'INSPECTOR']):
+        return None
+    return Q(org_id__in=principal.org_ids) | Q(site_id__in=principal.object_ids)
+
+
+def record_tombstone(instance) -> None:
+    """Пишет Tombstone удаленной строки (вызывается из post_delete)."""
+    from core.models import Tombstone
+    from objects.models import ConstructionObject
+
+    if isinstance(instance, ConstructionObject):
+        org_id, site_id = instance.org_id, instance.pk
+    else:
+        site_id = getattr(instance, 'object_id', None)
+        # при каскадном удалении объекта дочерние строки удаляются раньше него
+        org_id = ConstructionObject.objects.filter(pk=site_id).values_list('org_id', flat=True).first() if site_id else None
+    Tombstone.objects.create(model=instance._meta.label_lower, object_id=str(instance.pk), org_id=org_id, site_id=site_id)
+
+
+def purge_tombstones(days: Optional[int] = None) -> int:
+    from core.models import Tombstone
+
+    cutoff = timezone.now() - timedelta(days=tombstone_days() if days is None else days)
+    deleted, _ = Tombstone.objects.filter(updated_at__lt=cutoff).delete()
+    return deleted
+
+
+def changes_page(request, prefix: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """Страница ленты: {'results', 'deleted', 'next', 'has_more'}."""
+    from core.models import Tombstone
+
+    viewset_cls = feed_viewsets().get(prefix)
+    if viewset_cls is None:
+        raise KeyError(prefix)
+    now = timezone.now()
+    if cursor:
+        since = decode_cursor(cursor, len(KEY))[0]
+        if not isinstance(since, datetime):
+            raise InvalidCursor('bad cursor')
+        if since < now - timedelta(days=tombstone_days()):
+            raise CursorExpired()
+
+    view = viewset_cls(request=request, action='retrieve', format_kwarg=None, kwargs={})
+    upper = now - _lag()
+    rows_qs = view.get_queryset().filter(updated_at__lt=upper)
+    rows, rows_more = keyset_page(rows_qs, KEY, cursor, limit, descending=False)
+
+    model = rows_qs.model
+    tomb_qs = Tombstone.objects.filter(model=model._meta.label_lower, updated_at__lt=upper)
+    predicate = tombstone_predicate(request.user)
+    if predicate is not None:
+        tomb_qs = tomb_qs.filter(predicate)
+    tombs, tombs_more = keyset_page(tomb_qs.only('id', 'updated_at', 'object_id'), KEY, cursor, limit, descending=False)
+
+    # Слияние двух упорядоченных потоков; в страницу — первые limit по ключу
+    merged = sorted(
+        [(r.updated_at, str(r.pk), r) for r in rows] + [(t.updated_at, str(t.pk), t) for t in tombs],
+        key=lambda item: item[:2],
+    )
+    page = merged[:limit]
+    has_more = len(merged) > limit or rows_more is not None or tombs_more is not None
+    live = [item[2] for item in page if not isinstance(item[2], Tombstone)]
+    deleted = [item[2].object_id for item in page if isinstance(item[2], Tombstone)]
+    serializer = view.get_serializer_class()(live, many=True, context={'request': request, 'view': view})
+    if has_more:
+        next_cursor = encode_cursor(page[-1][:2])
+    else:
+        # все, что старше upper, выдано — курсор сдвигается к upper даже без изменений,
+        # чтобы редко меняющаяся модель не упиралась в горизонт удалений
+        next_cursor = encode_cursor([upper, _NIL_ID])
+    return {'results': serializer.data, 'deleted': deleted, 'next': next_cursor, 'has_more': has_more}
+
+
+__all__ = [
+    'changes_page', 'record_tombstone', 'purge_tombstones', 'feed_viewsets', 'tombstone_predicate',
+    'tombstone_days', 'CursorExpired', 'FEED_PREFIXES',
+]
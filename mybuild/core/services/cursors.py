@@ -0,0 +1,83 @@
+"""Keyset (seek) пагинация по составному ключу.
+
+Курсор — непрозрачная base64-строка с последним ключом страницы, например
+(created_at, id). Следующая страница выбирается условием
+«ключ строго меньше/больше курсора» по тому же составному индексу, поэтому
+стоимость страницы не зависит от ее номера (в отличие от OFFSET).
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return str(value) if value is not None and not isinstance(value, (int, float, str)) else value
+
+
+def _load(value: Any) -> Any:
+    if isinstance(value, dict) and 'dt' in value:
+        parsed = parse_datetime(value['dt'])
+        if parsed is None:
+            raise InvalidCursor('bad datetime')
+        return parsed
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_dump(v) for v in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[Any, ...]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('bad cursor size')
+    return tuple(_load(v) for v in values)
+
+
+def seek_q(fields: Sequence[str], values: Sequence[Any], descending: bool) -> Q:
+    """Условие «(f1, f2, ...) < / > (v1, v2, ...)» в лексикографическом порядке."""
+    op = 'lt' if descending else 'gt'
+    q = Q()
+    for i, field in enumerate(fields):
+        part = Q(**{f'{field}__{op}': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            part &= Q(**{prev_field: prev_value})
+        q |= part
+    return q
+
+
+def keyset_page(qs: QuerySet, fields: Sequence[str], cursor: Optional[str], limit: int,
+                descending: bool = True) -> Tuple[list, Optional[str]]:
+    """Страница qs по ключу fields; возвращает (строки, курсор следующей страницы или None)."""
+    if cursor:
+        qs = qs.filter(seek_q(fields, decode_cursor(cursor, len(fields)), descending))
+    order = [f'-{f}' if descending else f for f in fields]
+    rows = list(qs.order_by(*order)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        get = (lambda r, f: r[f]) if isinstance(last, dict) else getattr
+        next_cursor = encode_cursor([get(last, f) for f in fields])
+    return rows, next_cursor
+
+
+__all__ = ['InvalidCursor', 'encode_cursor', 'decode_cursor', 'seek_q', 'keyset_page']
@@ -0,0 +1,237 @@
+"""Геозоны объектов: компиляция полигонов и проверка попадания точек.
+
+ConstructionObject.polygon хранится как JSON и раньше разбирался на каждой
+проверке IsOnSite. Здесь полигон один раз компилируется в CompiledGeometry
+(bbox, кольца с дырами, MultiPolygon) и кешируется в процессе по ключу
+(object id, updated_at) — изменение объекта автоматически дает новый ключ.
+
+Поддерживаемые форматы polygon:
+- GeoJSON Polygon / MultiPolygon (и Feature с такой геометрией), координаты [lon, lat];
+- «плоский» массив точек [[lat, lng], ...] — формат веб-формы объекта.
+
+Вырожденные/нераспознанные полигоны компилируются в None: проверка геозоны для
+них не выполняется (как и раньше — такие объекты не блокируют визит).
+
+Пакетный API (contains_many, locate_points) при наличии NumPy работает
+векторно по точкам; без NumPy используется чистый Python с тем же результатом.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+try:  # NumPy опционален: без него пакетные проверки идут по точкам
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+Point = Tuple[float, float]
+Ring = Tuple[Point, ...]
+BBox = Tuple[float, float, float, float]
+
+GEOMETRY_CACHE_SIZE = 2048
+
+
+@dataclass(frozen=True)
+class CompiledPolygon:
+    outer: Ring
+    holes: Tuple[Ring, ...]
+    bbox: BBox
+    arrays: Optional[tuple] = None  # массивы NumPy (n, 2) для outer + holes
+
+
+@dataclass(frozen=True)
+class CompiledGeometry:
+    polygons: Tuple[CompiledPolygon, ...]
+    bbox: BBox
+
+    def contains(self, x: float, y: float) -> bool:
+        return contains(self, x, y)
+
+
+# ---------- компиляция ----------
+def _ring(coords, swap: bool = False) -> Optional[Ring]:
+    points: List[Point] = []
+    for pt in coords or ():
+        if not isinstance(pt, (list, tuple)) or len(pt) < 2:
+            return None
+        try:
+            a, b = float(pt[0]), float(pt[1])
+        except (TypeError, ValueError):
+            return None
+        points.append((b, a) if swap else (a, b))
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(set(points)) < 3:
+        return None
+    return tuple(points)
+
+
+def _bbox(ring: Ring) -> BBox:
+    xs = [p[0] for p in ring]
+    ys = [p[1] for p in ring]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _polygon(rings_coords, swap: bool = False) -> Optional[CompiledPolygon]:
+    if not rings_coords:
+        return None
+    outer = _ring(rings_coords[0], swap)
+    if outer is None:
+        return None
+    holes = tuple(h for h in (_ring(r, swap) for r in rings_coords[1:]) if h is not None)
+    arrays = None
+    if np is not None:
+        arrays = tuple(np.asarray(r, dtype=float) for r in (outer,) + holes)
+    return CompiledPolygon(outer=outer, holes=holes, bbox=_bbox(outer), arrays=arrays)
+
+
+def compile_geometry(data) -> Optional[CompiledGeometry]:
+    """Компилирует JSON полигона; None — если геозону проверить нельзя."""
+    if isinstance(data, dict) and data.get('type') == 'Feature':
+        data = data.get('geometry')
+    polygons: List[Optional[CompiledPolygon]] = []
+    if isinstance(data, dict):
+        kind = data.get('type')
+        coords = data.get('coordinates') or []
+        if kind == 'Polygon':
+            polygons = [_polygon(coords)]
+        elif kind == 'MultiPolygon':
+            polygons = [_polygon(p) for p in coords]
+    elif isinstance(data, list) and data and isinstance(data[0], (list, tuple)) and data[0] \
+            and not isinstance(data[0][0], (list, tuple)):
+        # формат веб-формы: [[lat, lng], ...]
+        polygons = [_polygon([data], swap=True)]
+    compiled = tuple(p for p in polygons if p is not None)
+    if not compiled:
+        return None
+    bbox = (
+        min(p.bbox[0] for p in compiled),
+        min(p.bbox[1] for p in compiled),
+        max(p.bbox[2] for p in compiled),
+        max(p.bbox[3] for p in compiled),
+    )
+    return CompiledGeometry(polygons=compiled, bbox=bbox)
+
+
+# ---------- кеш ----------
+_cache: 'OrderedDict[Tuple[Hashable, object], Optional[CompiledGeometry]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_geometry(obj) -> Optional[CompiledGeometry]:
+    """Скомпилированная геозона объекта (кеш по (id, updated_at))."""
+    key = (obj.pk, getattr(obj, 'updated_at', None))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    geometry = compile_geometry(getattr(obj, 'polygon', None))
+    with _cache_lock:
+        _cache[key] = geometry
+        while len(_cache) > GEOMETRY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return geometry
+
+
+def clear_geometry_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+# ---------- проверка одной точки ----------
+def _in_bbox(bbox: BBox, x: float, y: float) -> bool:
+    return bbox[0] <= x <= bbox[2] and bbox[1] <= y <= bbox[3]
+
+
+def _in_ring(ring: Ring, x: float, y: float) -> bool:
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _in_polygon(poly: CompiledPolygon, x: float, y: float) -> bool:
+    if not _in_bbox(poly.bbox, x, y) or not _in_ring(poly.outer, x, y):
+        return False
+    return not any(_in_ring(h, x, y) for h in poly.holes)
+
+
+def contains(geometry: CompiledGeometry, x: float, y: float) -> bool:
+    """Точка (x=lon, y=lat) внутри геозоны (с учетом дыр и мультиполигонов)."""
+    if not _in_bbox(geometry.bbox, x, y):
+        return False
+    return any(_in_polygon(p, x, y) for p in geometry.polygons)
+
+
+# ---------- пакетные проверки ----------
+def _ring_mask_np(ring, xs, ys):
+    inside = np.zeros(xs.shape, dtype=bool)
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        crosses = (y1 > ys) != (y2 > ys)
+        if crosses.any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = (x2 - x1) * (ys - y1) / (y2 - y1) + x1
+            inside ^= crosses & (xs < x_cross)
+        x1, y1 = x2, y2
+    return inside
+
+
+def _contains_many_np(geometry: CompiledGeometry, xs, ys):
+    result = np.zeros(xs.shape, dtype=bool)
+    b = geometry.bbox
+    candidates = (xs >= b[0]) & (xs <= b[2]) & (ys >= b[1]) & (ys <= b[3])
+    for poly in geometry.polygons:
+        pb = poly.bbox
+        idx = np.nonzero(candidates & ~result & (xs >= pb[0]) & (xs <= pb[2]) & (ys >= pb[1]) & (ys <= pb[3]))[0]
+        if not idx.size:
+            continue
+        px, py = xs[idx], ys[idx]
+        mask = _ring_mask_np(poly.arrays[0], px, py)
+        for hole in poly.arrays[1:]:
+            mask &= ~_ring_mask_np(hole, px, py)
+        result[idx[mask]] = True
+    return result
+
+
+def contains_many(geometry: CompiledGeometry, points: Sequence[Point]) -> List[bool]:
+    """Для каждой точки (lon, lat) — попадает ли она в геозону."""
+    if not points:
+        return []
+    if np is not None and geometry.polygons[0].arrays is not None:
+        arr = np.asarray(points, dtype=float).reshape(-1, 2)
+        return _contains_many_np(geometry, arr[:, 0], arr[:, 1]).tolist()
+    return [contains(geometry, x, y) for x, y in points]
+
+
+def locate_points(geometries: Mapping[Hashable, Optional[CompiledGeometry]], points: Sequence[Point]) -> Dict[Hashable, List[bool]]:
+    """Пакетная проверка многих точек против многих геозон: {ключ: маска по точкам}.
+
+    Геозоны None (не проверяются) в результат не попадают.
+    """
+    return {key: contains_many(geom, points) for key, geom in geometries.items() if geom is not None}
+
+
+def object_contains(obj, lon: Optional[float], lat: Optional[float]) -> bool:
+    """Проверка точки против геозоны объекта.
+
+    Нет координат или геозоны — True (проверять нечего), как в прежнем IsOnSite.
+    """
+    if lon is None or lat is None:
+        return True
+    geometry = get_geometry(obj)
+    if geometry is None:
+        return True
+    return contains(geometry, float(lon), float(lat))
+
+
+__all__ = [
+    'CompiledGeometry', 'CompiledPolygon', 'compile_geometry', 'get_geometry', 'clear_geometry_cache',
+    'contains', 'contains_many', 'locate_points', 'object_contains',
+]
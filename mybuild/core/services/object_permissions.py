@@ -0,0 +1,157 @@
+"""Пакетная проверка объектных прав по role_map.
+
+MatrixPermission.has_object_permission проверяет один объект за раз. Здесь та же
+логика применяется к списку экземпляров или к queryset целиком:
+
+- роли пользователя относительно строки = роли назначения на объект
+  ∪ роли членства в организации владельца ∪ группы Django;
+- действие разрешено, если role_map[action] пересекается с этими ролями
+  (действия без записи в role_map не ограничены на уровне объекта).
+
+Все факты о пользователе берутся из Principal, поэтому для списка экземпляров
+нужен максимум один запрос (org_id объектов, если они не подгружены через
+select_related), а для queryset — ни одного: возвращается отфильтрованный queryset.
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from django.db.models import Q, QuerySet
+
+from core.services.principal import get_principal
+
+RoleMap = Mapping[str, Iterable[str]]
+
+
+def _model_kind(model) -> str:
+    from objects.models import ConstructionObject
+
+    if issubclass(model, ConstructionObject):
+        return 'construction_object'
+    names = {f.name for f in model._meta.fields}
+    if 'object' in names:
+        return 'object'
+    if 'org' in names:
+        return 'org'
+    return 'none'
+
+
+def effective_roles(principal, object_id, org_id) -> FrozenSet[str]:
+    """Роли пользователя относительно строки (см. docstring модуля)."""
+    roles = principal.group_names
+    if object_id is not None:
+        roles = roles | principal.roles_for_object(object_id)
+    if org_id is not None:
+        roles = roles | principal.roles_for_org(org_id)
+    return roles
+
+
+def _resolve_targets(objs: Sequence) -> List[Tuple[object, object]]:
+    """(object_id, org_id) для каждого экземпляра; не более одного запроса на весь список."""
+    if not objs:
+        return []
+    kind = _model_kind(type(objs[0]))
+    if kind == 'construction_object':
+        return [(o.pk, o.org_id) for o in objs]
+    if kind == 'org':
+        return [(None, o.org_id) for o in objs]
+    if kind == 'none':
+        return [(None, None) for _ in objs]
+    field = type(objs[0])._meta.get_field('object')
+    missing = {o.object_id for o in objs if o.object_id is not None and not field.is_cached(o)}
+    org_by_object = {}
+    if missing:
+        from objects.models import ConstructionObject
+
+        org_by_object = dict(ConstructionObject.objects.filter(pk__in=missing).values_list('pk', 'org_id'))
+    targets = []
+    for o in objs:
+        if field.is_cached(o):
+            org_id = o.object.org_id if o.object is not None else None
+        else:
+            org_id = org_by_object.get(o.object_id)
+        targets.append((o.object_id, org_id))
+    return targets
+
+
+def object_permission_map(user, objs: Iterable, actions: Iterable[str], role_map: RoleMap) -> Dict[object, FrozenSet[str]]:
+    """{pk: разрешенные действия} для списка экземпляров одной модели."""
+    objs = list(objs)
+    actions = list(actions)
+    if getattr(user, 'is_superuser', False):
+        return {o.pk: frozenset(actions) for o in objs}
+    principal = get_principal(user)
+    required = {a: frozenset(role_map.get(a) or ()) for a in actions}
+    result: Dict[object, FrozenSet[str]] = {}
+    for obj, (object_id, org_id) in zip(objs, _resolve_targets(objs)):
+        roles = effective_roles(principal, object_id, org_id)
+        result[obj.pk] = frozenset(a for a, req in required.items() if not req or not roles.isdisjoint(req))
+    return result
+
+
+def _granting_q(principal, model, required: FrozenSet[str]) -> Optional[Q]:
+    """Предикат строк, на которых пользователь имеет одну из required ролей (None — все строки)."""
+    if not principal.group_names.isdisjoint(required):
+        return None
+    object_ids = [oid for oid, roles in principal.object_roles.items() if not roles.isdisjoint(required)]
+    org_ids = [oid for oid, roles in principal.org_roles.items() if not roles.isdisjoint(required)]
+    kind = _model_kind(model)
+    q = Q(pk__in=[])
+    if kind == 'construction_object':
+        q = Q(pk__in=object_ids) | Q(org_id__in=org_ids)
+    elif kind == 'org':
+        q = Q(org_id__in=org_ids)
+    elif kind == 'object':
+        from objects.models import ConstructionObject
+
+        q = Q(object_id__in=object_ids)
+        if org_ids:
+            q |= Q(object_id__in=ConstructionObject.objects.filter(org_id__in=org_ids).values('pk'))
+    return q
+
+
+def filter_allowed(user, action: str, objs, role_map: RoleMap):
+    """Разрешенное подмножество: queryset -> отфильтрованный queryset (без запросов), список -> список."""
+    required = frozenset(role_map.get(action) or ())
+    if not required or getattr(user, 'is_superuser', False):
+        return objs
+    if isinstance(objs, QuerySet):
+        q = _granting_q(get_principal(user), objs.model, required)
+        return objs if q is None else objs.filter(q)
+    allowed = object_permission_map(user, objs, [action], role_map)
+    return [o for o in objs if action in allowed[o.pk]]
+
+
+class AllowedActionsMixin:
+    """Mixin для ViewSet: добавляет в ответ list поле allowed_actions для каждой строки.
+
+    Кандидаты — detail-действия viewset'а из role_map (update/partial_update/destroy
+    и кастомные @action(detail=True)). Проверка выполняется пакетно для всей страницы.
+    """
+
+    allowed_actions_field = 'allowed_actions'
+
+    def get_allowed_action_candidates(self) -> List[str]:
+        role_map = getattr(self, 'role_map', {}) or {}
+        detail_actions = {'update', 'partial_update', 'destroy'}
+        detail_actions.update(a.__name__ for a in self.get_extra_actions() if a.detail)  # type: ignore[attr-defined]
+        return [a for a in role_map if a in detail_actions]
+
+    def list(self, request, *args, **kwargs):  # type: ignore[override]
+        from rest_framework.response import Response
+
+        queryset = self.filter_queryset(self.get_queryset())  # type: ignore[attr-defined]
+        page = self.paginate_queryset(queryset)  # type: ignore[attr-defined]
+        items = list(page if page is not None else queryset)
+        data = self.get_serializer(items, many=True).data  # type: ignore[attr-defined]
+        perm_map = object_permission_map(
+            request.user, items, self.get_allowed_action_candidates(), getattr(self, 'role_map', {}) or {}
+        )
+        for item, row in zip(items, data):
+            row[self.allowed_actions_field] = sorted(perm_map[item.pk])
+        if page is not None:
+            return self.get_paginated_response(data)  # type: ignore[attr-defined]
+        return Response(data)
+
+
+__all__ = ['effective_roles', 'object_permission_map', 'filter_allowed', 'AllowedActionsMixin']
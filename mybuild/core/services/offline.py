@@ -1,13 +1,57 @@
 """Offline idempotency utilities.
 
-create_or_get_offline(model, defaults, offline_batch_id, user?) will return existing
-row with same offline_batch_id (and optionally same creator) for models using OfflineFieldsMixin.
+Every OfflineFieldsMixin model carries a conditional unique constraint on
+(offline_batch_id, <author field>) — the author field of each model is
+declared once, in core.services.sync.SYNC_KINDS. Idempotent creation relies
+on it instead of a SELECT-then-INSERT:
+
+    INSERT ... ON CONFLICT DO NOTHING      (PostgreSQL)
+    INSERT OR IGNORE ...                   (SQLite)
+
+One statement decides the race; the affected row count is the created flag.
+A first submission costs a single round trip; only a replay issues a second
+query to load the row that already exists.
+
+create_or_get_offline(model, defaults, offline_batch_id, user?) returns
+(instance, created) for models using OfflineFieldsMixin. pre_save is sent
+before the INSERT (receivers may still fill fields), so it also fires for a
+replay that ends up saving nothing; post_save is sent only for a new row.
 """
 from __future__ import annotations
 
 from typing import Type, Tuple, Dict, Any, Optional
-from django.db import transaction
-from django.db.models import Model, QuerySet
+from django.db import connections, router
+from django.db.models import Model, sql
+from django.db.models.constants import OnConflict
+from django.db.models.signals import post_save, pre_save
+
+
+def insert_ignore(instance: Model, using: Optional[str] = None) -> bool:
+    """INSERT, пропускаемый при нарушении уникальности; True — строка вставлена.
+
+    Сигналы не отправляются (это делает вызывающий код).
+    """
+    model = type(instance)
+    using = using or router.db_for_write(model, instance=instance)
+    fields = [f for f in model._meta.local_concrete_fields if not f.generated]
+    query = sql.InsertQuery(model, on_conflict=OnConflict.IGNORE)
+    query.insert_values(fields, [instance])
+    inserted = 0
+    with connections[using].cursor() as cursor:
+        for statement, params in query.get_compiler(using=using).as_sql():
+            cursor.execute(statement, params)
+            inserted += max(cursor.rowcount, 0)
+    if inserted:
+        instance._state.adding = False
+        instance._state.db = using
+    return bool(inserted)
+
+
+def _lookup(model: Type[Model], offline_batch_id: str, user_field: Optional[str], user) -> Optional[Model]:
+    filters = {'offline_batch_id': offline_batch_id}
+    if user_field:
+        filters[user_field] = user
+    return model._default_manager.filter(**filters).first()
 
 
 def create_or_get_offline(
@@ -23,21 +67,35 @@ def create_or_get_offline(
 
     Returns (instance, created_flag).
     If offline_batch_id is empty -> normal create path (created=True).
+    Many-to-many values in defaults are assigned after a successful insert.
     """
+    m2m = {f.name: defaults[f.name] for f in model._meta.many_to_many if f.name in defaults}
+    values = {k: v for k, v in defaults.items() if k not in m2m}
     if not offline_batch_id:
-        obj = model.objects.create(**defaults)
-        return obj, True
-
-    filters = {'offline_batch_id': offline_batch_id}
-    if unique_with_user and user_field and user and hasattr(model, user_field):
-        filters[user_field] = user
-
-    with transaction.atomic():
-        existing = model.objects.filter(**filters).first()
-        if existing:
-            return existing, False
-        obj = model.objects.create(**defaults)
-        return obj, True
+        obj = model.objects.create(**values)
+        created = True
+    else:
+        if not (unique_with_user and user_field and user and hasattr(model, user_field)):
+            user_field = None
+        obj = model(**values)
+        using = router.db_for_write(model, instance=obj)
+        pre_save.send(sender=model, instance=obj, raw=False, using=using, update_fields=None)
+        created = insert_ignore(obj, using=using)
+        if created:
+            post_save.send(sender=model, instance=obj, created=True, update_fields=None, raw=False, using=using)
+        else:
+            existing = _lookup(model, offline_batch_id, user_field, user)
+            if existing is None:
+                # строку отбросило не ограничение уникальности batch id (SQLite IGNORE
+                # срабатывает и на NOT NULL/CHECK) — обычный INSERT поднимет настоящую
+                # ошибку, а если конфликтующую строку успели удалить, просто вставит
+                obj.save(force_insert=True, using=using)
+                created = True
+            else:
+                return existing, False
+    for name, value in m2m.items():
+        getattr(obj, name).set(value)
+    return obj, created
 
 
-__all__ = ['create_or_get_offline']
+__all__ = ['create_or_get_offline', 'insert_ignore']
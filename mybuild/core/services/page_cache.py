@@ -0,0 +1,178 @@
+"""Кеш HTML-фрагментов панели и страниц-списков.
+
+Фрагмент страницы (блок content шаблона, тег {% page_fragment %} из
+core.templatetags.page_cache) хранится в общем кеше под ключом из:
+
+- имени страницы и параметров запроса (vary);
+- пользователя и версии его скоупа (core.services.scope_cache) — меняется
+  при изменении групп, членств и назначений пользователя;
+- версий данных моделей, которые показывает страница (PAGES), — их
+  увеличивают сигналы core.signals после коммита записи.
+
+Все версии читаются одним get_many, поэтому попадание стоит два обращения
+к кешу и ни одного запроса к БД: контекст шаблона строится (build) только
+при промахе. Изменения через QuerySet.update() и сырой SQL версий не
+меняют — устаревание ограничено PAGE_CACHE_TIMEOUT.
+
+Промах защищен от «лавины» запросов: фрагмент строит только процесс,
+взявший блокировку cache.add(); остальные до PAGE_CACHE_LOCK_TIMEOUT
+секунд ждут готовый результат и лишь затем строят его сами.
+
+Тем же механизмом кешируются блоки JSON-панели (/api/dashboard/): у каждого
+блока свое имя страницы dashboard:<блок> и свой TTL.
+
+Попадания, промахи и ожидания считаются по страницам в общем кеше
+(page_cache_stats(), команда page_cache_stats).
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.services.scope_cache import scope_version_name
+from core.services.versions import bump_version, get_versions
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_LOCK_TIMEOUT = 5
+_POLL_INTERVAL = 0.05
+_KEY_PREFIX = 'page:'
+_STATS_PREFIX = 'page:stats:'
+OUTCOMES = ('hit', 'miss', 'wait')
+
+# страница -> модели, строки которых она показывает
+PAGES: Dict[str, Sequence[str]] = {
+    'dashboard': (
+        'objects.constructionobject', 'objects.openingchecklist', 'objects.dailychecklist', 'issues.remark',
+        'issues.violation', 'materials.delivery', 'materials.materialtype', 'orgs.organization',
+    ),
+    'object_list': ('objects.constructionobject', 'orgs.organization', 'issues.remark', 'issues.violation'),
+    'remarks_list': ('issues.remark', 'objects.constructionobject'),
+    'checklists_list': ('objects.openingchecklist', 'objects.constructionobject'),
+    'delivery_list': ('materials.delivery', 'materials.materialtype', 'objects.constructionobject'),
+    # блоки JSON-панели /api/dashboard/ (dashboard.services.BLOCKS)
+    'dashboard:summary': (
+        'objects.constructionobject', 'objects.openingchecklist', 'objects.dailychecklist', 'issues.remark',
+        'issues.violation',
+    ),
+    'dashboard:critical_issues': ('issues.remark', 'issues.violation', 'objects.constructionobject'),
+    'dashboard:overdue_checklists': ('objects.openingchecklist', 'objects.dailychecklist', 'objects.constructionobject'),
+    'dashboard:upcoming_inspections': ('objects.openingchecklist', 'objects.dailychecklist', 'objects.constructionobject'),
+    'dashboard:recent_deliveries': ('materials.delivery', 'materials.materialtype', 'objects.constructionobject'),
+    'dashboard:quality_progress': (
+        'objects.constructionobject', 'objects.openingchecklist', 'objects.dailychecklist', 'issues.remark',
+        'issues.violation',
+    ),
+}
+DATA_MODELS = tuple(sorted({label for labels in PAGES.values() for label in labels}))
+
+
+def data_version_name(label: str) -> str:
+    return f'data:{label}'
+
+
+def invalidate_model(label: str) -> int:
+    """Устаревают фрагменты всех страниц, показывающих модель label."""
+    return bump_version(data_version_name(label))
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _lock_timeout() -> int:
+    return getattr(settings, 'PAGE_CACHE_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+
+
+def _count(page: str, outcome: str) -> None:
+    key = f'{_STATS_PREFIX}{page}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def page_cache_stats(pages: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+    """Счетчики попаданий/промахов/ожиданий: {страница: {исход: число}}."""
+    pages = list(pages or PAGES)
+    keys = {f'{_STATS_PREFIX}{page}:{outcome}': (page, outcome) for page in pages for outcome in OUTCOMES}
+    found = cache.get_many(list(keys))
+    stats = {page: dict.fromkeys(OUTCOMES, 0) for page in pages}
+    for key, (page, outcome) in keys.items():
+        stats[page][outcome] = int(found.get(key, 0))
+    return stats
+
+
+def reset_page_cache_stats() -> None:
+    cache.delete_many([f'{_STATS_PREFIX}{page}:{outcome}' for page in PAGES for outcome in OUTCOMES])
+
+
+class PageFragment:
+    """Фрагмент страницы name для пользователя; build() возвращает контекст шаблона для промаха.
+
+    timeout — собственный TTL фрагмента вместо PAGE_CACHE_TIMEOUT (PAGE_CACHE_TIMEOUT=0
+    выключает кеш целиком).
+    """
+
+    def __init__(self, name: str, user, vary: Sequence = (), build: Optional[Callable[[], dict]] = None,
+                 timeout: Optional[int] = None) -> None:
+        self.name = name
+        self.user = user
+        self.vary = tuple(vary)
+        self.build = build or dict
+        self.timeout = timeout
+        self._key: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            names = [scope_version_name(self.user.pk)] + [data_version_name(label) for label in PAGES[self.name]]
+            versions = get_versions(names)
+            parts = (self.user.pk, self.user.is_superuser, self.vary, [versions[n] for n in names])
+            self._key = f'{_KEY_PREFIX}{self.name}:{hashlib.sha1(repr(parts).encode()).hexdigest()}'
+        return self._key
+
+    def render(self, render: Callable[[], Any]) -> Any:
+        """Значение фрагмента (HTML или JSON-данные) из кеша или render() под блокировкой single-flight."""
+        timeout = self.timeout if self.timeout is not None and _timeout() else _timeout()
+        if not timeout:
+            return render()
+        value = cache.get(self.key)
+        if value is not None:
+            _count(self.name, 'hit')
+            return value
+        lock_key = f'{self.key}:lock'
+        if cache.add(lock_key, 1, timeout=_lock_timeout()):
+            _count(self.name, 'miss')
+            try:
+                value = render()
+                cache.set(self.key, value, timeout)
+                return value
+            finally:
+                cache.delete(lock_key)
+        # фрагмент уже строит другой запрос — ждем его результат
+        _count(self.name, 'wait')
+        deadline = time.monotonic() + _lock_timeout()
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_INTERVAL)
+            value = cache.get(self.key)
+            if value is not None:
+                return value
+            if cache.get(lock_key) is None:
+                break  # строивший запрос завершился ошибкой
+        return render()
+
+
+def page_fragment(request, name: str, vary: Sequence = (), build: Optional[Callable[[], dict]] = None) -> PageFragment:
+    """Фрагмент страницы name; строка запроса всегда входит в vary."""
+    return PageFragment(name, request.user, (request.GET.urlencode(), *vary), build)
+
+
+__all__ = [
+    'PageFragment', 'page_fragment', 'page_cache_stats', 'reset_page_cache_stats', 'invalidate_model',
+    'data_version_name', 'PAGES', 'DATA_MODELS',
+]
@@ -0,0 +1,140 @@
+"""Скомпилированная матрица прав для MatrixPermission.
+
+role_map viewset'ов и core.permissions_config.MODEL_PERMS_MAP не меняются во
+время работы процесса, поэтому они один раз (при старте, см. CoreConfig.ready)
+сворачиваются в неизменяемые таблицы:
+
+- (viewset, action) -> frozenset ролей из role_map;
+- (viewset, вид операции add/change/delete) -> (строка права 'app.codename',
+  frozenset групп из MODEL_PERMS_MAP, которым это право выдано).
+
+Проверка в запросе — пересечение множеств с ролями/группами из Principal, без
+форматирования строк и без загрузки всех прав пользователя. user.has_perm
+вызывается только если групповой быстрый путь не дал ответа (права, выданные
+вручную или через группы вне матрицы).
+
+ViewSet'ы вне роутера компилируются при первом обращении и кешируются так же.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterator, Mapping, Optional, Tuple
+
+from core.permissions_config import MODEL_PERMS_MAP
+
+# Вид операции -> префикс кодового имени стандартного права Django
+_KIND_PREFIX = {'add': 'add', 'change': 'change', 'delete': 'delete'}
+_METHOD_KIND = {'PUT': 'change', 'PATCH': 'change', 'DELETE': 'delete'}
+
+
+@dataclass(frozen=True)
+class ModelPermRule:
+    perm: str  # 'app_label.codename' для user.has_perm
+    groups: FrozenSet[str]  # группы MODEL_PERMS_MAP, которым право выдано
+
+
+@dataclass(frozen=True)
+class ViewRules:
+    name: str
+    model_label: Optional[str]
+    role_map: Mapping[str, FrozenSet[str]]
+    model_perms: Mapping[str, ModelPermRule]
+
+    def required_roles(self, action: Optional[str]) -> FrozenSet[str]:
+        return self.role_map.get(action, frozenset())  # type: ignore[arg-type]
+
+    def model_rule(self, method: str, action: Optional[str], model_perms=None) -> Optional[ModelPermRule]:
+        """Право модели для запроса (как раньше: POST не-create требует change_*)."""
+        if method == 'POST':
+            kind = 'add' if action == 'create' else 'change'
+        else:
+            kind = _METHOD_KIND.get(method)
+        return (model_perms or self.model_perms).get(kind) if kind else None
+
+
+def _model_label(view_cls):
+    queryset = getattr(view_cls, 'queryset', None)
+    model = getattr(queryset, 'model', None)
+    if model is None:
+        return None, None
+    return model, model._meta.label_lower
+
+
+@lru_cache(maxsize=None)
+def model_perm_rules(model) -> Mapping[str, ModelPermRule]:
+    """Вид операции -> ModelPermRule для модели."""
+    role_perms = MODEL_PERMS_MAP.get(model._meta.label_lower, {})
+    rules: Dict[str, ModelPermRule] = {}
+    for kind, prefix in _KIND_PREFIX.items():
+        codename = f'{prefix}_{model._meta.model_name}'
+        groups = frozenset(g for g, codenames in role_perms.items() if codename in codenames)
+        rules[kind] = ModelPermRule(perm=f'{model._meta.app_label}.{codename}', groups=groups)
+    return MappingProxyType(rules)
+
+
+def compile_view(view_cls) -> ViewRules:
+    model, label = _model_label(view_cls)
+    role_map = {
+        action: frozenset(roles or ())
+        for action, roles in (getattr(view_cls, 'role_map', None) or {}).items()
+    }
+    return ViewRules(
+        name=f'{view_cls.__module__}.{view_cls.__qualname__}',
+        model_label=label,
+        role_map=MappingProxyType(role_map),
+        model_perms=model_perm_rules(model) if model is not None else MappingProxyType({}),
+    )
+
+
+class PermissionMatrix:
+    """Неизменяемая таблица ViewRules по классам viewset'ов."""
+
+    def __init__(self, view_classes=()) -> None:
+        self._rules: Dict[type, ViewRules] = {cls: compile_view(cls) for cls in view_classes}
+        self._lock = threading.Lock()
+
+    def rules_for(self, view_cls) -> ViewRules:
+        rules = self._rules.get(view_cls)
+        if rules is None:
+            with self._lock:
+                rules = self._rules.get(view_cls)
+                if rules is None:
+                    rules = compile_view(view_cls)
+                    # копия вместо мутации: читатели без блокировки видят целый словарь
+                    self._rules = {**self._rules, view_cls: rules}
+        return rules
+
+    def __iter__(self) -> Iterator[Tuple[type, ViewRules]]:
+        return iter(sorted(self._rules.items(), key=lambda item: item[1].name))
+
+
+_matrix: Optional[PermissionMatrix] = None
+_matrix_lock = threading.Lock()
+
+
+def _router_viewsets():
+    from core.api import router
+
+    return [viewset for _prefix, viewset, _basename in router.registry]
+
+
+def get_permission_matrix() -> PermissionMatrix:
+    global _matrix
+    if _matrix is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = PermissionMatrix(_router_viewsets())
+    return _matrix
+
+
+def rules_for_view(view) -> ViewRules:
+    return get_permission_matrix().rules_for(type(view))
+
+
+__all__ = [
+    'ModelPermRule', 'ViewRules', 'PermissionMatrix', 'compile_view', 'model_perm_rules',
+    'get_permission_matrix', 'rules_for_view',
+]
@@ -0,0 +1,112 @@
+"""Контекст принципала (пользователя) в рамках одного запроса.
+
+Principal лениво вычисляет и запоминает факты об идентичности пользователя:
+группы Django, членства в организациях с ролями и активные назначения на объекты.
+Скоупинг, DRF permission классы, роль-хелперы и сервисы читают эти факты
+отсюда. Сами факты берутся из общего кеша скоупа (core.services.scope_cache),
+так что в установившемся режиме запрос не делает identity-запросов к БД вовсе.
+
+Экземпляр кешируется на самом объекте пользователя (request.user создается
+заново на каждый запрос), см. get_principal().
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from django.utils.functional import cached_property
+
+_ATTR = '_principal'
+
+
+class Principal:
+    """Лениво вычисляемые факты о пользователе для проверок доступа."""
+
+    def __init__(self, user) -> None:
+        self.user = user
+
+    @property
+    def is_superuser(self) -> bool:
+        return bool(getattr(self.user, 'is_superuser', False))
+
+    @property
+    def is_authenticated(self) -> bool:
+        return bool(getattr(self.user, 'is_authenticated', False))
+
+    # ---------- raw facts ----------
+    @cached_property
+    def _snapshot(self) -> Dict[str, list]:
+        if not self.is_authenticated:
+            return {'groups': [], 'orgs': [], 'objects': []}
+        from core.services.scope_cache import get_scope_snapshot
+
+        return get_scope_snapshot(self.user.pk)
+
+    @cached_property
+    def group_names(self) -> FrozenSet[str]:
+        return frozenset(self._snapshot['groups'])
+
+    @cached_property
+    def org_roles(self) -> Dict[object, FrozenSet[str]]:
+        """org_id -> роли пользователя в организации (Membership)."""
+        return _group_roles(self._snapshot['orgs'])
+
+    @cached_property
+    def object_roles(self) -> Dict[object, FrozenSet[str]]:
+        """object_id -> роли пользователя на объекте (активные ObjectAssignment)."""
+        return _group_roles(self._snapshot['objects'])
+
+    # ---------- derived ----------
+    @property
+    def org_ids(self) -> FrozenSet[object]:
+        return frozenset(self.org_roles)
+
+    @property
+    def object_ids(self) -> FrozenSet[object]:
+        return frozenset(self.object_roles)
+
+    @cached_property
+    def membership_roles(self) -> FrozenSet[str]:
+        """Все роли пользователя по членствам во всех организациях."""
+        return frozenset().union(*self.org_roles.values()) if self.org_roles else frozenset()
+
+    def roles_for_org(self, org_id) -> FrozenSet[str]:
+        return self.org_roles.get(org_id, frozenset())
+
+    def roles_for_object(self, object_id) -> FrozenSet[str]:
+        return self.object_roles.get(object_id, frozenset())
+
+    def has_group(self, name: str) -> bool:
+        return name in self.group_names
+
+    def has_any_group(self, names: Iterable[str]) -> bool:
+        return not self.group_names.isdisjoint(names)
+
+
+def _group_roles(pairs) -> Dict[object, FrozenSet[str]]:
+    roles: Dict[object, set] = {}
+    for key, role in pairs:
+        roles.setdefault(key, set()).add(role)
+    return {key: frozenset(r) for key, r in roles.items()}
+
+
+def get_principal(user) -> Principal:
+    """Возвращает Principal, закешированный на объекте пользователя."""
+    principal: Optional[Principal] = getattr(user, _ATTR, None)
+    if principal is None:
+        principal = Principal(user)
+        try:
+            setattr(user, _ATTR, principal)
+        except AttributeError:  # pragma: no cover - объекты без __dict__
+            pass
+    return principal
+
+
+def invalidate_principal(user) -> None:
+    """Сбрасывает закешированный Principal (например, после изменения назначений в том же запросе)."""
+    try:
+        delattr(user, _ATTR)
+    except AttributeError:
+        pass
+
+
+__all__ = ['Principal', 'get_principal', 'invalidate_principal']
@@ -0,0 +1,69 @@
+"""Общий (межпроцессный) кеш скоупа пользователя.
+
+Снимок содержит группы пользователя, его членства в организациях и активные
+назначения на объекты. Снимок хранится в общем кеше (Redis в проде,
+LocMem в тестах) вместе с версией пользователя; версия увеличивается
+сигналами (см. core.signals) при изменении Membership, ObjectAssignment и
+User.groups. Читатель достает версию и снимок одним get_many и принимает
+снимок только если версии совпадают.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.services.versions import bump_version, cache_key, get_version
+
+_SNAPSHOT_PREFIX = 'scope:snap:'
+
+
+def scope_version_name(user_id) -> str:
+    """Имя счетчика версии скоупа (для ключей кешей, зависящих от скоупа)."""
+    return f'scope:user:{user_id}'
+
+
+def _snapshot_key(user_id) -> str:
+    return f'{_SNAPSHOT_PREFIX}{user_id}'
+
+
+def _build_snapshot(user_id) -> Dict[str, Any]:
+    from django.contrib.auth.models import Group
+    from orgs.models import Membership
+    from objects.models import ObjectAssignment
+
+    return {
+        'groups': list(Group.objects.filter(user__id=user_id).values_list('name', flat=True)),
+        'orgs': list(Membership.objects.filter(user_id=user_id).values_list('org_id', 'role')),
+        'objects': list(
+            ObjectAssignment.objects.filter(user_id=user_id, is_active=True).values_list('object_id', 'role')
+        ),
+    }
+
+
+def get_scope_snapshot(user_id) -> Dict[str, Any]:
+    """Возвращает снимок скоупа пользователя, перестраивая его при смене версии."""
+    version_key = cache_key(scope_version_name(user_id))
+    snapshot_key = _snapshot_key(user_id)
+    found = cache.get_many([version_key, snapshot_key])
+    version: Optional[int] = found.get(version_key)
+    if version is None:
+        version = get_version(scope_version_name(user_id))
+    cached = found.get(snapshot_key)
+    if cached is not None and cached.get('version') == version:
+        return cached
+    # Версия читается ДО запросов: если между чтением и записью произойдет bump,
+    # снимок окажется помечен старой версией и будет перестроен при следующем чтении.
+    snapshot = _build_snapshot(user_id)
+    snapshot['version'] = version
+    cache.set(snapshot_key, snapshot, timeout=getattr(settings, 'SCOPE_CACHE_TIMEOUT', 3600))
+    return snapshot
+
+
+def invalidate_scope(user_id) -> int:
+    """Инвалидирует снимок пользователя во всех воркерах."""
+    return bump_version(scope_version_name(user_id))
+
+
+__all__ = ['get_scope_snapshot', 'invalidate_scope', 'scope_version_name']
@@ -5,9 +5,14 @@
 """
 from __future__ import annotations
 
-from typing import Iterable, Set
+import operator
+from functools import lru_cache, reduce
+from typing import Iterable, Optional, Set, Tuple
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import QuerySet
+from django.db.models import Exists, OuterRef, Q, QuerySet
+
+from core.services.principal import get_principal
 
 
 def get_user_org_ids(user: User) -> Set[int]:
@@ -15,27 +20,92 @@ def get_user_org_ids(user: User) -> Set[int]:
 
     Анонимный пользователь получает пустое множество.
     """
-    if user.is_anonymous:
-        return set()
-    # Импорт внутри функции чтобы избежать циклических импортов
-    from orgs.models import Membership
-
-    return set(
-        Membership.objects.filter(user=user).values_list("org_id", flat=True)
-    )
+    return set(get_principal(user).org_ids)
 
 
 def get_user_object_ids(user: User) -> Set[int]:
     """Возвращает множество ID объектов строительства, где пользователь назначен."""
-    if user.is_anonymous:
-        return set()
-    from objects.models import ObjectAssignment
+    return set(get_principal(user).object_ids)
+
+
+# До какого размера множества ID из снимка скоупа подставляются литеральным IN;
+# при большем размере эмитится подзапрос к Membership/ObjectAssignment.
+DEFAULT_INLINE_IDS_MAX = 100
+
+
+def _inline_ids_max() -> int:
+    return getattr(settings, 'SCOPE_INLINE_IDS_MAX', DEFAULT_INLINE_IDS_MAX)
+
+
+@lru_cache(maxsize=None)
+def _scope_fields(model) -> Tuple[bool, bool]:
+    """(есть поле org, есть поле object) — вычисляется один раз на модель."""
+    names = {f.name for f in model._meta.fields}
+    return 'org' in names, 'object' in names
+
+
+def _org_ids_source(principal, user):
+    """Литеральное множество org_id либо подзапрос по Membership для больших множеств."""
+    org_ids = principal.org_ids
+    if len(org_ids) <= _inline_ids_max():
+        return org_ids
+    from orgs.models import Membership
+
+    return Membership.objects.filter(user_id=user.pk).values('org_id')
+
+
+def scope_predicate(model, user) -> Optional[Q]:
+    """Строит предикат видимости строк модели для пользователя.
+
+    Возвращает None если ограничение не требуется (суперпользователь, системная роль
+    или модель без полей org/object). Предикат не содержит join'ов на внешний
+    запрос, поэтому результат никогда не требует DISTINCT:
 
-    return set(
-        ObjectAssignment.objects.filter(user=user, is_active=True).values_list(
-            "object_id", flat=True
-        )
-    )
+    - модели с org: org_id IN (<литералы>) либо EXISTS(Membership по OuterRef('org_id'));
+    - модели с object: object_id IN (<назначения>) либо EXISTS(ObjectAssignment по
+      OuterRef('object_id')), плюс object_id IN (SELECT id FROM объекты WHERE org_id IN ...)
+      — доступ по членству в организации владельца объекта.
+    """
+    if user.is_superuser:
+        return None
+    principal = get_principal(user)
+    # Allow access to all objects for users with system-wide roles
+    system_roles = ['ADMIN', 'INSPECTOR']
+    if principal.has_any_group(system_roles):
+        return None
+    has_org, has_object = _scope_fields(model)
+    if not has_org and not has_object:
+        return None
+
+    limit = _inline_ids_max()
+    parts = []
+    if has_org:
+        if len(principal.org_ids) <= limit:
+            parts.append(Q(org_id__in=principal.org_ids))
+        else:
+            from orgs.models import Membership
+
+            parts.append(Q(Exists(Membership.objects.filter(user_id=user.pk, org_id=OuterRef('org_id')))))
+    if has_object:
+        obj_ids = principal.object_ids
+        if obj_ids:
+            if len(obj_ids) <= limit:
+                parts.append(Q(object_id__in=obj_ids))
+            else:
+                from objects.models import ObjectAssignment
+
+                parts.append(Q(Exists(ObjectAssignment.objects.filter(
+                    user_id=user.pk, is_active=True, object_id=OuterRef('object_id')
+                ))))
+        # Fallback: доступ по членству в организации владельца объекта, даже если нет прямого назначения
+        if principal.org_ids:
+            from objects.models import ConstructionObject
+
+            org_objects = ConstructionObject.objects.filter(org_id__in=_org_ids_source(principal, user))
+            parts.append(Q(object_id__in=org_objects.values('pk')))
+    if not parts:
+        return Q(pk__in=[])
+    return reduce(operator.or_, parts)
 
 
 def scope_qs_to_user(qs: QuerySet, user: User) -> QuerySet:
@@ -45,38 +115,10 @@ def scope_qs_to_user(qs: QuerySet, user: User) -> QuerySet:
     Если у модели есть оба — применяется OR.
     Если ни одно поле не найдено — возвращаем qs без изменений (предполагается дополнительная проверка на уровне вью).
     """
-    if user.is_superuser:
+    predicate = scope_predicate(qs.model, user)
+    if predicate is None:
         return qs
-    # Allow access to all objects for users with system-wide roles
-    system_roles = ['ADMIN', 'INSPECTOR']
-    user_groups = set(user.groups.values_list('name', flat=True))
-    if user_groups & set(system_roles):
-        return qs
-    model = qs.model
-    org_field = None
-    object_field = None
-    if any(f.name == "org" for f in model._meta.fields):
-        org_field = "org_id"
-    if any(f.name == "object" for f in model._meta.fields):
-        object_field = "object_id"
-    if not org_field and not object_field:
-        return qs
-
-    from django.db.models import Q
-
-    q = Q()
-    if org_field:
-        org_ids = get_user_org_ids(user)
-        q |= Q(**{f"{org_field}__in": org_ids})
-    if object_field:
-        obj_ids = get_user_object_ids(user)
-        if obj_ids:
-            q |= Q(**{f"{object_field}__in": obj_ids})
-        # Fallback: доступ по членству в организации владельца объекта, даже если нет прямого назначения
-        org_ids = get_user_org_ids(user)
-        if org_ids:
-            q |= Q(**{f"{object_field}__org_id__in": org_ids})
-    return qs.filter(q).distinct()
+    return qs.filter(predicate)
 
 
 class ScopedQuerySetMixin:
@@ -0,0 +1,211 @@
+"""Пространственный индекс геозон: «какой объект содержит эту GPS-точку».
+
+In-process равномерная сетка по bbox скомпилированных полигонов
+(core.services.geofence): ячейка -> id объектов, чей bbox ее пересекает.
+Запрос точки = одна ячейка сетки + точная проверка point-in-polygon для
+кандидатов, т.е. время не зависит от общего числа объектов.
+
+Объекты с огромным bbox (больше SPATIAL_GRID_MAX_CELLS ячеек) хранятся в
+отдельном списке и проверяются по bbox, чтобы не раздувать сетку.
+
+Синхронизация:
+- в своем процессе индекс обновляется инкрементально сигналами (после коммита);
+- между воркерами — через счетчик версии 'spatial:objects' в общем кеше. Воркер,
+  увидевший чужую версию, сверяет (id, updated_at) всех объектов с индексом
+  одним легким запросом и перекомпилирует только изменившиеся. Версия
+  проверяется не чаще раза в SPATIAL_INDEX_CHECK_INTERVAL секунд.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from core.services.geofence import CompiledGeometry, compile_geometry, contains
+from core.services.versions import bump_version, get_version
+
+VERSION_NAME = 'spatial:objects'
+DEFAULT_CELL_DEG = 0.01  # ~1.1 км по широте
+DEFAULT_MAX_CELLS = 4096
+
+Cell = Tuple[int, int]
+
+
+class _Entry:
+    __slots__ = ('object_id', 'org_id', 'updated_at', 'geometry', 'cells')
+
+    def __init__(self, object_id, org_id, updated_at, geometry: CompiledGeometry, cells: Tuple[Cell, ...]):
+        self.object_id = object_id
+        self.org_id = org_id
+        self.updated_at = updated_at
+        self.geometry = geometry
+        self.cells = cells  # пустой кортеж — объект в списке oversized
+
+
+class GridIndex:
+    """Равномерная сетка по bbox геозон."""
+
+    def __init__(self, cell_deg: float = DEFAULT_CELL_DEG, max_cells: int = DEFAULT_MAX_CELLS) -> None:
+        self.cell_deg = cell_deg
+        self.max_cells = max_cells
+        self._cells: Dict[Cell, Set[object]] = {}
+        self._entries: Dict[object, _Entry] = {}
+        self._oversized: Set[object] = set()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_deg), math.floor(y / self.cell_deg))
+
+    def _cells_for(self, geometry: CompiledGeometry) -> Tuple[Cell, ...]:
+        minx, miny, maxx, maxy = geometry.bbox
+        x0, y0 = self._cell(minx, miny)
+        x1, y1 = self._cell(maxx, maxy)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > self.max_cells:
+            return ()
+        return tuple((ix, iy) for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1))
+
+    def upsert(self, object_id, org_id, updated_at, polygon) -> None:
+        geometry = compile_geometry(polygon)
+        with self._lock:
+            self._remove(object_id)
+            if geometry is None:
+                return
+            cells = self._cells_for(geometry)
+            self._entries[object_id] = _Entry(object_id, org_id, updated_at, geometry, cells)
+            if not cells:
+                self._oversized.add(object_id)
+            for cell in cells:
+                self._cells.setdefault(cell, set()).add(object_id)
+
+    def remove(self, object_id) -> None:
+        with self._lock:
+            self._remove(object_id)
+
+    def _remove(self, object_id) -> None:
+        entry = self._entries.pop(object_id, None)
+        if entry is None:
+            return
+        self._oversized.discard(object_id)
+        for cell in entry.cells:
+            ids = self._cells.get(cell)
+            if ids is not None:
+                ids.discard(object_id)
+                if not ids:
+                    del self._cells[cell]
+
+    def known(self) -> Dict[object, object]:
+        """{object_id: updated_at} проиндексированных объектов."""
+        with self._lock:
+            return {oid: e.updated_at for oid, e in self._entries.items()}
+
+    def locate(self, lon: float, lat: float, org_ids: Optional[Iterable] = None) -> List[Tuple[object, object]]:
+        """[(object_id, org_id)] объектов, чья геозона содержит точку."""
+        allowed = None if org_ids is None else set(org_ids)
+        with self._lock:
+            candidates = list(self._cells.get(self._cell(lon, lat), ())) + list(self._oversized)
+            entries = [self._entries[oid] for oid in candidates]
+        return [
+            (e.object_id, e.org_id)
+            for e in entries
+            if (allowed is None or e.org_id in allowed) and contains(e.geometry, lon, lat)
+        ]
+
+
+class SpatialIndex:
+    """GridIndex процесса + синхронизация с БД и другими воркерами."""
+
+    def __init__(self) -> None:
+        self.grid = GridIndex(
+            cell_deg=getattr(settings, 'SPATIAL_GRID_CELL_DEG', DEFAULT_CELL_DEG),
+            max_cells=getattr(settings, 'SPATIAL_GRID_MAX_CELLS', DEFAULT_MAX_CELLS),
+        )
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+        self._sync_lock = threading.Lock()
+
+    def _queryset(self):
+        from objects.models import ConstructionObject
+
+        return ConstructionObject.objects.all()
+
+    def sync(self, force: bool = False) -> None:
+        """Приводит индекс к версии из общего кеша (при первом вызове — полная загрузка)."""
+        interval = getattr(settings, 'SPATIAL_INDEX_CHECK_INTERVAL', 1.0)
+        now = time.monotonic()
+        if not force and self.version is not None and now - self._checked_at < interval:
+            return
+        with self._sync_lock:
+            version = get_version(VERSION_NAME)
+            self._checked_at = now
+            if not force and version == self.version:
+                return
+            self._reconcile()
+            self.version = version
+
+    def _reconcile(self) -> None:
+        known = self.grid.known()
+        current = dict(self._queryset().values_list('pk', 'updated_at'))
+        for object_id in set(known) - set(current):
+            self.grid.remove(object_id)
+        changed = [oid for oid, updated_at in current.items() if known.get(oid) != updated_at]
+        for start in range(0, len(changed), 1000):
+            rows = self._queryset().filter(pk__in=changed[start:start + 1000]).values_list(
+                'pk', 'org_id', 'updated_at', 'polygon'
+            )
+            for object_id, org_id, updated_at, polygon in rows:
+                self.grid.upsert(object_id, org_id, updated_at, polygon)
+
+    def _publish(self) -> None:
+        """Сообщает другим воркерам об изменении; свой индекс уже актуален."""
+        previous = self.version
+        version = bump_version(VERSION_NAME)
+        if previous is not None and version == previous + 1:
+            self.version = version
+
+    def object_saved(self, obj) -> None:
+        if self.version is not None:
+            self.grid.upsert(obj.pk, obj.org_id, obj.updated_at, obj.polygon)
+        self._publish()
+
+    def object_deleted(self, object_id) -> None:
+        if self.version is not None:
+            self.grid.remove(object_id)
+        self._publish()
+
+    def locate(self, lon: float, lat: float, org_ids: Optional[Iterable] = None) -> List[Tuple[object, object]]:
+        self.sync()
+        return self.grid.locate(lon, lat, org_ids)
+
+
+_index: Optional[SpatialIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_spatial_index() -> SpatialIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SpatialIndex()
+    return _index
+
+
+def reset_spatial_index() -> None:
+    """Сбрасывает индекс процесса (тесты, смена настроек)."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def locate_objects(lon: float, lat: float, org_ids: Optional[Iterable] = None) -> List[object]:
+    """id объектов, чья геозона содержит точку (org_ids=None — без ограничения по организациям)."""
+    return [object_id for object_id, _org_id in get_spatial_index().locate(lon, lat, org_ids)]
+
+
+__all__ = ['GridIndex', 'SpatialIndex', 'get_spatial_index', 'reset_spatial_index', 'locate_objects']
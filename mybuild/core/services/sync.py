@@ -0,0 +1,338 @@
+"""Пакетная офлайн-синхронизация (/api/sync/batch/).
+
+Мобильный клиент после потери связи присылает очередь записей одним
+запросом вместо отдельного POST на каждую запись:
+
+    {"items": [
+        {"kind": "inspection_visit", "id": "<uuid клиента>", "data": {...}},
+        {"kind": "presence_confirmation", "data": {"visit": "<uuid визита>", ...}},
+        {"kind": "delivery", "data": {"object": "...", "offline_batch_id": "b-1", ...}},
+    ]}
+
+Каждая запись получает результат (по индексу во входном массиве):
+created, replayed (offline_batch_id уже был принят от этого пользователя —
+возвращается существующая запись) или failed (ошибки валидации/доступа).
+
+Стоимость пакета не зависит от числа записей линейно по запросам к БД:
+на каждый вид записей — одна проверка ссылок (FK) на целевую модель,
+один поиск offline_batch_id и один bulk_create; аудит уходит в буфер запроса
+(audit.writer), уведомления — одним notify_bulk.
+
+Виды обрабатываются в порядке SYNC_KINDS (визиты раньше подтверждений
+присутствия), чтобы записи могли ссылаться на созданные в том же пакете
+по id, сгенерированному клиентом. Внутри вида сохраняется порядок входа:
+повтор offline_batch_id в одном пакете — replayed первой записи.
+
+После bulk_create для созданных записей вручную отправляется post_save
+(created=True), поэтому обработчики сигналов (реестр активных визитов и т.п.)
+видят записи так же, как при обычном save().
+"""
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.signals import post_save
+
+from core.services.permission_matrix import model_perm_rules
+from core.services.principal import get_principal
+
+DEFAULT_BATCH_MAX = 500
+
+CREATED = 'created'
+REPLAYED = 'replayed'
+FAILED = 'failed'
+
+# Поля, которые клиент не задает
+_SERVER_FIELDS = frozenset({'id', 'created_at', 'updated_at'})
+
+
+@dataclass(frozen=True)
+class SyncKind:
+    name: str
+    model_label: str
+    user_field: Optional[str]  # поле автора; идемпотентность — по (offline_batch_id, автор)
+    notify_kind: Optional[str] = None
+    owner_lookup: Optional[str] = None  # путь к автору, если своего поля автора у модели нет
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def author_lookup(self) -> Optional[str]:
+        return self.user_field or self.owner_lookup
+
+
+# Порядок = порядок обработки (зависимые виды — после тех, на кого ссылаются)
+SYNC_KINDS: Tuple[SyncKind, ...] = (
+    SyncKind('inspection_visit', 'inspections.InspectionVisit', 'inspector'),
+    SyncKind('presence_confirmation', 'inspections.PresenceConfirmation', None, owner_lookup='visit__inspector'),
+    SyncKind('delivery', 'materials.Delivery', 'created_by', 'delivery.created'),
+    SyncKind('remark', 'issues.Remark', 'created_by', 'remark.created'),
+    SyncKind('violation', 'issues.Violation', 'created_by', 'violation.created'),
+)
+KINDS_BY_NAME = {k.name: k for k in SYNC_KINDS}
+
+
+class SyncError(ValueError):
+    """Неверный конверт пакета целиком (не отдельной записи)."""
+
+
+def batch_max() -> int:
+    return getattr(settings, 'SYNC_BATCH_MAX', DEFAULT_BATCH_MAX)
+
+
+def can_create(user, model) -> bool:
+    """Право добавления — как у MatrixPermission для POST create."""
+    if user.is_superuser:
+        return True
+    rule = model_perm_rules(model)['add']
+    return get_principal(user).has_any_group(rule.groups) or user.has_perm(rule.perm)
+
+
+def _writable_fields(model, kind: SyncKind) -> Dict[str, models.Field]:
+    return {
+        f.name: f for f in model._meta.concrete_fields
+        if f.name not in _SERVER_FIELDS and f.name != kind.user_field and f.editable
+    }
+
+
+def _fk_queryset(field: models.ForeignKey, user):
+    """Допустимые значения ссылки: объекты — в скоупе пользователя, визиты — свои."""
+    from core.services.scoping import scope_qs_to_user
+    from inspections.models import InspectionVisit
+    from objects.models import ConstructionObject
+
+    target = field.related_model
+    qs = target._default_manager.all()
+    if user.is_superuser:
+        return qs
+    if target is ConstructionObject:
+        return scope_qs_to_user(qs, user)
+    if target is InspectionVisit:
+        return qs.filter(inspector=user)
+    return qs
+
+
+@dataclass
+class _Item:
+    index: int
+    instance: Optional[models.Model] = None
+    status: Optional[str] = None
+    errors: Any = None
+
+    def fail(self, errors) -> None:
+        self.status, self.errors = FAILED, errors
+
+
+def _build(item: _Item, raw: Dict[str, Any], kind: SyncKind, fields: Dict[str, models.Field], user) -> None:
+    model = kind.model
+    data = raw.get('data')
+    if not isinstance(data, dict):
+        item.fail({'data': ['Ожидается объект.']})
+        return
+    unknown = sorted(set(data) - set(fields) - {f.attname for f in fields.values()})
+    if unknown:
+        item.fail({name: ['Неизвестное поле.'] for name in unknown})
+        return
+    values = {}
+    for name, field in fields.items():
+        if name in data or field.attname in data:
+            value = data.get(name, data.get(field.attname))
+            values[field.attname] = value
+    values.setdefault('was_offline', True)
+    if kind.user_field:
+        values[model._meta.get_field(kind.user_field).attname] = user.pk
+    instance = model(**values)
+    if raw.get('id'):
+        try:
+            instance.pk = uuid.UUID(str(raw['id']))
+        except ValueError:
+            item.fail({'id': ['Некорректный UUID.']})
+            return
+    exclude = [f.name for f in fields.values() if f.is_relation]
+    if kind.user_field:
+        exclude.append(kind.user_field)
+    try:
+        # FK проверяются пакетно ниже, здесь — типы и ограничения значений
+        instance.clean_fields(exclude=exclude)
+    except ValidationError as exc:
+        item.fail(exc.message_dict)
+        return
+    item.instance = instance
+
+
+def _check_relations(items: List[_Item], fields: Dict[str, models.Field], user) -> None:
+    """Одна выборка на каждую FK: существование и доступность ссылок."""
+    for field in fields.values():
+        if not isinstance(field, models.ForeignKey):
+            continue
+        ids = set()
+        for i in items:
+            if i.status is not None:
+                continue
+            value = getattr(i.instance, field.attname)
+            if value is None:
+                if not field.null:
+                    i.fail({field.name: ['Обязательное поле.']})
+                continue
+            try:
+                setattr(i.instance, field.attname, field.target_field.to_python(value))
+                ids.add(getattr(i.instance, field.attname))
+            except ValidationError:
+                i.fail({field.name: ['Некорректный идентификатор.']})
+        if not ids:
+            continue
+        # Сами объекты, а не только pk: они нужны аудиту и уведомлениям (__str__)
+        allowed = _fk_queryset(field, user).in_bulk(ids)
+        for i in items:
+            if i.status is not None or getattr(i.instance, field.attname) is None:
+                continue
+            value = getattr(i.instance, field.attname)
+            if value in allowed:
+                setattr(i.instance, field.name, allowed[value])
+            else:
+                i.fail({field.name: ['Объект не найден или недоступен.']})
+
+
+def _existing(kind: SyncKind, items: List[_Item], user) -> Dict[str, models.Model]:
+    batch_ids = {i.instance.offline_batch_id for i in items if i.status is None and i.instance.offline_batch_id}
+    if not batch_ids:
+        return {}
+    qs = kind.model._default_manager.filter(offline_batch_id__in=batch_ids)
+    if kind.author_lookup:
+        # чужая запись с тем же batch id не должна вернуться как replayed
+        qs = qs.filter(**{kind.author_lookup: user})
+    return {obj.offline_batch_id: obj for obj in qs}
+
+
+def _insert(kind: SyncKind, new: List[_Item], user) -> None:
+    """bulk_create; при конфликте — поштучно с INSERT ... ON CONFLICT DO NOTHING.
+
+    Конфликт по (offline_batch_id, автор) означает, что ту же запись
+    параллельно принял другой запрос: такая запись становится replayed.
+    """
+    from core.services.offline import insert_ignore
+
+    if not new:
+        return
+    model = kind.model
+    try:
+        with transaction.atomic():
+            model._default_manager.bulk_create([i.instance for i in new])
+        return
+    except IntegrityError:
+        pass
+    for i in new:
+        try:
+            with transaction.atomic():
+                if insert_ignore(i.instance):
+                    continue
+        except IntegrityError as exc:
+            i.fail({'non_field_errors': [str(exc)]})
+            continue
+        found = _existing(kind, [_Item(index=i.index, instance=i.instance)], user).get(i.instance.offline_batch_id)
+        if found is None:
+            i.fail({'non_field_errors': ['Запись нарушает ограничение уникальности.']})
+        else:
+            i.instance, i.status = found, REPLAYED
+
+
+def _process_kind(kind: SyncKind, batch: List[Tuple[_Item, Dict[str, Any]]], user, events: List) -> None:
+    from audit.services import log_action
+    from notifications.services import build_basic_payload
+
+    model = kind.model
+    items = [item for item, _raw in batch]
+    if not can_create(user, model):
+        for item in items:
+            item.fail({'detail': 'Недостаточно прав.'})
+        return
+    fields = _writable_fields(model, kind)
+    for item, raw in batch:
+        _build(item, raw, kind, fields, user)
+    _check_relations(items, fields, user)
+
+    existing = _existing(kind, items, user)
+    new: List[_Item] = []
+    for item in items:
+        if item.status is not None:
+            continue
+        batch_id = item.instance.offline_batch_id
+        if batch_id and batch_id in existing:
+            item.instance, item.status = existing[batch_id], REPLAYED
+            continue
+        item.status = CREATED
+        new.append(item)
+        if batch_id:
+            # повтор в этом же пакете ссылается на экземпляр первой записи
+            existing[batch_id] = item.instance
+    _insert(kind, new, user)
+    using = router.db_for_write(model)
+    for item in new:
+        if item.status != CREATED:
+            continue
+        post_save.send(sender=model, instance=item.instance, created=True, update_fields=None, raw=False, using=using)
+        log_action(actor=user, action=f'create_{kind.name}', instance=item.instance, extra={'sync': True})
+        if kind.notify_kind:
+            events.append(([user], kind.notify_kind, build_basic_payload(item.instance)))
+    for item in items:
+        if item.status == REPLAYED:
+            if item.instance._state.adding:
+                # первая запись этого offline_batch_id не вставилась
+                item.fail({'offline_batch_id': ['Запись с этим offline_batch_id не создана.']})
+                continue
+            log_action(actor=user, action=f'replay_{kind.name}', instance=item.instance,
+                       extra={'offline_batch_id': item.instance.offline_batch_id, 'sync': True})
+
+
+def apply_batch(user, payload: Any) -> Dict[str, Any]:
+    """Применяет пакет; возвращает {'results': [...], 'summary': {...}}."""
+    from notifications.services import notify_bulk
+
+    raw_items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(raw_items, list):
+        raise SyncError('Ожидается массив items.')
+    if len(raw_items) > batch_max():
+        raise SyncError(f'Не более {batch_max()} записей в пакете.')
+
+    items = [_Item(index=i) for i in range(len(raw_items))]
+    grouped: Dict[str, List[Tuple[_Item, Dict[str, Any]]]] = {}
+    for item, raw in zip(items, raw_items):
+        kind = raw.get('kind') if isinstance(raw, dict) else None
+        if kind not in KINDS_BY_NAME:
+            item.fail({'kind': [f'Ожидается одно из: {", ".join(KINDS_BY_NAME)}.']})
+            continue
+        grouped.setdefault(kind, []).append((item, raw))
+
+    events: List = []
+    with transaction.atomic():
+        for kind in SYNC_KINDS:
+            if kind.name in grouped:
+                _process_kind(kind, grouped[kind.name], user, events)
+        notify_bulk(events)
+
+    results = []
+    summary = {CREATED: 0, REPLAYED: 0, FAILED: 0}
+    for item, raw in zip(items, raw_items):
+        summary[item.status] += 1
+        result = {'index': item.index, 'kind': raw.get('kind') if isinstance(raw, dict) else None, 'status': item.status}
+        if item.status == FAILED:
+            result['errors'] = item.errors
+        else:
+            result['id'] = str(item.instance.pk)
+            result['offline_batch_id'] = item.instance.offline_batch_id
+        results.append(result)
+    return {'results': results, 'summary': summary}
+
+
+__all__ = [
+    'SyncKind', 'SYNC_KINDS', 'SyncError', 'apply_batch', 'can_create', 'batch_max',
+    'CREATED', 'REPLAYED', 'FAILED',
+]
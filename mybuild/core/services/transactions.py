@@ -0,0 +1,29 @@
+"""Вспомогательные функции для работы с транзакциями.
+
+transaction.on_commit внутри TestCase откладывает колбэк до конца теста,
+даже если код выполняется «вне транзакции» с точки зрения приложения.
+in_transaction() не считает обертки TestCase транзакцией (как и проверка
+durable в Django), поэтому после коммита и в autocommit поведение
+одинаково в тестах и в работе.
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from django.db import connection, transaction
+
+
+def in_transaction() -> bool:
+    """Идет ли транзакция приложения (блоки atomic из TestCase не в счет)."""
+    return any(not getattr(block, '_from_testcase', False) for block in connection.atomic_blocks)
+
+
+def after_commit(func: Callable[[], None]) -> None:
+    """Выполняет func после коммита текущей транзакции или сразу вне ее."""
+    if in_transaction():
+        transaction.on_commit(func)
+    else:
+        func()
+
+
+__all__ = ['in_transaction', 'after_commit']
@@ -0,0 +1,61 @@
+"""Счетчики версий в общем кеше.
+
+Версия — монотонно растущее число под ключом без TTL. Кешированные данные
+помечаются версией, действовавшей на момент их построения; инвалидация
+сводится к bump_version(), после чего все воркеры видят новую версию и
+перестраивают данные при следующем обращении.
+
+Если ключ версии пропал из кеша (eviction/рестарт Redis), он
+инициализируется текущим временем в мс, а не нулем — так старые
+помеченные данные не совпадут с новой версией.
+"""
+from __future__ import annotations
+
+import time
+from typing import Dict, Iterable
+
+from django.core.cache import cache
+
+_PREFIX = 'ver:'
+
+
+def cache_key(name: str) -> str:
+    """Ключ кеша счетчика (для чтения вместе с другими ключами через get_many)."""
+    return f'{_PREFIX}{name}'
+
+
+def _seed() -> int:
+    return int(time.time() * 1000)
+
+
+def get_version(name: str) -> int:
+    key = cache_key(name)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _seed(), timeout=None)
+        value = cache.get(key)
+    return int(value)
+
+
+def get_versions(names: Iterable[str]) -> Dict[str, int]:
+    """Версии нескольких счетчиков за один round trip (в общем случае)."""
+    names = list(names)
+    found = cache.get_many([cache_key(n) for n in names])
+    result: Dict[str, int] = {}
+    for name in names:
+        value = found.get(cache_key(name))
+        result[name] = int(value) if value is not None else get_version(name)
+    return result
+
+
+def bump_version(name: str) -> int:
+    key = cache_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # ключа нет — заводим заново (значение заведомо отличается от прежних)
+        cache.add(key, _seed(), timeout=None)
+        return int(cache.get(key))
+
+
+__all__ = ['cache_key', 'get_version', 'get_versions', 'bump_version']
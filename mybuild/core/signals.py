@@ -0,0 +1,116 @@
+"""Инвалидация общих кешей.
+
+Любое изменение групп пользователя, его членств в организациях или назначений
+на объекты увеличивает версию скоупа пользователя (core.services.scope_cache)
+дважды: сразу и после коммита. Второе увеличение отбрасывает снимок, который
+конкурентный запрос успел собрать из данных до коммита под первой версией.
+Изменение геозоны объекта обновляет пространственный индекс
+(core.services.spatial_index) после коммита. Удаление строк моделей ленты
+изменений оставляет Tombstone (core.services.changes). Запись строк моделей,
+показываемых панелью и списками, после коммита увеличивает их версию данных
+(core.services.page_cache).
+"""
+from django.apps import apps
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.services.changes import record_tombstone
+from core.services.page_cache import DATA_MODELS, invalidate_model
+from core.services.scope_cache import invalidate_scope
+from core.services.spatial_index import get_spatial_index
+from core.services.transactions import after_commit, in_transaction
+from issues.models import Remark, Violation
+from materials.models import Delivery
+from objects.models import ConstructionObject, DailyChecklist, ObjectAssignment, OpeningChecklist
+from orgs.models import Membership
+
+
+def _scope_changed(user_id):
+    invalidate_scope(user_id)
+    if in_transaction():
+        transaction.on_commit(lambda: invalidate_scope(user_id))
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+@receiver(post_save, sender=ObjectAssignment)
+@receiver(post_delete, sender=ObjectAssignment)
+def _scope_row_changed(sender, instance, **kwargs):
+    _scope_changed(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def _user_created(sender, instance, created, **kwargs):
+    # id пользователя может быть переиспользован (например, после отката транзакции)
+    if created:
+        _scope_changed(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, instance, **kwargs):
+    _scope_changed(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear
+        if action != 'pre_clear':
+            _scope_changed(instance.pk)
+        return
+    # group.user_set.add/remove/clear — instance это Group
+    if action == 'pre_clear':
+        user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        return
+    else:
+        user_ids = pk_set or ()
+    for user_id in user_ids:
+        _scope_changed(user_id)
+
+
+@receiver(pre_delete, sender=Group)
+def _group_deleted(sender, instance, **kwargs):
+    for user_id in instance.user_set.values_list('pk', flat=True):
+        _scope_changed(user_id)
+
+
+_SPATIAL_FIELDS = {'polygon', 'org', 'org_id'}
+
+
+@receiver(post_save, sender=ConstructionObject)
+def _object_geometry_saved(sender, instance, update_fields=None, **kwargs):
+    # FSM-переходы сохраняют только статус — геозона не меняется
+    if update_fields is not None and not _SPATIAL_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(lambda: get_spatial_index().object_saved(instance))
+
+
+@receiver(post_delete, sender=ConstructionObject)
+def _object_geometry_deleted(sender, instance, **kwargs):
+    object_id = instance.pk
+    transaction.on_commit(lambda: get_spatial_index().object_deleted(object_id))
+
+
+@receiver(post_delete, sender=ConstructionObject)
+@receiver(post_delete, sender=OpeningChecklist)
+@receiver(post_delete, sender=DailyChecklist)
+@receiver(post_delete, sender=Delivery)
+@receiver(post_delete, sender=Remark)
+@receiver(post_delete, sender=Violation)
+def _feed_row_deleted(sender, instance, **kwargs):
+    record_tombstone(instance)
+
+
+def _page_data_changed(sender, instance, **kwargs):
+    label = sender._meta.label_lower
+    after_commit(lambda: invalidate_model(label))
+
+
+for _label in DATA_MODELS:
+    post_save.connect(_page_data_changed, sender=apps.get_model(_label), dispatch_uid=f'page_cache_save_{_label}')
+    post_delete.connect(_page_data_changed, sender=apps.get_model(_label), dispatch_uid=f'page_cache_delete_{_label}')
@@ -0,0 +1,38 @@
+"""Тег {% page_fragment %}: кеширование фрагмента страницы (core.services.page_cache).
+
+    {% load page_cache %}
+    {% page_fragment page_fragment %} ... {% endpage_fragment %}
+
+Аргумент — PageFragment из контекста; контекст его build() добавляется
+только при промахе. Без фрагмента (None) содержимое рендерится как есть.
+"""
+from django import template
+
+register = template.Library()
+
+
+class PageFragmentNode(template.Node):
+    def __init__(self, nodelist, fragment):
+        self.nodelist = nodelist
+        self.fragment = fragment
+
+    def render(self, context):
+        fragment = self.fragment.resolve(context, ignore_failures=True)
+        if fragment is None:
+            return self.nodelist.render(context)
+
+        def build():
+            with context.push(fragment.build()):
+                return self.nodelist.render(context)
+
+        return fragment.render(build)
+
+
+@register.tag('page_fragment')
+def do_page_fragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' ожидает один аргумент — PageFragment")
+    nodelist = parser.parse(('endpage_fragment',))
+    parser.delete_first_token()
+    return PageFragmentNode(nodelist, parser.compile_filter(bits[1]))
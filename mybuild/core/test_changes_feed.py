@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Tombstone
+from core.services.cursors import encode_cursor
+from issues.models import Remark
+from objects.models import ConstructionObject
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+@override_settings(SYNC_CHANGES_LAG_SECONDS=0)
+class ChangesFeedTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Feed Org")
+        self.other = Organization.objects.create(name="Feed Other")
+        self.user = User.objects.create_user(username="feeder", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Feed site", polygon=POLYGON)
+        self.foreign = ConstructionObject.objects.create(org=self.other, name="Foreign", polygon=POLYGON)
+        self.remarks = [Remark.objects.create(object=self.obj, description=f"r{i}") for i in range(3)]
+        self.foreign_remark = Remark.objects.create(object=self.foreign, description="foreign")
+        self.api = APIClient()
+        self.api.login(username="feeder", password="pass123")
+
+    def changes(self, cursor=None, limit=None, model='remarks'):
+        params = {'model': model}
+        if cursor:
+            params['cursor'] = cursor
+        if limit:
+            params['limit'] = limit
+        return self.api.get('/api/sync/changes/', params)
+
+    def test_initial_sync_pages_through_scoped_rows(self):
+        first = self.changes(limit=2)
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(len(first.data['results']), 2)
+        self.assertTrue(first.data['has_more'])
+        second = self.changes(cursor=first.data['next'], limit=2)
+        self.assertFalse(second.data['has_more'])
+        ids = [r['id'] for r in first.data['results'] + second.data['results']]
+        self.assertEqual(sorted(ids), sorted(str(r.pk) for r in self.remarks))
+        # без изменений — пустая страница, курсор пригоден для следующего раза
+        idle = self.changes(cursor=second.data['next'])
+        self.assertEqual((idle.data['results'], idle.data['deleted']), ([], []))
+
+    def test_incremental_sync_returns_updates_and_tombstones(self):
+        cursor = self.changes().data['next']
+        changed, removed = self.remarks[0], self.remarks[1]
+        changed.description = "updated"
+        changed.save()
+        removed_id = str(removed.pk)
+        removed.delete()
+        self.foreign_remark.delete()
+        resp = self.changes(cursor=cursor)
+        self.assertEqual([r['id'] for r in resp.data['results']], [str(changed.pk)])
+        self.assertEqual(resp.data['results'][0]['description'], "updated")
+        self.assertEqual(resp.data['deleted'], [removed_id])
+        self.assertEqual(Tombstone.objects.filter(model='issues.remark').count(), 2)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.changes(model='users').status_code, 400)
+        self.assertEqual(self.changes(cursor='garbage').status_code, 400)
+        stale = encode_cursor([timezone.now() - timedelta(days=365), '00000000-0000-0000-0000-000000000000'])
+        self.assertEqual(self.changes(cursor=stale).status_code, 410)
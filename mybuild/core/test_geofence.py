@@ -0,0 +1,74 @@
+import random
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from core.services import geofence
+from core.services.geofence import compile_geometry, contains, contains_many, get_geometry, locate_points
+from objects.models import ConstructionObject
+from orgs.models import Organization
+
+SQUARE_WITH_HOLE = {
+    "type": "Polygon",
+    "coordinates": [
+        [[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]],
+        [[4, 4], [4, 6], [6, 6], [6, 4], [4, 4]],
+    ],
+}
+MULTI = {
+    "type": "MultiPolygon",
+    "coordinates": [
+        [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]],
+        [[[5, 5], [5, 6], [6, 6], [6, 5], [5, 5]]],
+    ],
+}
+
+
+class GeometryTests(SimpleTestCase):
+    def test_holes(self):
+        geom = compile_geometry(SQUARE_WITH_HOLE)
+        self.assertEqual(geom.bbox, (0.0, 0.0, 10.0, 10.0))
+        self.assertTrue(contains(geom, 2, 2))
+        self.assertFalse(contains(geom, 5, 5))
+        self.assertFalse(contains(geom, 11, 5))
+
+    def test_multipolygon(self):
+        geom = compile_geometry(MULTI)
+        self.assertTrue(contains(geom, 0.5, 0.5))
+        self.assertTrue(contains(geom, 5.5, 5.5))
+        self.assertFalse(contains(geom, 3, 3))
+
+    def test_form_format_is_lat_lng(self):
+        geom = compile_geometry([[50.0, 30.0], [50.01, 30.0], [50.01, 30.01], [50.0, 30.01]])
+        self.assertTrue(contains(geom, 30.005, 50.005))
+        self.assertFalse(contains(geom, 50.005, 30.005))
+
+    def test_degenerate_polygons_are_not_compiled(self):
+        for data in (None, [], {"type": "Polygon", "coordinates": [[]]},
+                     {"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [0, 0]]]}, {"type": "Point"}):
+            self.assertIsNone(compile_geometry(data), data)
+
+    def test_batch_matches_scalar(self):
+        rnd = random.Random(7)
+        points = [(rnd.uniform(-1, 11), rnd.uniform(-1, 11)) for _ in range(2000)]
+        for data in (SQUARE_WITH_HOLE, MULTI):
+            geom = compile_geometry(data)
+            expected = [contains(geom, x, y) for x, y in points]
+            self.assertEqual(contains_many(geom, points), expected)
+            with mock.patch.object(geofence, 'np', None):
+                self.assertEqual(contains_many(compile_geometry(data), points), expected)
+        result = locate_points({'a': compile_geometry(MULTI), 'none': None}, [(0.5, 0.5), (3, 3)])
+        self.assertEqual(result, {'a': [True, False]})
+
+
+class GeometryCacheTests(TestCase):
+    def test_cache_keyed_by_updated_at(self):
+        org = Organization.objects.create(name="Geo Cache Org")
+        obj = ConstructionObject.objects.create(name="Geo", org=org, polygon=MULTI)
+        first = get_geometry(obj)
+        self.assertIs(get_geometry(obj), first)
+        obj.polygon = SQUARE_WITH_HOLE
+        obj.save()
+        second = get_geometry(obj)
+        self.assertIsNot(second, first)
+        self.assertFalse(contains(second, 5, 5))
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.api import ConstructionObjectViewSet, OpeningChecklistViewSet
+from core.services.object_permissions import filter_allowed, object_permission_map
+from objects.models import ConstructionObject, ObjectAssignment, OpeningChecklist
+from orgs.models import Organization, Membership
+
+
+class BulkObjectPermissionTests(TestCase):
+    def setUp(self):
+        polygon = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+        self.client_org = Organization.objects.create(name="Perm Client Org")
+        self.foreman_org = Organization.objects.create(name="Perm Foreman Org")
+        self.user = User.objects.create_user(username="bulkperm", password="pass123")
+        Membership.objects.create(user=self.user, org=self.client_org, role="CLIENT")
+        Membership.objects.create(user=self.user, org=self.foreman_org, role="FOREMAN")
+        self.client_obj = ConstructionObject.objects.create(name="Client", org=self.client_org, polygon=polygon)
+        self.foreman_obj = ConstructionObject.objects.create(name="Foreman", org=self.foreman_org, polygon=polygon)
+        self.inspected = ConstructionObject.objects.create(name="Inspected", org=self.foreman_org, polygon=polygon)
+        ObjectAssignment.objects.create(object=self.inspected, user=self.user, role="INSPECTOR")
+        self.checklists = {
+            o.name: OpeningChecklist.objects.create(object=o, data={})
+            for o in (self.client_obj, self.foreman_obj, self.inspected)
+        }
+
+    def _user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_permission_map_for_objects(self):
+        user = self._user()
+        objs = list(ConstructionObject.objects.filter(pk__in=[self.client_obj.pk, self.foreman_obj.pk, self.inspected.pk]))
+        perm_map = object_permission_map(user, objs, ['plan', 'activate', 'destroy'], ConstructionObjectViewSet.role_map)
+        self.assertEqual(perm_map[self.client_obj.pk], {'plan', 'destroy'})
+        self.assertEqual(perm_map[self.foreman_obj.pk], {'destroy'})
+        self.assertEqual(perm_map[self.inspected.pk], {'activate', 'destroy'})
+
+    def test_permission_map_resolves_orgs_in_one_query(self):
+        user = self._user()
+        objs = list(OpeningChecklist.objects.all())
+        object_permission_map(user, objs[:1], ['submit'], OpeningChecklistViewSet.role_map)  # прогрев Principal
+        with self.assertNumQueries(1):
+            perm_map = object_permission_map(user, objs, ['submit', 'approve'], OpeningChecklistViewSet.role_map)
+        self.assertEqual(perm_map[self.checklists['Client'].pk], {'approve'})
+        self.assertEqual(perm_map[self.checklists['Foreman'].pk], {'submit'})
+        prefetched = list(OpeningChecklist.objects.select_related('object'))
+        with self.assertNumQueries(0):
+            object_permission_map(user, prefetched, ['submit'], OpeningChecklistViewSet.role_map)
+
+    def test_filter_allowed_queryset_and_list(self):
+        user = self._user()
+        qs = filter_allowed(user, 'approve', OpeningChecklist.objects.all(), OpeningChecklistViewSet.role_map)
+        self.assertEqual(set(qs.values_list('pk', flat=True)), {self.checklists['Client'].pk})
+        objs = list(ConstructionObject.objects.all())
+        allowed = filter_allowed(user, 'activate', objs, ConstructionObjectViewSet.role_map)
+        self.assertEqual([o.pk for o in allowed], [self.inspected.pk])
+
+    def test_list_response_has_allowed_actions(self):
+        api = APIClient()
+        api.login(username="bulkperm", password="pass123")
+        resp = api.get('/api/opening-checklists/')
+        self.assertEqual(resp.status_code, 200)
+        rows = resp.json()
+        rows = rows.get('results', rows) if isinstance(rows, dict) else rows
+        by_id = {row['id']: row['allowed_actions'] for row in rows}
+        self.assertEqual(by_id[str(self.checklists['Client'].pk)], ['approve', 'reject'])
+        self.assertEqual(by_id[str(self.checklists['Foreman'].pk)], ['submit'])
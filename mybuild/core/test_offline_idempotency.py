@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.services.offline import create_or_get_offline
+from materials.models import Delivery, MaterialType
+from objects.models import ConstructionObject
+from orgs.models import Organization
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class OfflineIdempotencyTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Idem Org")
+        self.user = User.objects.create_user(username="idem", password="pass123")
+        self.other = User.objects.create_user(username="idem2", password="pass123")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Idem site", polygon=POLYGON)
+        self.material = MaterialType.objects.create(name="Арматура", unit="т")
+
+    def defaults(self, user):
+        return {
+            'object': self.obj, 'material': self.material, 'quantity': 3, 'delivered_at': timezone.now(),
+            'offline_batch_id': 'batch-1', 'created_by': user,
+        }
+
+    def create(self, user):
+        return create_or_get_offline(Delivery, offline_batch_id='batch-1', user=user, defaults=self.defaults(user))
+
+    def test_first_insert_is_single_statement_replay_returns_existing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            first, created = self.create(self.user)
+        # одна вставка; второй запрос — обновление последней поставки в ObjectStats
+        self.assertEqual(len(ctx), 2)
+        self.assertTrue(ctx[0]['sql'].startswith('INSERT'))
+        self.assertIn('objects_objectstats', ctx[1]['sql'])
+        self.assertTrue(created)
+        self.assertFalse(first._state.adding)
+        with self.assertNumQueries(2):
+            again, created_again = self.create(self.user)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(Delivery.objects.filter(offline_batch_id='batch-1').count(), 1)
+
+    def test_ignored_insert_without_existing_row_falls_back_to_save(self):
+        with mock.patch('core.services.offline.insert_ignore', return_value=False):
+            obj, created = self.create(self.user)
+        self.assertTrue(created)
+        self.assertTrue(Delivery.objects.filter(pk=obj.pk).exists())
+
+    def test_batch_id_is_scoped_per_author(self):
+        self.assertTrue(self.create(self.user)[1])
+        self.assertTrue(self.create(self.other)[1])
+        self.assertEqual(Delivery.objects.filter(offline_batch_id='batch-1').count(), 2)
+
+    def test_database_rejects_duplicate_batch_for_same_author(self):
+        self.create(self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Delivery.objects.create(**self.defaults(self.user))
+        # без batch id ограничение не действует
+        for _ in range(2):
+            Delivery.objects.create(**{**self.defaults(self.user), 'offline_batch_id': None})
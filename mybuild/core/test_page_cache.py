@@ -0,0 +1,77 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.services.page_cache import PageFragment, page_cache_stats
+from issues.models import Remark
+from objects.models import ConstructionObject
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Page Org")
+        self.user = User.objects.create_user(username="pager", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Page site", polygon=POLYGON)
+        self.client.login(username="pager", password="pass123")
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp.content.decode(), len(ctx)
+
+    def test_hit_skips_database_until_rows_change(self):
+        Remark.objects.create(object=self.obj, description="Трещина", category="Первое")
+        html, cold = self.get('/remarks/')
+        self.assertIn("Первое", html)
+        cached, warm = self.get('/remarks/')
+        self.assertIn("Первое", cached)
+        # остаются только сессия и пользователь
+        self.assertEqual(warm, 2)
+        self.assertLess(warm, cold)
+        Remark.objects.create(object=self.obj, description="Скол", category="Второе")
+        self.assertIn("Второе", self.get('/remarks/')[0])
+        self.assertEqual(page_cache_stats(['remarks_list'])['remarks_list'], {'hit': 1, 'miss': 2, 'wait': 0})
+
+    def test_scope_change_invalidates_and_query_string_varies(self):
+        html, _ = self.get('/objects/')
+        self.assertIn("Page site", html)
+        self.assertNotIn("Page site", self.get('/objects/?status=CLOSED')[0])
+        Membership.objects.filter(user=self.user).delete()
+        self.assertNotIn("Page site", self.get('/objects/')[0])
+
+    @override_settings(PAGE_CACHE_LOCK_TIMEOUT=5)
+    def test_concurrent_miss_is_built_once(self):
+        started, release = threading.Event(), threading.Event()
+        builds = []
+
+        def slow_render():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return 'html'
+
+        results = []
+        fragment = PageFragment('remarks_list', self.user)
+        builder = threading.Thread(target=lambda: results.append(fragment.render(slow_render)))
+        builder.start()
+        started.wait(5)
+        waiter = threading.Thread(target=lambda: results.append(PageFragment('remarks_list', self.user).render(slow_render)))
+        waiter.start()
+        while page_cache_stats(['remarks_list'])['remarks_list']['wait'] == 0:
+            time.sleep(0.01)
+        release.set()
+        builder.join()
+        waiter.join()
+        self.assertEqual(results, ['html', 'html'])
+        self.assertEqual(len(builds), 1)
@@ -0,0 +1,55 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.api import ConstructionObjectViewSet, RemarkViewSet
+from core.services.permission_matrix import get_permission_matrix
+from objects.models import ConstructionObject
+from orgs.models import Organization, Membership
+
+
+class PermissionMatrixTests(TestCase):
+    def setUp(self):
+        polygon = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+        self.org = Organization.objects.create(name="Matrix Org")
+        self.obj = ConstructionObject.objects.create(name="Matrix Obj", org=self.org, polygon=polygon)
+        self.user = User.objects.create_user(username="matrix", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="CLIENT")
+
+    def test_compiled_rules(self):
+        matrix = get_permission_matrix()
+        rules = matrix.rules_for(ConstructionObjectViewSet)
+        self.assertEqual(rules.required_roles('plan'), frozenset({'CLIENT'}))
+        self.assertEqual(rules.required_roles('list'), frozenset())
+        remark_rules = matrix.rules_for(RemarkViewSet)
+        self.assertEqual(remark_rules.model_rule('POST', 'create').perm, 'issues.add_remark')
+        self.assertEqual(remark_rules.model_rule('POST', 'create').groups, frozenset({'CLIENT'}))
+        self.assertEqual(remark_rules.model_rule('POST', 'close').perm, 'issues.change_remark')
+        self.assertIsNone(remark_rules.model_rule('GET', 'list'))
+
+    def test_group_fast_path_skips_permission_loading(self):
+        self.user.groups.add(Group.objects.get_or_create(name='CLIENT')[0])
+        api = APIClient()
+        api.login(username="matrix", password="pass123")
+        with mock.patch.object(User, 'has_perm', autospec=True) as has_perm:
+            resp = api.post('/api/remarks/', {'object': str(self.obj.pk), 'description': 'x'}, format='json')
+        self.assertNotEqual(resp.status_code, 403, resp.content)
+        has_perm.assert_not_called()
+
+    def test_without_group_or_permission_denied(self):
+        api = APIClient()
+        api.login(username="matrix", password="pass123")
+        resp = api.post('/api/remarks/', {'object': str(self.obj.pk), 'description': 'x'}, format='json')
+        self.assertEqual(resp.status_code, 403)
+
+    def test_dump_command(self):
+        out = StringIO()
+        call_command('dump_permission_matrix', '--json', stdout=out)
+        rows = {row['viewset'].rsplit('.', 1)[-1]: row for row in json.loads(out.getvalue())}
+        self.assertEqual(rows['ConstructionObjectViewSet']['role_map']['activate'], ['INSPECTOR'])
+        self.assertEqual(rows['RemarkViewSet']['model_perms']['add']['groups'], ['CLIENT'])
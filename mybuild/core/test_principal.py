@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.test import TestCase
+
+from core.services.principal import get_principal, invalidate_principal
+from core.services.scope_cache import _build_snapshot, get_scope_snapshot
+from core.services.scoping import scope_qs_to_user
+from objects.models import ConstructionObject, ObjectAssignment
+from objects.permissions import roles
+from orgs.models import Organization, Membership
+
+
+class PrincipalTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Org Principal")
+        self.other_org = Organization.objects.create(name="Org Principal 2")
+        self.user = User.objects.create_user(username="principal", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        polygon = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+        self.obj = ConstructionObject.objects.create(name="Own", org=self.org, polygon=polygon)
+        self.foreign = ConstructionObject.objects.create(name="Foreign", org=self.other_org, polygon=polygon)
+        ObjectAssignment.objects.create(object=self.foreign, user=self.user, role="INSPECTOR")
+        self.user.groups.add(Group.objects.get_or_create(name="FOREMAN")[0])
+        self.user = User.objects.get(pk=self.user.pk)
+
+    def test_facts_resolved_once(self):
+        principal = get_principal(self.user)
+        with self.assertNumQueries(3):
+            self.assertEqual(principal.org_ids, frozenset({self.org.id}))
+            self.assertEqual(principal.roles_for_object(self.foreign.id), frozenset({"INSPECTOR"}))
+            self.assertTrue(principal.has_group("FOREMAN"))
+        with self.assertNumQueries(0):
+            self.assertIs(get_principal(self.user), principal)
+            self.assertEqual(principal.membership_roles, frozenset({"FOREMAN"}))
+            self.assertTrue(roles.is_foreman(self.user))
+            self.assertFalse(roles.is_client(self.user))
+
+    def test_scoping_reuses_principal(self):
+        list(scope_qs_to_user(ConstructionObject.objects.all(), self.user))
+        with self.assertNumQueries(1):
+            ids = set(scope_qs_to_user(ConstructionObject.objects.all(), self.user).values_list("id", flat=True))
+        self.assertEqual(ids, {self.obj.id})
+
+    def test_invalidate(self):
+        principal = get_principal(self.user)
+        self.assertEqual(principal.org_ids, frozenset({self.org.id}))
+        Membership.objects.create(user=self.user, org=self.other_org, role="CLIENT")
+        invalidate_principal(self.user)
+        self.assertEqual(get_principal(self.user).org_ids, frozenset({self.org.id, self.other_org.id}))
+
+    def test_shared_snapshot_skips_identity_queries(self):
+        get_principal(self.user).org_ids
+        fresh = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            principal = get_principal(fresh)
+            self.assertEqual(principal.org_ids, frozenset({self.org.id}))
+            self.assertTrue(principal.has_group("FOREMAN"))
+
+    def test_group_change_invalidates_snapshot(self):
+        self.assertFalse(get_principal(self.user).has_group("CLIENT"))
+        client_group = Group.objects.get_or_create(name="CLIENT")[0]
+        client_group.user_set.add(self.user)
+        fresh = User.objects.get(pk=self.user.pk)
+        self.assertTrue(get_principal(fresh).has_group("CLIENT"))
+        self.user.groups.remove(client_group)
+        fresh = User.objects.get(pk=self.user.pk)
+        self.assertFalse(get_principal(fresh).has_group("CLIENT"))
+
+    def test_assignment_change_invalidates_snapshot(self):
+        self.assertIn(self.foreign.id, get_principal(self.user).object_ids)
+        ObjectAssignment.objects.filter(object=self.foreign, user=self.user).delete()
+        fresh = User.objects.get(pk=self.user.pk)
+        self.assertNotIn(self.foreign.id, get_principal(fresh).object_ids)
+
+    def test_snapshot_read_during_open_transaction_is_discarded_after_commit(self):
+        stale = _build_snapshot(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Membership.objects.filter(user=self.user).delete()
+                # конкурентный запрос еще видит членство и кеширует снимок под новой версией
+                with mock.patch('core.services.scope_cache._build_snapshot', return_value=dict(stale)):
+                    self.assertTrue(get_scope_snapshot(self.user.pk)['orgs'])
+        self.assertEqual(get_scope_snapshot(self.user.pk)['orgs'], [])
+        fresh = User.objects.get(pk=self.user.pk)
+        self.assertEqual(get_principal(fresh).org_ids, frozenset())
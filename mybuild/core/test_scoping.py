@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core.services.scoping import scope_qs_to_user
+from issues.models import Remark
+from objects.models import ConstructionObject, ObjectAssignment
+from orgs.models import Organization, Membership
+
+
+class SubqueryScopingTests(TestCase):
+    def setUp(self):
+        polygon = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+        self.org = Organization.objects.create(name="Scope Own")
+        self.other = Organization.objects.create(name="Scope Other")
+        self.user = User.objects.create_user(username="scoped", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.own = ConstructionObject.objects.create(name="Own", org=self.org, polygon=polygon)
+        self.assigned = ConstructionObject.objects.create(name="Assigned", org=self.other, polygon=polygon)
+        self.hidden = ConstructionObject.objects.create(name="Hidden", org=self.other, polygon=polygon)
+        ObjectAssignment.objects.create(object=self.assigned, user=self.user, role="FOREMAN")
+        self.remarks = {o.name: Remark.objects.create(object=o) for o in (self.own, self.assigned, self.hidden)}
+
+    def _visible(self, model):
+        qs = scope_qs_to_user(model.objects.all(), User.objects.get(pk=self.user.pk))
+        self.assertFalse(qs.query.distinct)
+        return set(qs.values_list("pk", flat=True))
+
+    def test_inline_predicates(self):
+        self.assertEqual(self._visible(ConstructionObject), {self.own.pk})
+        self.assertEqual(self._visible(Remark), {self.remarks["Own"].pk, self.remarks["Assigned"].pk})
+
+    @override_settings(SCOPE_INLINE_IDS_MAX=0)
+    def test_subquery_predicates(self):
+        self.assertEqual(self._visible(ConstructionObject), {self.own.pk})
+        self.assertEqual(self._visible(Remark), {self.remarks["Own"].pk, self.remarks["Assigned"].pk})
+
+    def test_user_without_scope_sees_nothing(self):
+        stranger = User.objects.create_user(username="stranger", password="pass123")
+        self.assertFalse(scope_qs_to_user(Remark.objects.all(), stranger).exists())
@@ -0,0 +1,94 @@
+from django.contrib.auth.models import Group, User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.services.spatial_index import GridIndex, SpatialIndex, get_spatial_index, reset_spatial_index
+from objects.models import ConstructionObject
+from orgs.models import Organization, Membership
+
+
+def square(x, y, size=0.001):
+    return {"type": "Polygon", "coordinates": [[[x, y], [x, y + size], [x + size, y + size], [x + size, y], [x, y]]]}
+
+
+TRIANGLE = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 0], [0, 0]]]}
+
+
+class GridIndexTests(SimpleTestCase):
+    def test_exact_refinement_and_removal(self):
+        grid = GridIndex(cell_deg=0.5)
+        grid.upsert('tri', 'org', None, TRIANGLE)
+        grid.upsert('far', 'org', None, square(10, 10))
+        self.assertEqual(grid.locate(0.2, 0.2), [('tri', 'org')])
+        # внутри bbox треугольника, но вне полигона
+        self.assertEqual(grid.locate(0.9, 0.9), [])
+        grid.remove('tri')
+        self.assertEqual(grid.locate(0.2, 0.2), [])
+        self.assertEqual(len(grid), 1)
+
+    def test_oversized_and_org_filter(self):
+        grid = GridIndex(cell_deg=0.001, max_cells=10)
+        grid.upsert('big', 'a', None, square(0, 0, size=1))
+        self.assertEqual(grid.locate(0.5, 0.5), [('big', 'a')])
+        self.assertEqual(grid.locate(0.5, 0.5, org_ids=['b']), [])
+
+    def test_degenerate_polygon_not_indexed(self):
+        grid = GridIndex()
+        grid.upsert('bad', 'a', None, {"type": "Polygon", "coordinates": [[]]})
+        self.assertEqual(len(grid), 0)
+
+
+class LocateEndpointTests(TestCase):
+    def setUp(self):
+        reset_spatial_index()
+        self.org = Organization.objects.create(name="Locate Org")
+        self.other = Organization.objects.create(name="Locate Other")
+        self.user = User.objects.create_user(username="locator", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="INSPECTOR")
+        self.own = ConstructionObject.objects.create(name="Own site", org=self.org, polygon=square(37.6, 55.7))
+        self.foreign = ConstructionObject.objects.create(name="Foreign site", org=self.other, polygon=square(37.6, 55.7))
+        self.api = APIClient()
+        self.api.login(username="locator", password="pass123")
+
+    def tearDown(self):
+        reset_spatial_index()
+
+    def test_locate_is_scoped(self):
+        resp = self.api.get('/api/objects/locate/', {'lat': 55.7005, 'lon': 37.6005})
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual([row['id'] for row in resp.json()], [str(self.own.pk)])
+        resp = self.api.get('/api/objects/locate/', {'lat': 55.8, 'lon': 37.6005})
+        self.assertEqual(resp.json(), [])
+
+    def test_inspector_group_without_membership_sees_all(self):
+        point = {'lat': 55.7005, 'lon': 37.6005}
+        inspector = User.objects.create_user(username="field_inspector", password="pass123")
+        inspector.groups.add(Group.objects.get_or_create(name="INSPECTOR")[0])
+        self.api.login(username="field_inspector", password="pass123")
+        ids = {row['id'] for row in self.api.get('/api/objects/locate/', point).json()}
+        self.assertEqual(ids, {str(self.own.pk), str(self.foreign.pk)})
+
+    def test_invalid_coordinates(self):
+        self.assertEqual(self.api.get('/api/objects/locate/', {'lat': 'x', 'lon': 1}).status_code, 400)
+        self.assertEqual(self.api.get('/api/objects/locate/', {'lat': 95, 'lon': 1}).status_code, 400)
+
+    def test_incremental_update_after_commit(self):
+        index = get_spatial_index()
+        self.assertEqual([oid for oid, _ in index.locate(37.6005, 55.7005)].count(self.own.pk), 1)
+        self.own.polygon = square(30.0, 50.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.own.save()
+        self.assertEqual(index.grid.locate(37.6005, 55.7005, [self.org.pk]), [])
+        self.assertEqual(index.grid.locate(30.0005, 50.0005), [(self.own.pk, self.org.pk)])
+
+    @override_settings(SPATIAL_INDEX_CHECK_INTERVAL=0)
+    def test_other_worker_reconciles_by_version(self):
+        worker = SpatialIndex()
+        worker.sync()
+        self.own.polygon = square(30.0, 50.0)
+        self.own.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            ConstructionObject.objects.filter(pk=self.foreign.pk).delete()
+        worker.sync()
+        self.assertEqual(worker.grid.locate(30.0005, 50.0005), [(self.own.pk, self.org.pk)])
+        self.assertEqual(worker.grid.locate(37.6005, 55.7005), [])
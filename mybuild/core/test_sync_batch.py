@@ -0,0 +1,131 @@
+import uuid
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit.models import AuditLog
+from inspections.models import InspectionVisit, PresenceConfirmation
+from inspections.services import get_active_visit
+from issues.models import Remark
+from materials.models import Delivery, MaterialType
+from notifications.models import Notification
+from objects.models import ConstructionObject
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class SyncBatchTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Sync Org")
+        self.other = Organization.objects.create(name="Sync Other")
+        self.user = User.objects.create_user(username="syncer", password="pass123")
+        for codename in ("add_delivery", "add_remark", "add_inspectionvisit", "add_presenceconfirmation"):
+            self.user.user_permissions.add(Permission.objects.get(codename=codename))
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Sync site", polygon=POLYGON)
+        self.foreign = ConstructionObject.objects.create(org=self.other, name="Foreign", polygon=POLYGON)
+        self.material = MaterialType.objects.create(name="Цемент", unit="т")
+        self.api = APIClient()
+        self.api.login(username="syncer", password="pass123")
+
+    def delivery(self, batch_id, obj=None, **extra):
+        data = {
+            "object": str((obj or self.obj).pk),
+            "material": str(self.material.pk),
+            "quantity": "5.000",
+            "delivered_at": timezone.now().isoformat(),
+            "offline_batch_id": batch_id,
+        }
+        data.update(extra)
+        return {"kind": "delivery", "data": data}
+
+    def post(self, items):
+        # аудит внутри транзакции пакета попадает в буфер в on_commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.api.post('/api/sync/batch/', {"items": items}, format='json')
+
+    def test_batch_creates_replays_and_fails_per_item(self):
+        Delivery.objects.create(object=self.obj, material=self.material, quantity=1, delivered_at=timezone.now(),
+                                created_by=self.user, offline_batch_id='old')
+        items = [
+            self.delivery('new-1'),
+            self.delivery('old'),
+            self.delivery('new-1'),  # повтор внутри пакета
+            self.delivery('foreign', obj=self.foreign),
+            self.delivery('bad', quantity='many'),
+            {"kind": "remark", "data": {"object": str(self.obj.pk), "description": "Трещина", "offline_batch_id": "r-1"}},
+            {"kind": "violation", "data": {"object": str(self.obj.pk)}},  # нет права add_violation
+            {"kind": "unknown", "data": {}},
+        ]
+        resp = self.post(items)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        statuses = [r['status'] for r in resp.data['results']]
+        self.assertEqual(statuses, ['created', 'replayed', 'replayed', 'failed', 'failed', 'created', 'failed', 'failed'])
+        results = resp.data['results']
+        self.assertEqual(results[0]['id'], results[2]['id'])
+        self.assertIn('object', results[3]['errors'])
+        self.assertIn('quantity', results[4]['errors'])
+        self.assertEqual(resp.data['summary'], {'created': 2, 'replayed': 2, 'failed': 4})
+
+        created = Delivery.objects.get(offline_batch_id='new-1')
+        self.assertEqual(created.created_by, self.user)
+        self.assertTrue(created.was_offline)
+        self.assertTrue(Remark.objects.filter(offline_batch_id='r-1', created_by=self.user).exists())
+        self.assertEqual(AuditLog.objects.filter(action='create_delivery', object_id=str(created.pk)).count(), 1)
+        self.assertEqual(AuditLog.objects.filter(action='replay_delivery').count(), 2)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+
+        # повторная отправка того же пакета ничего не создает
+        again = self.post(items[:3])
+        self.assertEqual([r['status'] for r in again.data['results']], ['replayed'] * 3)
+        self.assertEqual(Delivery.objects.filter(offline_batch_id='new-1').count(), 1)
+
+    def test_visit_and_confirmation_in_one_batch(self):
+        visit_id = str(uuid.uuid4())
+        items = [
+            {"kind": "presence_confirmation", "data": {"visit": visit_id, "method": "GPS", "offline_batch_id": "p-1"}},
+            {"kind": "inspection_visit", "id": visit_id,
+             "data": {"object": str(self.obj.pk), "latitude": 0.5, "longitude": 0.5, "offline_batch_id": "v-1"}},
+        ]
+        resp = self.post(items)
+        self.assertEqual([r['status'] for r in resp.data['results']], ['created', 'created'])
+        visit = InspectionVisit.objects.get(pk=visit_id)
+        self.assertEqual(visit.inspector, self.user)
+        self.assertTrue(PresenceConfirmation.objects.filter(visit=visit).exists())
+        # post_save отправлен вручную — реестр активных визитов видит новый визит
+        self.assertIsNotNone(get_active_visit(self.user.pk, self.obj.pk))
+
+    def test_confirmation_batch_id_is_scoped_to_inspector(self):
+        stranger = User.objects.create_user(username="sync_stranger", password="pass123")
+        theirs = InspectionVisit.objects.create(object=self.foreign, inspector=stranger, latitude=0.5, longitude=0.5)
+        foreign_row = PresenceConfirmation.objects.create(visit=theirs, method="GPS", offline_batch_id="p-shared")
+        mine = InspectionVisit.objects.create(object=self.obj, inspector=self.user, latitude=0.5, longitude=0.5)
+        item = {"kind": "presence_confirmation",
+                "data": {"visit": str(mine.pk), "method": "GPS", "offline_batch_id": "p-shared"}}
+        result = self.post([item]).data['results'][0]
+        self.assertEqual(result['status'], 'created')
+        self.assertNotEqual(result['id'], str(foreign_row.pk))
+        self.assertEqual(self.post([item]).data['results'][0], {**result, 'status': 'replayed'})
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def run(prefix, n):
+            items = [self.delivery(f'{prefix}-{i}') for i in range(n)]
+            # аудит пишется после коммита одним bulk_create и здесь не считается
+            with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+                resp = self.api.post('/api/sync/batch/', {"items": items}, format='json')
+            self.assertEqual(resp.data['summary']['created'], n)
+            return len(ctx.captured_queries)
+
+        run('warm', 1)  # снимок скоупа и прав пользователя кешируется первым запросом
+        self.assertEqual(run('s', 2), run('l', 50))
+
+    def test_envelope_errors(self):
+        self.assertEqual(self.api.post('/api/sync/batch/', {"items": "x"}, format='json').status_code, 400)
+        with self.settings(SYNC_BATCH_MAX=2):
+            resp = self.post([self.delivery(f'x-{i}') for i in range(3)])
+        self.assertEqual(resp.status_code, 400)
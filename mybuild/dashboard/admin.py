@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import KpiSnapshot
 
-# Register your models here.
+
+@admin.register(KpiSnapshot)
+class KpiSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['date', 'org', 'object', 'quality_score', 'issues_total', 'critical_issues', 'deliveries_count']
+    list_filter = ['date']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    ordering = ['-date']
@@ -1,3 +1,44 @@
 from django.db import models
 
-# Create your models here.
+from core.models import BaseModel
+
+
+class KpiSnapshot(BaseModel):
+    """KPI объекта (object задан) или организации (object пуст) на конец дня (см. dashboard.rollups)."""
+    date = models.DateField()
+    org = models.ForeignKey('orgs.Organization', on_delete=models.CASCADE, related_name='kpi_snapshots')
+    object = models.ForeignKey(
+        'objects.ConstructionObject', on_delete=models.CASCADE, null=True, blank=True, related_name='kpi_snapshots',
+    )
+    objects_total = models.IntegerField(default=0)
+    objects_active = models.IntegerField(default=0)
+    checklists_total = models.IntegerField(default=0)
+    checklists_approved = models.IntegerField(default=0)
+    checklists_overdue = models.IntegerField(default=0)
+    issues_total = models.IntegerField(default=0)
+    critical_issues = models.IntegerField(default=0)
+    # {'remark': {'OPEN': 3, ...}, 'violation': {...}}
+    issues_by_status = models.JSONField(default=dict)
+    open_issues_by_severity = models.JSONField(default=dict)
+    deliveries_count = models.IntegerField(default=0)
+    # {'т': '12.500', 'м3': '4.000'} — объемы за день по единицам измерения
+    deliveries_by_unit = models.JSONField(default=dict)
+    quality_score = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Снимок KPI'
+        verbose_name_plural = 'Снимки KPI'
+        constraints = [
+            models.UniqueConstraint(fields=['object', 'date'], condition=models.Q(object__isnull=False),
+                                    name='kpi_object_day_uniq'),
+            models.UniqueConstraint(fields=['org', 'date'], condition=models.Q(object__isnull=True),
+                                    name='kpi_org_day_uniq'),
+        ]
+        indexes = [
+            # ряды: (объект, диапазон дат) и (организация, диапазон дат)
+            models.Index(fields=['object', 'date'], name='kpi_object_series_idx'),
+            models.Index(fields=['org', 'date'], name='kpi_org_series_idx'),
+        ]
+
+    def __str__(self):
+        return f'KPI {self.object_id or self.org_id} на {self.date}'
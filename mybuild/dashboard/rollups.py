@@ -0,0 +1,315 @@
+"""Ежедневные снимки KPI объектов и организаций (dashboard.models.KpiSnapshot).
+
+Графики трендов («индекс качества за 90 дней», раздел аналитики) читают
+только снимки: одна строка на (день, объект) и на (день, организация),
+поэтому год истории — несколько сотен строк по индексу без пересчета
+сырых таблиц (series()).
+
+- rollup_day(day) — ночное задание (команда rollup_kpis): статусы и
+  серьезность берутся из текущего состояния строк сгруппированными
+  агрегатами. Запускать вскоре после полуночи за прошедший день.
+- backfill(start, end) — восстановление истории. Наличие строки на день
+  определяется по created_at, статус и серьезность на конец дня — по diff
+  записей AuditLog ({'status': {'from': ..., 'to': ...}}), включая
+  перенесенные archive_auditlog в архив (AUDIT_ARCHIVE_DIR). Без записей
+  аудита (в том числе если файлы архива удалены) берется текущее
+  значение. Удаленные строки в истории не видны.
+
+Поставки в обоих случаях считаются за день по delivered_at, индекс
+качества — как на панели (dashboard.services.quality_score). Снимки дня
+перезаписываются целиком, повторный запуск идемпотентен.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from objects.services.stats import OPEN_STATUSES
+from .services import OVERDUE_DAYS, ObjectMetrics, quality_score
+
+SERIES_FIELDS = (
+    'objects_total', 'objects_active', 'checklists_total', 'checklists_approved', 'checklists_overdue',
+    'issues_total', 'critical_issues', 'issues_by_status', 'open_issues_by_severity', 'deliveries_count',
+    'deliveries_by_unit', 'quality_score',
+)
+DEFAULT_SERIES_FIELDS = ('quality_score', 'checklists_total', 'checklists_approved', 'issues_total', 'critical_issues')
+# критичными, как и на панели, считаются открытые замечания CRITICAL и нарушения HIGH
+CRITICAL = {'remark': 'CRITICAL', 'violation': 'HIGH'}
+QUANTITY_STEP = Decimal('0.001')  # точность Delivery.quantity
+
+
+class _Counts:
+    """Накопитель KPI одного объекта (или организации) за день."""
+
+    def __init__(self) -> None:
+        self.objects_total = 0
+        self.objects_active = 0
+        self.checklists_total = 0
+        self.checklists_approved = 0
+        self.checklists_overdue = 0
+        self.issues_by_status: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.open_issues_by_severity: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.deliveries_count = 0
+        self.deliveries_by_unit: Dict[str, Decimal] = defaultdict(Decimal)
+
+    def add_object(self, status: str) -> None:
+        self.objects_total += 1
+        self.objects_active += status == 'ACTIVE'
+
+    def add_checklists(self, status: str, n: int = 1, overdue: int = 0) -> None:
+        self.checklists_total += n
+        self.checklists_approved += n if status == 'APPROVED' else 0
+        self.checklists_overdue += overdue
+
+    def add_issues(self, kind: str, status: str, severity: str, n: int = 1) -> None:
+        self.issues_by_status[kind][status] += n
+        if status in OPEN_STATUSES:
+            self.open_issues_by_severity[kind][severity] += n
+
+    def add_deliveries(self, unit: str, n: int, quantity: Decimal) -> None:
+        self.deliveries_count += n
+        self.deliveries_by_unit[unit] += Decimal(quantity or 0)
+
+    def merge(self, other: '_Counts') -> None:
+        for field in ('objects_total', 'objects_active', 'checklists_total', 'checklists_approved',
+                      'checklists_overdue', 'deliveries_count'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        for mine, theirs in ((self.issues_by_status, other.issues_by_status),
+                             (self.open_issues_by_severity, other.open_issues_by_severity)):
+            for kind, counts in theirs.items():
+                for key, n in counts.items():
+                    mine[kind][key] += n
+        for unit, quantity in other.deliveries_by_unit.items():
+            self.deliveries_by_unit[unit] += quantity
+
+    def fields(self) -> dict:
+        issues_total = sum(n for counts in self.issues_by_status.values() for n in counts.values())
+        totals = ObjectMetrics(total_checks=self.checklists_total, completed_checks=self.checklists_approved,
+                               issues=issues_total)
+        return {
+            'objects_total': self.objects_total,
+            'objects_active': self.objects_active,
+            'checklists_total': self.checklists_total,
+            'checklists_approved': self.checklists_approved,
+            'checklists_overdue': self.checklists_overdue,
+            'issues_total': issues_total,
+            'critical_issues': sum(self.open_issues_by_severity[kind][sev] for kind, sev in CRITICAL.items()),
+            'issues_by_status': {kind: dict(c) for kind, c in self.issues_by_status.items()},
+            'open_issues_by_severity': {kind: dict(c) for kind, c in self.open_issues_by_severity.items() if c},
+            'deliveries_count': self.deliveries_count,
+            'deliveries_by_unit': {unit: str(Decimal(q).quantize(QUANTITY_STEP)) for unit, q in self.deliveries_by_unit.items()},
+            'quality_score': quality_score(totals),
+        }
+
+
+def _day_end(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _overdue_before(day: date) -> date:
+    return day - timedelta(days=OVERDUE_DAYS)
+
+
+def _overdue_q(day: date) -> Q:
+    return Q(status='DRAFT', created_at__date__lt=_overdue_before(day))
+
+
+def _issue_models():
+    from issues.models import Remark, Violation
+    return ((Remark, 'remark'), (Violation, 'violation'))
+
+
+def _checklist_models():
+    from objects.models import DailyChecklist, OpeningChecklist
+    return (OpeningChecklist, DailyChecklist)
+
+
+def _add_deliveries(per_day: Dict[date, Dict[object, _Counts]], start: date, end: date) -> None:
+    from materials.models import Delivery
+
+    rows = (
+        Delivery.objects.filter(delivered_at__gte=_day_end(start - timedelta(days=1)), delivered_at__lt=_day_end(end))
+        .annotate(day=TruncDate('delivered_at'))
+        .values('day', 'object_id', 'material__unit')
+        .annotate(n=Count('id'), quantity=Sum('quantity'))
+        .order_by()
+    )
+    for row in rows:
+        if row['day'] in per_day:
+            per_day[row['day']][row['object_id']].add_deliveries(row['material__unit'], row['n'], row['quantity'])
+
+
+def _write(day: date, per_object: Dict[object, _Counts], org_of: Dict[object, object]) -> int:
+    from .models import KpiSnapshot
+
+    per_org: Dict[object, _Counts] = defaultdict(_Counts)
+    rows = []
+    for object_id, counts in per_object.items():
+        org_id = org_of.get(object_id)
+        if org_id is None:
+            continue  # поставка по объекту, созданному позже дня снимка
+        per_org[org_id].merge(counts)
+        rows.append(KpiSnapshot(date=day, org_id=org_id, object_id=object_id, **counts.fields()))
+    rows += [KpiSnapshot(date=day, org_id=org_id, object=None, **counts.fields()) for org_id, counts in per_org.items()]
+    with transaction.atomic():
+        KpiSnapshot.objects.filter(date=day).delete()
+        KpiSnapshot.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def rollup_day(day: Optional[date] = None) -> int:
+    """Снимки за day (по умолчанию вчера) из текущего состояния строк; возвращает число строк."""
+    from objects.models import ConstructionObject
+
+    day = day or timezone.now().date() - timedelta(days=1)
+    end = _day_end(day)
+    per_object: Dict[object, _Counts] = defaultdict(_Counts)
+    org_of = {}
+    for object_id, org_id, status in ConstructionObject.objects.filter(created_at__lt=end).values_list('id', 'org_id', 'status'):
+        org_of[object_id] = org_id
+        per_object[object_id].add_object(status)
+    for model in _checklist_models():
+        rows = (
+            model.objects.filter(created_at__lt=end).values('object_id', 'status')
+            .annotate(n=Count('id'), overdue=Count('id', filter=_overdue_q(day))).order_by()
+        )
+        for row in rows:
+            per_object[row['object_id']].add_checklists(row['status'], row['n'], row['overdue'])
+    for model, kind in _issue_models():
+        rows = model.objects.filter(created_at__lt=end).values('object_id', 'status', 'severity').annotate(n=Count('id')).order_by()
+        for row in rows:
+            per_object[row['object_id']].add_issues(kind, row['status'], row['severity'], row['n'])
+    per_day = {day: per_object}
+    _add_deliveries(per_day, day, day)
+    return _write(day, per_object, org_of)
+
+
+class _History:
+    """Значения полей строк модели на момент времени по diff записей AuditLog.
+
+    Записи старше AUDIT_RETENTION_DAYS лежат в архиве (audit.retention) — они
+    дочитываются, если период начинается раньше горизонта архива. Значение до
+    since берется из «from» первого изменения после него, поэтому архив
+    читается только за [since, until).
+    """
+
+    def __init__(self, label: str, fields: Sequence[str], since: datetime, until: datetime) -> None:
+        from audit.models import AuditLog
+        from audit.retention import archive_horizon, read_model_archive
+
+        events: Dict[str, Dict[str, List[Tuple[datetime, object, object]]]] = defaultdict(lambda: defaultdict(list))
+
+        def add(row_id, created_at, context) -> None:
+            diff = (context or {}).get('diff') or {}
+            for field in fields:
+                change = diff.get(field)
+                if isinstance(change, dict) and 'to' in change:
+                    events[row_id][field].append((created_at, change.get('from'), change['to']))
+
+        horizon = archive_horizon()
+        # после сбоя архивирования запись может быть и в таблице, и в архиве
+        cold = {r['id']: r for r in read_model_archive(label, since, until)} if horizon and horizon >= since else {}
+        entries = (
+            AuditLog.objects.filter(model=label, created_at__lt=until)
+            .order_by('created_at', 'id').values_list('id', 'object_id', 'created_at', 'context')
+        )
+        for entry_id, row_id, created_at, context in entries.iterator(chunk_size=2000):
+            cold.pop(str(entry_id), None)
+            add(row_id, created_at, context)
+        for record in cold.values():
+            add(record['object_id'], record['created_at'], record['context'])
+        if cold:
+            for by_field in events.values():
+                for changes in by_field.values():
+                    changes.sort(key=lambda change: change[0])
+        self.events = events
+        self.moments = {
+            row_id: {field: [e[0] for e in changes] for field, changes in by_field.items()}
+            for row_id, by_field in events.items()
+        }
+
+    def value_at(self, row_id, field: str, moment: datetime, current, default):
+        changes = self.events.get(str(row_id), {}).get(field)
+        if not changes:
+            return current
+        i = bisect_right(self.moments[str(row_id)][field], moment)
+        if i:
+            return changes[i - 1][2]
+        # до первого изменения: его «from», а если это снимок создания — значение по умолчанию
+        return changes[0][1] if changes[0][1] is not None else default
+
+
+def _default(model, field: str):
+    return model._meta.get_field(field).get_default()
+
+
+def backfill(start: date, end: date) -> int:
+    """Снимки за дни [start, end] по истории AuditLog и created_at; возвращает число строк."""
+    from objects.models import ConstructionObject
+
+    since, until = _day_end(start - timedelta(days=1)), _day_end(end)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    objects = list(ConstructionObject.objects.filter(created_at__lt=until).values_list('id', 'org_id', 'created_at', 'status'))
+    object_history = _History(ConstructionObject._meta.label_lower, ('status',), since, until)
+    checklists = []
+    for model in _checklist_models():
+        history = _History(model._meta.label_lower, ('status',), since, until)
+        rows = model.objects.filter(created_at__lt=until).values_list('id', 'object_id', 'created_at', 'status')
+        checklists.append((model, history, list(rows)))
+    issues = []
+    for model, kind in _issue_models():
+        history = _History(model._meta.label_lower, ('status', 'severity'), since, until)
+        rows = model.objects.filter(created_at__lt=until).values_list('id', 'object_id', 'created_at', 'status', 'severity')
+        issues.append((model, kind, history, list(rows)))
+
+    per_day: Dict[date, Dict[object, _Counts]] = {day: defaultdict(_Counts) for day in days}
+    for day in days:
+        moment = _day_end(day)
+        per_object = per_day[day]
+        for object_id, _, created_at, status in objects:
+            if created_at < moment:
+                status = object_history.value_at(object_id, 'status', moment, status, _default(ConstructionObject, 'status'))
+                per_object[object_id].add_object(status)
+        for model, history, rows in checklists:
+            for row_id, object_id, created_at, status in rows:
+                if created_at < moment:
+                    status = history.value_at(row_id, 'status', moment, status, _default(model, 'status'))
+                    overdue = int(status == 'DRAFT' and created_at.date() < _overdue_before(day))
+                    per_object[object_id].add_checklists(status, overdue=overdue)
+        for model, kind, history, rows in issues:
+            for row_id, object_id, created_at, status, severity in rows:
+                if created_at < moment:
+                    status = history.value_at(row_id, 'status', moment, status, _default(model, 'status'))
+                    severity = history.value_at(row_id, 'severity', moment, severity, severity)
+                    per_object[object_id].add_issues(kind, status, severity)
+    _add_deliveries(per_day, start, end)
+    written = 0
+    for day in days:
+        moment = _day_end(day)
+        alive = {object_id: org_id for object_id, org_id, created_at, _ in objects if created_at < moment}
+        written += _write(day, per_day[day], alive)
+    return written
+
+
+def series(user, *, org_id=None, object_id=None, start: date, end: date,
+           fields: Iterable[str] = DEFAULT_SERIES_FIELDS) -> List[dict]:
+    """Точки ряда [{date, поля...}] объекта или организации; читает только снимки."""
+    from .models import KpiSnapshot
+
+    qs = KpiSnapshot.objects.filter(date__gte=start, date__lte=end)
+    qs = qs.filter(object_id=object_id) if object_id else qs.filter(org_id=org_id, object__isnull=True)
+    if not user.is_superuser:
+        qs = qs.filter(org__in=user.memberships.values('org'))
+    fields = list(fields)
+    return [dict(zip(['date', *fields], row)) for row in qs.order_by('date').values_list('date', *fields)]
+
+
+__all__ = ['rollup_day', 'backfill', 'series', 'SERIES_FIELDS', 'DEFAULT_SERIES_FIELDS']
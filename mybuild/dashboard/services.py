@@ -0,0 +1,308 @@
+"""Метрики главной панели (dashboard).
+
+Раньше панель делала ~20 отдельных COUNT по подзапросу доступных объектов
+и еще по 6 COUNT на каждый из 5 активных объектов. Теперь счетчики
+читаются одним запросом из готовой таблицы objects.ObjectStats
+(LEFT JOIN к объектам), а зависящая от текущей даты просрочка считается
+одним сгруппированным запросом на модель чек-листа (object_metrics). Итоги
+панели, число активных объектов и прогресс качества считаются из этого же
+результата. Число запросов панели не зависит от числа объектов в скоупе.
+
+Каждый блок панели — отдельная функция над queryset доступных объектов,
+блоки независимы друг от друга. JSON-панель /api/dashboard/ (BLOCKS,
+load_block) выполняет их параллельно и кеширует каждый блок со своим TTL
+(core.services.page_cache).
+
+«Выполненный» чек-лист — в статусе APPROVED (статуса COMPLETED у моделей
+чек-листов нет).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Count, F, QuerySet, Value
+from django.utils import timezone
+
+from core.services.page_cache import PageFragment
+from objects.services.stats import OPEN_STATUSES, STATS_FIELDS, rebuild_stats
+
+OVERDUE_DAYS = 7
+LIST_SIZE = 5
+PROGRESS_OBJECTS = 5
+DEFAULT_QUALITY_SCORE = 85  # базовый показатель, пока нет ни одного чек-листа
+
+
+@dataclass
+class ObjectMetrics:
+    name: str = ''
+    active: bool = False
+    total_checks: int = 0
+    completed_checks: int = 0
+    overdue_checks: int = 0
+    issues: int = 0
+    critical_issues: int = 0
+
+    def add(self, other: 'ObjectMetrics') -> None:
+        self.total_checks += other.total_checks
+        self.completed_checks += other.completed_checks
+        self.overdue_checks += other.overdue_checks
+        self.issues += other.issues
+        self.critical_issues += other.critical_issues
+
+    @property
+    def percentage(self) -> int:
+        return int(self.completed_checks / self.total_checks * 100) if self.total_checks else 0
+
+
+def accessible_objects(user) -> QuerySet:
+    """Объекты панели: все для суперпользователя, иначе объекты организаций пользователя."""
+    from objects.models import ConstructionObject
+
+    if user.is_superuser:
+        return ConstructionObject.objects.all()
+    return ConstructionObject.objects.filter(org__in=user.memberships.values('org'))
+
+
+def _overdue_before(today: Optional[date] = None) -> date:
+    return (today or timezone.now().date()) - timedelta(days=OVERDUE_DAYS)
+
+
+def object_metrics(objects: QuerySet, today: Optional[date] = None) -> Dict[object, ObjectMetrics]:
+    """Счетчики по объектам (новые — первыми) из ObjectStats и просрочка чек-листов."""
+    from objects.models import DailyChecklist, OpeningChecklist
+
+    fields = ('id', 'name', 'status') + tuple(f'stats__{f}' for f in STATS_FIELDS)
+    rows = list(objects.order_by('-created_at').values(*fields))
+    missing = [row['id'] for row in rows if row['stats__opening_total'] is None]
+    if missing:
+        # объекты, созданные до появления ObjectStats, — строим строки один раз
+        rebuild_stats(missing)
+        rows = list(objects.order_by('-created_at').values(*fields))
+
+    metrics: Dict[object, ObjectMetrics] = {}
+    for row in rows:
+        stat = {f: row[f'stats__{f}'] or 0 for f in STATS_FIELDS}
+        metrics[row['id']] = ObjectMetrics(
+            name=row['name'],
+            active=row['status'] == 'ACTIVE',
+            total_checks=stat['opening_total'] + stat['daily_total'],
+            completed_checks=stat['opening_approved'] + stat['daily_approved'],
+            issues=stat['remarks_total'] + stat['violations_total'],
+            # критичными считаются открытые замечания CRITICAL и нарушения HIGH
+            critical_issues=stat['open_remarks_critical'] + stat['open_violations_high'],
+        )
+
+    overdue_before = _overdue_before(today)
+    for model in (OpeningChecklist, DailyChecklist):
+        overdue = (
+            model.objects.filter(object__in=objects, status='DRAFT', created_at__date__lt=overdue_before)
+            .values('object_id').annotate(n=Count('id')).order_by()
+        )
+        for row in overdue:
+            if row['object_id'] in metrics:
+                metrics[row['object_id']].overdue_checks += row['n']
+    return metrics
+
+
+def summarize(metrics: Iterable[ObjectMetrics]) -> ObjectMetrics:
+    total = ObjectMetrics()
+    for m in metrics:
+        total.add(m)
+    return total
+
+
+def quality_score(totals: ObjectMetrics) -> int:
+    if not totals.total_checks:
+        return DEFAULT_QUALITY_SCORE
+    completion_rate = totals.completed_checks / totals.total_checks * 100
+    issue_impact = min(totals.issues / totals.total_checks * 20, 30)  # до 30% снижения
+    return int(max(completion_rate - issue_impact, 0))
+
+
+def active_objects_count(metrics: Dict[object, ObjectMetrics]) -> int:
+    return sum(1 for m in metrics.values() if m.active)
+
+
+def quality_progress(metrics: Dict[object, ObjectMetrics]) -> List[dict]:
+    progress = []
+    for m in [m for m in metrics.values() if m.active][:PROGRESS_OBJECTS]:
+        progress.append({
+            'object_name': m.name,
+            'percentage': m.percentage,
+            'completed_checks': m.completed_checks,
+            'total_checks': m.total_checks,
+            'issues_count': m.issues,
+        })
+    return progress
+
+
+def recent_objects(objects: QuerySet) -> list:
+    return list(objects.select_related('org').order_by('-created_at')[:LIST_SIZE])
+
+
+def critical_issues_list(objects: QuerySet) -> list:
+    from issues.models import Remark, Violation
+
+    issues = []
+    for model, severity in ((Remark, 'CRITICAL'), (Violation, 'HIGH')):
+        issues += list(
+            model.objects.filter(object__in=objects, severity=severity, status__in=OPEN_STATUSES)
+            .select_related('object')[:3]
+        )
+    return sorted(issues, key=lambda x: x.created_at, reverse=True)[:LIST_SIZE]
+
+
+def overdue_checklists(objects: QuerySet, today: Optional[date] = None) -> list:
+    from objects.models import DailyChecklist, OpeningChecklist
+
+    today = today or timezone.now().date()
+    checklists = []
+    for model, title in ((OpeningChecklist, 'Вводный чек-лист'), (DailyChecklist, 'Ежедневный чек-лист')):
+        checklists += list(
+            model.objects.filter(object__in=objects, status='DRAFT', created_at__date__lt=_overdue_before(today))
+            .select_related('object')
+            .annotate(days_overdue=today - F('created_at__date'), type_display=Value(title))[:3]
+        )
+    return sorted(checklists, key=lambda x: x.created_at)[:LIST_SIZE]
+
+
+def upcoming_inspections(objects: QuerySet) -> list:
+    from objects.models import DailyChecklist, OpeningChecklist
+
+    checklists = []
+    for model, title in ((OpeningChecklist, 'Вводный чек-лист'), (DailyChecklist, 'Ежедневный чек-лист')):
+        checklists += list(
+            model.objects.filter(object__in=objects, status='DRAFT')
+            .select_related('object')
+            .annotate(days_until=Value(0), type_display=Value(title))
+            .order_by('-created_at')[:3]
+        )
+    return sorted(checklists, key=lambda x: x.created_at)[:LIST_SIZE]
+
+
+def recent_deliveries(objects: QuerySet) -> list:
+    from materials.models import Delivery
+
+    return list(
+        Delivery.objects.filter(object__in=objects).select_related('material', 'object').order_by('-delivered_at')[:LIST_SIZE]
+    )
+
+
+def dashboard_context(user) -> dict:
+    """Контекст шаблона dashboard/dashboard.html."""
+    objects = accessible_objects(user)
+    metrics = object_metrics(objects)
+    totals = summarize(metrics.values())
+    return {
+        'stats': {
+            'active_objects': active_objects_count(metrics),
+            'overdue_checklists': totals.overdue_checks,
+            'critical_issues': totals.critical_issues,
+            'quality_score': quality_score(totals),
+        },
+        'critical_issues': totals.critical_issues,
+        'recent_objects': recent_objects(objects),
+        'critical_issues_list': critical_issues_list(objects),
+        'overdue_checklists': overdue_checklists(objects),
+        'quality_progress': quality_progress(metrics),
+        'upcoming_inspections': upcoming_inspections(objects),
+        'recent_deliveries': recent_deliveries(objects),
+    }
+
+
+# ---------- JSON-блоки /api/dashboard/ ----------
+
+def _issue_data(issue) -> dict:
+    return {
+        'id': str(issue.pk),
+        'type': issue._meta.model_name,
+        'object_id': str(issue.object_id),
+        'object_name': issue.object.name,
+        'severity': issue.severity,
+        'status': issue.status,
+        'description': issue.description,
+        'created_at': issue.created_at.isoformat(),
+    }
+
+
+def _checklist_data(checklist, today: date) -> dict:
+    return {
+        'id': str(checklist.pk),
+        'type': checklist._meta.model_name,
+        'type_display': checklist.type_display,
+        'object_id': str(checklist.object_id),
+        'object_name': checklist.object.name,
+        'status': checklist.status,
+        'created_at': checklist.created_at.isoformat(),
+        'age_days': (today - checklist.created_at.date()).days,
+    }
+
+
+def summary_block(objects: QuerySet, today: date) -> dict:
+    metrics = object_metrics(objects, today)
+    totals = summarize(metrics.values())
+    return {
+        'active_objects': active_objects_count(metrics),
+        'overdue_checklists': totals.overdue_checks,
+        'critical_issues': totals.critical_issues,
+        'quality_score': quality_score(totals),
+    }
+
+
+def critical_issues_block(objects: QuerySet, today: date) -> list:
+    return [_issue_data(issue) for issue in critical_issues_list(objects)]
+
+
+def overdue_checklists_block(objects: QuerySet, today: date) -> list:
+    return [_checklist_data(c, today) for c in overdue_checklists(objects, today)]
+
+
+def upcoming_inspections_block(objects: QuerySet, today: date) -> list:
+    return [_checklist_data(c, today) for c in upcoming_inspections(objects)]
+
+
+def recent_deliveries_block(objects: QuerySet, today: date) -> list:
+    return [
+        {
+            'id': str(d.pk),
+            'object_id': str(d.object_id),
+            'object_name': d.object.name,
+            'material': d.material.name,
+            'unit': d.material.unit,
+            'quantity': str(d.quantity),
+            'delivered_at': d.delivered_at.isoformat(),
+        }
+        for d in recent_deliveries(objects)
+    ]
+
+
+def quality_progress_block(objects: QuerySet, today: date) -> list:
+    return quality_progress(object_metrics(objects, today))
+
+
+# блок -> (функция, TTL в кеше, сек.)
+BLOCKS = {
+    'summary': (summary_block, 60),
+    'critical_issues': (critical_issues_block, 60),
+    'overdue_checklists': (overdue_checklists_block, 300),
+    'upcoming_inspections': (upcoming_inspections_block, 300),
+    'recent_deliveries': (recent_deliveries_block, 120),
+    'quality_progress': (quality_progress_block, 300),
+}
+
+
+def load_block(user, name: str, today: Optional[date] = None):
+    """Данные блока name для пользователя: из кеша или из БД (single-flight)."""
+    func, ttl = BLOCKS[name]
+    today = today or timezone.now().date()
+    fragment = PageFragment(f'dashboard:{name}', user, vary=(today,), timeout=ttl)
+    return fragment.render(lambda: func(accessible_objects(user), today))
+
+
+__all__ = [
+    'ObjectMetrics', 'accessible_objects', 'object_metrics', 'summarize', 'quality_score', 'active_objects_count',
+    'quality_progress', 'recent_objects', 'critical_issues_list', 'overdue_checklists', 'upcoming_inspections',
+    'recent_deliveries', 'dashboard_context', 'BLOCKS', 'load_block',
+]
@@ -0,0 +1,83 @@
+import threading
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from dashboard import services
+from issues.models import Remark
+from materials.models import Delivery, MaterialType
+from objects.models import ConstructionObject, DailyChecklist, OpeningChecklist
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+URL = '/api/dashboard/'
+
+
+class DashboardApiTests(TransactionTestCase):
+    # блоки выполняются в потоках пула со своими соединениями — данные должны быть закоммичены
+
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Api Org")
+        self.user = User.objects.create_user(username="dash_api", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Api site", polygon=POLYGON, status='ACTIVE')
+        OpeningChecklist.objects.create(object=self.obj, data={}, status='APPROVED')
+        stale = DailyChecklist.objects.create(object=self.obj, data={})
+        DailyChecklist.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(days=10))
+        Remark.objects.create(object=self.obj, description="critical", severity='CRITICAL')
+        material = MaterialType.objects.create(name="Щебень", unit="т")
+        Delivery.objects.create(object=self.obj, material=material, quantity=2, delivered_at=timezone.now())
+        self.client.login(username="dash_api", password="pass123")
+
+    def test_all_blocks(self):
+        resp = self.client.get(URL)
+        self.assertEqual(resp.status_code, 200)
+        blocks = resp.json()['blocks']
+        self.assertEqual(list(blocks), list(services.BLOCKS))
+        self.assertEqual(blocks['summary'], {
+            'active_objects': 1, 'overdue_checklists': 1, 'critical_issues': 1, 'quality_score': 40,
+        })
+        self.assertEqual([i['description'] for i in blocks['critical_issues']], ["critical"])
+        self.assertEqual(blocks['overdue_checklists'][0]['age_days'], 10)
+        self.assertEqual(blocks['recent_deliveries'][0]['material'], "Щебень")
+        self.assertEqual(blocks['quality_progress'][0]['percentage'], 50)
+
+    def test_blocks_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        original = dict(services.BLOCKS)
+
+        def waiting(func):
+            def block(objects, today):
+                barrier.wait()  # оба блока должны выполняться одновременно
+                return func(objects, today)
+            return block
+
+        for name in ('summary', 'recent_deliveries'):
+            services.BLOCKS[name] = (waiting(original[name][0]), original[name][1])
+        try:
+            resp = self.client.get(URL, {'blocks': 'summary,recent_deliveries'})
+        finally:
+            services.BLOCKS.update(original)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(resp.json()['blocks']), ['summary', 'recent_deliveries'])
+
+    def test_blocks_are_cached_until_data_changes(self):
+        first = self.client.get(URL, {'blocks': 'critical_issues'}).json()['blocks']['critical_issues']
+        self.assertEqual(len(first), 1)
+        Remark.objects.filter(pk=first[0]['id']).update(description="в обход сигналов")
+        cached = self.client.get(URL, {'blocks': 'critical_issues'}).json()['blocks']['critical_issues']
+        self.assertEqual(cached[0]['description'], "critical")
+        Remark.objects.create(object=self.obj, description="second", severity='CRITICAL')
+        fresh = self.client.get(URL, {'blocks': 'critical_issues'}).json()['blocks']['critical_issues']
+        self.assertEqual(len(fresh), 2)
+
+    def test_unknown_block_and_anonymous(self):
+        resp = self.client.get(URL, {'blocks': 'summary,nope'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()['unknown'], ['nope'])
+        self.client.logout()
+        self.assertEqual(self.client.get(URL).status_code, 401)
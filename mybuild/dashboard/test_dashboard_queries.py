@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from dashboard.services import dashboard_context
+from issues.models import Remark, Violation
+from materials.models import Delivery, MaterialType
+from objects.models import ConstructionObject, DailyChecklist, OpeningChecklist
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class DashboardQueryTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Dash Org")
+        self.other = Organization.objects.create(name="Dash Other")
+        self.user = User.objects.create_user(username="dash", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.material = MaterialType.objects.create(name="Бетон", unit="м3")
+        self.client.login(username="dash", password="pass123")
+
+    def add_object(self, org=None, name="Объект"):
+        obj = ConstructionObject.objects.create(org=org or self.org, name=name, polygon=POLYGON, status='ACTIVE')
+        opening = OpeningChecklist.objects.create(object=obj, data={}, status='APPROVED')
+        stale = DailyChecklist.objects.create(object=obj, data={})
+        DailyChecklist.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(days=10))
+        Remark.objects.create(object=obj, description="critical", severity='CRITICAL')
+        Violation.objects.create(object=obj, description="minor", severity='LOW')
+        Delivery.objects.create(object=obj, material=self.material, quantity=1, delivered_at=timezone.now())
+        return obj, opening
+
+    def render(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/')
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(ctx)
+
+    def test_query_count_does_not_depend_on_objects_in_scope(self):
+        self.add_object(name="Первый")
+        _, few = self.render()
+        for i in range(6):
+            self.add_object(name=f"Объект {i}")
+        resp, many = self.render()
+        self.assertEqual(few, many)
+        # сессия, пользователь, объекты со счетчиками ObjectStats, 2 запроса
+        # просрочки и 8 запросов списков панели
+        self.assertEqual(many, 13)
+
+    def test_metrics_from_grouped_aggregates(self):
+        self.add_object(name="Свой")
+        self.add_object(org=self.other, name="Чужой")
+        # контекст панели строится только при промахе кеша фрагмента — проверяем его напрямую
+        context = dashboard_context(self.user)
+        stats = context['stats']
+        self.assertEqual(stats['active_objects'], 1)
+        self.assertEqual(stats['critical_issues'], 1)
+        self.assertEqual(stats['overdue_checklists'], 1)
+        # 1 из 2 чек-листов одобрен, 2 замечания на 2 чек-листа снижают индекс на 20
+        self.assertEqual(stats['quality_score'], 30)
+        self.assertEqual(context['quality_progress'], [{
+            'object_name': "Свой", 'percentage': 50, 'completed_checks': 1, 'total_checks': 2, 'issues_count': 2,
+        }])
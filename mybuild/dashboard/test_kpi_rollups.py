@@ -0,0 +1,102 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from audit.models import AuditLog
+from dashboard.models import KpiSnapshot
+from dashboard.rollups import backfill, rollup_day
+from issues.models import Remark
+from materials.models import Delivery, MaterialType
+from objects.models import ConstructionObject, OpeningChecklist
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class KpiRollupTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        self.org = Organization.objects.create(name="Kpi Org")
+        self.user = User.objects.create_user(username="kpi", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="CLIENT")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Kpi site", polygon=POLYGON, status='ACTIVE')
+        self.age(self.obj, 10)
+        self.age(OpeningChecklist.objects.create(object=self.obj, data={}, status='APPROVED'), 8)
+        self.remark = Remark.objects.create(object=self.obj, description="r", severity='CRITICAL', status='RESOLVED')
+        self.age(self.remark, 5)
+        # замечание решено 2 дня назад — история статуса только в аудите
+        entry = AuditLog.objects.create(
+            action='update_remark', model='issues.remark', object_id=str(self.remark.pk),
+            context={'diff': {'status': {'from': 'OPEN', 'to': 'RESOLVED'}}},
+        )
+        self.age(entry, 2)
+        material = MaterialType.objects.create(name="Цемент", unit="т")
+        Delivery.objects.create(object=self.obj, material=material, quantity='2.5',
+                                delivered_at=self.now - timedelta(days=3))
+
+    def age(self, instance, days):
+        type(instance).objects.filter(pk=instance.pk).update(created_at=self.now - timedelta(days=days))
+        return instance
+
+    def day(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def snapshot(self, days_ago, obj=True):
+        return KpiSnapshot.objects.get(date=self.day(days_ago), org=self.org, object=self.obj if obj else None)
+
+    def test_backfill_reconstructs_history(self):
+        backfill(self.day(11), self.day(1))
+        self.assertFalse(KpiSnapshot.objects.filter(date=self.day(11)).exists())
+        before_fix = self.snapshot(4)
+        self.assertEqual(before_fix.issues_by_status, {'remark': {'OPEN': 1}})
+        self.assertEqual(before_fix.critical_issues, 1)
+        self.assertEqual(before_fix.quality_score, 80)
+        after_fix = self.snapshot(1)
+        self.assertEqual(after_fix.issues_by_status, {'remark': {'RESOLVED': 1}})
+        self.assertEqual(after_fix.critical_issues, 0)
+        self.assertEqual(self.snapshot(3).deliveries_by_unit, {'т': '2.500'})
+        self.assertEqual(self.snapshot(2).deliveries_count, 0)
+        org_row = self.snapshot(1, obj=False)
+        self.assertEqual((org_row.objects_total, org_row.objects_active, org_row.checklists_approved), (1, 1, 1))
+
+    def test_backfill_reads_archived_audit(self):
+        with tempfile.TemporaryDirectory() as archive, override_settings(AUDIT_ARCHIVE_DIR=archive):
+            call_command('archive_auditlog', '--days', '1', stdout=StringIO())
+            self.assertFalse(AuditLog.objects.filter(model='issues.remark').exists())
+            backfill(self.day(4), self.day(1))
+        self.assertEqual(self.snapshot(4).issues_by_status, {'remark': {'OPEN': 1}})
+        self.assertEqual(self.snapshot(1).issues_by_status, {'remark': {'RESOLVED': 1}})
+
+    def test_nightly_rollup_matches_backfill_and_is_idempotent(self):
+        backfill(self.day(1), self.day(1))
+        expected = KpiSnapshot.objects.filter(date=self.day(1)).values(
+            'object_id', 'issues_by_status', 'quality_score', 'checklists_total')
+        expected = sorted(expected, key=lambda r: str(r['object_id']))
+        call_command('rollup_kpis', stdout=StringIO())
+        rollup_day(self.day(1))
+        actual = KpiSnapshot.objects.filter(date=self.day(1)).values(
+            'object_id', 'issues_by_status', 'quality_score', 'checklists_total')
+        self.assertEqual(sorted(actual, key=lambda r: str(r['object_id'])), expected)
+
+    def test_series_api_reads_snapshots(self):
+        backfill(self.day(7), self.day(1))
+        self.client.login(username="kpi", password="pass123")
+        url = '/api/kpi-series/'
+        resp = self.client.get(url, {'object': str(self.obj.pk), 'days': 7, 'fields': 'critical_issues,quality_score'})
+        self.assertEqual(resp.status_code, 200)
+        points = resp.json()['points']
+        self.assertEqual(len(points), 7)
+        self.assertEqual([p['critical_issues'] for p in points], [0, 0, 1, 1, 1, 0, 0])
+        self.assertEqual(len(self.client.get(url, {'org': str(self.org.pk), 'days': 7}).json()['points']), 7)
+        self.assertEqual(self.client.get(url, {'days': 7}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'org': str(self.org.pk), 'fields': 'nope'}).status_code, 400)
+
+        User.objects.create_user(username="kpi_stranger", password="pass123")
+        self.client.login(username="kpi_stranger", password="pass123")
+        self.assertEqual(self.client.get(url, {'object': str(self.obj.pk)}).json()['points'], [])
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InspectionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inspections'
+
+    def ready(self):  # type: ignore[override]
+        # Реестр активных визитов
+        from . import signals  # noqa: F401
@@ -45,6 +45,22 @@ class InspectionVisit(BaseModel, OfflineFieldsMixin):
     class Meta:
         verbose_name = 'Инспекционный визит'
         verbose_name_plural = 'Инспекционные визиты'
+        constraints = [
+            # идемпотентность офлайн-записей (core.services.offline)
+            models.UniqueConstraint(
+                fields=['offline_batch_id', 'inspector'],
+                condition=models.Q(offline_batch_id__isnull=False),
+                name='visit_offline_batch_uniq',
+            ),
+        ]
+        indexes = [
+            # Открытый визит инспектора на объекте (IsOnSite, реестр активных визитов)
+            models.Index(
+                fields=['inspector', 'object', '-started_at'],
+                name='visit_active_idx',
+                condition=models.Q(ended_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f'Визит {self.inspector.username} на {self.object.name} в {self.started_at}'
@@ -60,6 +76,15 @@ class PresenceConfirmation(BaseModel, OfflineFieldsMixin):
     class Meta:
         verbose_name = 'Подтверждение присутствия'
         verbose_name_plural = 'Подтверждения присутствия'
+        constraints = [
+            # автор подтверждения — инспектор визита; ограничение не может идти через join,
+            # поэтому batch id уникален в пределах визита (а визит принадлежит одному инспектору)
+            models.UniqueConstraint(
+                fields=['offline_batch_id', 'visit'],
+                condition=models.Q(offline_batch_id__isnull=False),
+                name='presence_offline_batch_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f'Подтверждение для визита {self.visit.id}'
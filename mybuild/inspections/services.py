@@ -0,0 +1,106 @@
+"""Реестр активных инспекционных визитов.
+
+IsOnSite на каждой объектной проверке искал открытый визит запросом к
+InspectionVisit. Здесь текущий открытый визит по паре (inspector, object)
+хранится в общем кеше: запись обновляется сигналами при начале/завершении
+визита (см. inspections.signals), отсутствие визита тоже кешируется.
+При промахе кеша используется запрос по частичному индексу
+visit_active_idx (только открытые визиты).
+
+Устаревшие открытые визиты закрывает команда close_stale_visits, чтобы
+активное множество оставалось небольшим.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+_KEY = 'visit:active:{inspector_id}:{object_id}'
+_NONE = {'id': None}  # «открытого визита нет» — тоже кешируется
+DEFAULT_TIMEOUT = 600
+DEFAULT_STALE_HOURS = 12
+
+
+@dataclass(frozen=True)
+class ActiveVisit:
+    id: object
+    latitude: Optional[float]
+    longitude: Optional[float]
+    started_at: object
+
+
+def _key(inspector_id, object_id) -> str:
+    return _KEY.format(inspector_id=inspector_id, object_id=object_id)
+
+
+def _timeout() -> int:
+    return getattr(settings, 'ACTIVE_VISIT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _pack(visit) -> dict:
+    return {
+        'id': visit.pk,
+        'latitude': visit.latitude,
+        'longitude': visit.longitude,
+        'started_at': visit.started_at,
+    }
+
+
+def _load(inspector_id, object_id):
+    from inspections.models import InspectionVisit
+
+    return (
+        InspectionVisit.objects.filter(object_id=object_id, inspector_id=inspector_id, ended_at__isnull=True)
+        .only('id', 'latitude', 'longitude', 'started_at')
+        .order_by('-started_at')
+        .first()
+    )
+
+
+def get_active_visit(inspector_id, object_id) -> Optional[ActiveVisit]:
+    """Открытый визит инспектора на объекте (без запроса к БД при попадании в кеш)."""
+    key = _key(inspector_id, object_id)
+    data = cache.get(key)
+    if data is None:
+        visit = _load(inspector_id, object_id)
+        data = _pack(visit) if visit is not None else _NONE
+        cache.add(key, data, timeout=_timeout())
+    if data.get('id') is None:
+        return None
+    return ActiveVisit(**data)
+
+
+def forget_visit(inspector_id, object_id) -> None:
+    """Сбрасывает запись реестра (следующее чтение пойдет в БД)."""
+    cache.delete(_key(inspector_id, object_id))
+
+
+def refresh_visit(inspector_id, object_id) -> None:
+    """Перечитывает открытый визит из БД и записывает в реестр."""
+    visit = _load(inspector_id, object_id)
+    cache.set(_key(inspector_id, object_id), _pack(visit) if visit is not None else _NONE, timeout=_timeout())
+
+
+def close_stale_visits(max_age: Optional[timedelta] = None, now=None) -> int:
+    """Закрывает открытые визиты старше max_age; возвращает число закрытых."""
+    from inspections.models import InspectionVisit
+
+    now = now or timezone.now()
+    if max_age is None:
+        max_age = timedelta(hours=getattr(settings, 'INSPECTION_VISIT_MAX_HOURS', DEFAULT_STALE_HOURS))
+    stale = InspectionVisit.objects.filter(ended_at__isnull=True, started_at__lt=now - max_age)
+    pairs = set(stale.values_list('inspector_id', 'object_id'))
+    if not pairs:
+        return 0
+    closed = stale.update(ended_at=now, updated_at=now)
+    # update() не шлет сигналы — сбрасываем реестр явно
+    cache.delete_many([_key(i, o) for i, o in pairs])
+    return closed
+
+
+__all__ = ['ActiveVisit', 'get_active_visit', 'forget_visit', 'refresh_visit', 'close_stale_visits']
@@ -0,0 +1,16 @@
+"""Поддержка реестра активных визитов (inspections.services) в актуальном состоянии."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inspections.models import InspectionVisit
+from inspections.services import forget_visit, refresh_visit
+
+
+@receiver(post_save, sender=InspectionVisit)
+@receiver(post_delete, sender=InspectionVisit)
+def _visit_changed(sender, instance, **kwargs):
+    inspector_id, object_id = instance.inspector_id, instance.object_id
+    # Сразу сбрасываем запись, после коммита — перечитываем зафиксированное состояние
+    forget_visit(inspector_id, object_id)
+    transaction.on_commit(lambda: refresh_visit(inspector_id, object_id))
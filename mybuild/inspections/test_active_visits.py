@@ -0,0 +1,54 @@
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.permissions import IsOnSite
+from inspections.models import InspectionVisit
+from inspections.services import get_active_visit
+from objects.models import ConstructionObject
+from orgs.models import Organization
+
+
+class ActiveVisitRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='registry', password='pass123')
+        self.org = Organization.objects.create(name='Registry Org')
+        polygon = {"type": "Polygon", "coordinates": [[[30.0, 50.0], [30.0, 50.01], [30.01, 50.01], [30.01, 50.0], [30.0, 50.0]]]}
+        self.obj = ConstructionObject.objects.create(org=self.org, name='Registry Obj', polygon=polygon)
+
+    def _check(self):
+        return IsOnSite().has_object_permission(SimpleNamespace(user=self.user), None, self.obj)
+
+    def test_on_site_check_is_served_from_registry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            InspectionVisit.objects.create(object=self.obj, inspector=self.user, longitude=30.005, latitude=50.005)
+        with self.assertNumQueries(0):
+            self.assertTrue(self._check())
+
+    def test_visit_end_updates_registry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            visit = InspectionVisit.objects.create(object=self.obj, inspector=self.user)
+        self.assertTrue(self._check())
+        visit.ended_at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            visit.save()
+        with self.assertNumQueries(0):
+            self.assertFalse(self._check())
+
+    def test_sweeper_closes_stale_visits(self):
+        stale = InspectionVisit.objects.create(object=self.obj, inspector=self.user)
+        InspectionVisit.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(hours=30))
+        self.assertIsNotNone(get_active_visit(self.user.pk, self.obj.pk))
+        out = StringIO()
+        call_command('close_stale_visits', '--hours', '12', stdout=out)
+        self.assertIn('1', out.getvalue())
+        stale.refresh_from_db()
+        self.assertIsNotNone(stale.ended_at)
+        self.assertIsNone(get_active_visit(self.user.pk, self.obj.pk))
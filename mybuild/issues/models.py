@@ -66,6 +66,18 @@ class Remark(IssueBase):
     class Meta:
         verbose_name = "Нарушение заказчика"
         verbose_name_plural = "Нарушения заказчика"
+        indexes = [
+            # лента изменений (core.services.changes): keyset по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='remark_changes_idx'),
+        ]
+        constraints = [
+            # идемпотентность офлайн-записей (core.services.offline)
+            models.UniqueConstraint(
+                fields=['offline_batch_id', 'created_by'],
+                condition=models.Q(offline_batch_id__isnull=False),
+                name='remark_offline_batch_uniq',
+            ),
+        ]
         permissions = [
             ("can_comment_issue", "Может комментировать замечание/нарушение"),
             ("can_verify_issue", "Может верифицировать устранение"),
@@ -78,6 +90,18 @@ class Violation(IssueBase):
     class Meta:
         verbose_name = "Нарушение инспектора"
         verbose_name_plural = "Нарушения инспектора"
+        indexes = [
+            # лента изменений (core.services.changes): keyset по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='violation_changes_idx'),
+        ]
+        constraints = [
+            # идемпотентность офлайн-записей (core.services.offline)
+            models.UniqueConstraint(
+                fields=['offline_batch_id', 'created_by'],
+                condition=models.Q(offline_batch_id__isnull=False),
+                name='violation_offline_batch_uniq',
+            ),
+        ]
         permissions = [
             ("can_comment_issue", "Может комментировать замечание/нарушение"),
             ("can_verify_issue", "Может верифицировать устранение"),
@@ -4,6 +4,7 @@ from django.utils import timezone
 from issues.models import Remark
 from objects.models import ConstructionObject
 from django.contrib.auth.models import User
+from core.services.principal import get_principal
 
 
 @dataclass
@@ -13,7 +14,7 @@ class RemarkService:
 
     # Role helpers (could delegate to central roles module if shared)
     def _in_group(self, name: str) -> bool:
-        return self.user.is_superuser or self.user.groups.filter(name=name).exists()
+        return self.user.is_superuser or get_principal(self.user).has_group(name)
 
     def can_create(self, obj: ConstructionObject) -> bool:
         return self._in_group('CLIENT') or self._in_group('INSPECTOR')
@@ -32,7 +33,7 @@ class RemarkService:
         if remark.status not in ['OPEN','IN_PROGRESS']:
             raise ValidationError('Можно подтвердить устранение только для открытого нарушения')
         remark.status = 'PENDING_CONFIRMATION'
-        remark.save(update_fields=['status'])
+        remark.save(update_fields=['status', 'updated_at'])
         return remark
 
     def confirm_closure(self, remark: Remark) -> Remark:
@@ -42,5 +43,5 @@ class RemarkService:
         if remark.status != 'PENDING_CONFIRMATION':
             raise ValidationError('Можно подтвердить только ожидающее подтверждение нарушение')
         remark.status = 'ACCEPTED'
-        remark.save(update_fields=['status'])
+        remark.save(update_fields=['status', 'updated_at'])
         return remark
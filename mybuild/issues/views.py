@@ -6,6 +6,8 @@ from issues.models import Remark
 from objects.models import OpeningChecklist, ConstructionObject
 from issues.forms import RemarkForm
 from issues.services import RemarkService
+from core.services.page_cache import page_fragment
+from core.services.principal import get_principal
 
 
 @login_required
@@ -39,11 +41,12 @@ def remark_detail(request, pk):
         user_orgs = request.user.memberships.values_list('org', flat=True).distinct()
         if remark.object.org_id not in user_orgs:
             raise PermissionDenied("У вас нет доступа к этому нарушению.")
+    principal = get_principal(request.user)
     context = {
         'remark': remark,
-        'is_foreman': request.user.groups.filter(name='FOREMAN').exists(),
-        'is_client': request.user.groups.filter(name='CLIENT').exists(),
-        'is_inspector': request.user.groups.filter(name='INSPECTOR').exists(),
+        'is_foreman': principal.has_group('FOREMAN'),
+        'is_client': principal.has_group('CLIENT'),
+        'is_inspector': principal.has_group('INSPECTOR'),
     }
     return render(request, 'issues/remark_detail.html', context)
 
@@ -74,6 +77,12 @@ def confirm_closure(request, pk):
 
 @login_required
 def remarks_list(request):
+	return render(request, 'issues/list/remarks.html', {
+		'page_fragment': page_fragment(request, 'remarks_list', build=lambda: _remarks_list_context(request)),
+	})
+
+
+def _remarks_list_context(request):
 	remarks = Remark.objects.select_related('object').order_by('-created_at')
 	# Filter by user's accessible objects unless superuser
 	if not request.user.is_superuser:
@@ -81,11 +90,17 @@ def remarks_list(request):
 		accessible_objects = ConstructionObject.objects.filter(org__in=user_orgs).values_list('id', flat=True)
 		remarks = remarks.filter(object_id__in=accessible_objects)
 	remarks = remarks[:300]
-	return render(request, 'issues/list/remarks.html', {'remarks': remarks})
+	return {'remarks': remarks}
 
 
 @login_required
 def checklists_list(request):
+	return render(request, 'issues/list/checklists.html', {
+		'page_fragment': page_fragment(request, 'checklists_list', build=lambda: _checklists_list_context(request)),
+	})
+
+
+def _checklists_list_context(request):
 	checklists = OpeningChecklist.objects.select_related('object').order_by('-updated_at')
 	# Filter by user's accessible objects unless superuser
 	if not request.user.is_superuser:
@@ -93,7 +108,7 @@ def checklists_list(request):
 		accessible_objects = ConstructionObject.objects.filter(org__in=user_orgs).values_list('id', flat=True)
 		checklists = checklists.filter(object_id__in=accessible_objects)
 	checklists = checklists[:300]
-	return render(request, 'issues/list/checklists.html', {'checklists': checklists})
+	return {'checklists': checklists}
 
 
 @login_required
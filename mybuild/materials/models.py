@@ -102,6 +102,18 @@ class Delivery(BaseModel, OfflineFieldsMixin):
     class Meta:
         verbose_name = 'Поставка материалов'
         verbose_name_plural = 'Поставки материалов'
+        indexes = [
+            # лента изменений (core.services.changes): keyset по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='delivery_changes_idx'),
+        ]
+        constraints = [
+            # идемпотентность офлайн-записей (core.services.offline)
+            models.UniqueConstraint(
+                fields=['offline_batch_id', 'created_by'],
+                condition=models.Q(offline_batch_id__isnull=False),
+                name='delivery_offline_batch_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"Поставка {self.material.name} на {self.object.name}"
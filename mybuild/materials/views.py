@@ -2,10 +2,17 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from materials.models import Delivery
 from objects.models import ConstructionObject
+from core.services.page_cache import page_fragment
 
 
 @login_required
 def delivery_list(request):
+	return render(request, 'materials/list.html', {
+		'page_fragment': page_fragment(request, 'delivery_list', build=lambda: _delivery_list_context(request)),
+	})
+
+
+def _delivery_list_context(request):
 	deliveries = Delivery.objects.select_related('object', 'material').order_by('-delivered_at')
 	# Filter by user's accessible objects unless superuser
 	if not request.user.is_superuser:
@@ -13,4 +20,4 @@ def delivery_list(request):
 		accessible_objects = ConstructionObject.objects.filter(org__in=user_orgs).values_list('id', flat=True)
 		deliveries = deliveries.filter(object_id__in=accessible_objects)
 	deliveries = deliveries[:300]
-	return render(request, 'materials/list.html', {'deliveries': deliveries})
+	return {'deliveries': deliveries}
@@ -3,6 +3,11 @@ ASGI config for mybuild project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Required for the notification stream /api/notifications/stream/ (SSE,
+notifications.stream), which answers 501 under WSGI. The Dockerfile and
+docker-compose.yml serve this application with gunicorn and uvicorn workers
+(-k uvicorn.workers.UvicornWorker).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -20,6 +20,8 @@ from materials.views import delivery_list
 from issues.views import remarks_list, checklists_list
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from core import api as core_api
+from dashboard.views import dashboard_api
+from notifications.views import notification_stream
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth.decorators import login_required
@@ -85,6 +87,8 @@ urlpatterns = [
     path('schedules/', schedules_list, name='schedules_list'),
     path('materials/deliveries/', materials_deliveries, name='materials_deliveries'),
     
+    path('api/dashboard/', dashboard_api, name='dashboard_api'),
+    path('api/notifications/stream/', notification_stream, name='notifications_stream'),
     path('api/', include(core_api.router.urls)),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationOutbox
 
 
 @admin.register(Notification)
@@ -9,3 +9,11 @@ class NotificationAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__first_name', 'user__last_name', 'kind']
     readonly_fields = ['id', 'created_at', 'updated_at']
     ordering = ['-created_at']
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'coalesce_key', 'available_at', 'created_at']
+    list_filter = ['kind']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    ordering = ['available_at']
@@ -0,0 +1,147 @@
+"""Delivery backends for the notification dispatcher.
+
+A backend receives a list of already coalesced Message objects and delivers
+them through one channel. The active set is configured with
+NOTIFICATION_BACKENDS (dotted paths):
+
+- InboxBackend — Notification rows (the in-app inbox) and unread counters
+  (notifications.inbox); after commit wakes SSE streams
+  (notifications.stream). Transactional: runs inside the dispatcher
+  transaction together with the outbox delete, so each event lands in the
+  inbox exactly once.
+- EmailBackend — one email per recipient via Django's mail framework
+  (EMAIL_BACKEND; the test runner swaps in locmem automatically).
+- WebhookBackend — one JSON POST per batch to NOTIFICATION_WEBHOOK_URL.
+- MemoryWebhookBackend — webhook stand-in for tests and local runs.
+
+Non-transactional backends run after the dispatcher commits; a failure is
+logged and not retried (at-most-once), so a broken SMTP server or webhook
+never blocks the inbox.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import urllib.request
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, ClassVar, Sequence
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from .inbox import add_unread, bump_inboxes
+from .stream import publish
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKENDS = ('notifications.backends.InboxBackend',)
+DEFAULT_WEBHOOK_TIMEOUT = 5
+
+
+@dataclass
+class Message:
+    """One notification after coalescing (count > 1 for merged bursts)."""
+    kind: str
+    payload: dict[str, Any]
+    user_ids: list[int]
+    count: int = 1
+    event_ids: list[str] = field(default_factory=list)
+
+    def as_payload(self) -> dict[str, Any]:
+        if self.count > 1:
+            return {**self.payload, 'count': self.count}
+        return dict(self.payload)
+
+
+class BaseBackend:
+    transactional: ClassVar[bool] = False
+
+    def send(self, messages: Sequence[Message]) -> None:
+        raise NotImplementedError
+
+    def committed(self, messages: Sequence[Message]) -> None:
+        """Called for transactional backends after the dispatcher commits."""
+
+
+class InboxBackend(BaseBackend):
+    transactional = True
+
+    def send(self, messages: Sequence[Message]) -> None:
+        from .models import Notification
+
+        rows = [
+            Notification(user_id=user_id, kind=message.kind, payload=message.as_payload())
+            for message in messages
+            for user_id in message.user_ids
+        ]
+        Notification.objects.bulk_create(rows, batch_size=500)
+        add_unread(row.user_id for row in rows)
+
+    def committed(self, messages: Sequence[Message]) -> None:
+        user_ids = {user_id for message in messages for user_id in message.user_ids}
+        bump_inboxes(user_ids)
+        publish(user_ids)
+
+
+class EmailBackend(BaseBackend):
+    def send(self, messages: Sequence[Message]) -> None:
+        from django.contrib.auth.models import User
+        from django.core.mail import EmailMessage, get_connection
+
+        user_ids = {user_id for message in messages for user_id in message.user_ids}
+        emails = dict(User.objects.filter(pk__in=user_ids).exclude(email='').values_list('pk', 'email'))
+        mails = [
+            EmailMessage(
+                subject=f'[MyBuild] {message.kind}',
+                body=message.payload.get('repr') or message.kind,
+                to=[emails[user_id]],
+            )
+            for message in messages
+            for user_id in message.user_ids
+            if user_id in emails
+        ]
+        if mails:
+            get_connection().send_messages(mails)
+
+
+class WebhookBackend(BaseBackend):
+    def send(self, messages: Sequence[Message]) -> None:
+        url = getattr(settings, 'NOTIFICATION_WEBHOOK_URL', '')
+        if not url or not messages:
+            return
+        body = [
+            {'kind': m.kind, 'payload': m.as_payload(), 'users': m.user_ids, 'count': m.count}
+            for m in messages
+        ]
+        self.post(url, json.dumps(body, cls=DjangoJSONEncoder).encode())
+
+    def post(self, url: str, data: bytes) -> None:
+        request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+        timeout = getattr(settings, 'NOTIFICATION_WEBHOOK_TIMEOUT', DEFAULT_WEBHOOK_TIMEOUT)
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+
+
+class MemoryWebhookBackend(WebhookBackend):
+    """Collects webhook bodies in memory instead of sending them."""
+    sent: ClassVar[list] = []
+
+    def post(self, url: str, data: bytes) -> None:
+        self.sent.append(json.loads(data))
+
+
+@lru_cache(maxsize=8)
+def _load(paths: tuple[str, ...]) -> tuple[BaseBackend, ...]:
+    return tuple(import_string(path)() for path in paths)
+
+
+def get_backends() -> tuple[BaseBackend, ...]:
+    return _load(tuple(getattr(settings, 'NOTIFICATION_BACKENDS', DEFAULT_BACKENDS)))
+
+
+__all__ = [
+    'Message', 'BaseBackend', 'InboxBackend', 'EmailBackend', 'WebhookBackend', 'MemoryWebhookBackend',
+    'get_backends',
+]
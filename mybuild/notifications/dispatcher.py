@@ -0,0 +1,135 @@
+"""Notification outbox dispatcher.
+
+notify() only appends NotificationOutbox rows inside the caller's
+transaction. This module drains them:
+
+- rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+  dispatcher processes (manage.py dispatch_notifications) can run in
+  parallel without handing out the same event twice;
+- recipients of events about a construction object are expanded by role
+  for the whole batch at once (notifications.recipients);
+- claimed events with the same coalesce_key, kind and recipients are merged
+  into one Message. Coalescable kinds are delayed by
+  NOTIFICATION_COALESCE_WINDOW seconds (available_at), and when a batch
+  takes such an event it also takes the not-yet-due rows with the same key,
+  so a burst of 50 'delivery.updated' for one delivery becomes one
+  notification with payload['count'] == 50;
+- messages fan out to the configured backends (notifications.backends);
+  transactional ones run in the same transaction as the outbox delete,
+  the others after it commits.
+
+With NOTIFICATION_DISPATCH='inline' notify() calls dispatch_events() for
+its own rows right after commit — no worker needed, coalescing only
+within one notify call.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Iterable, List, Sequence
+
+from django.db import transaction
+from django.utils import timezone
+
+from .backends import Message, get_backends
+from .recipients import expand_recipients
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def coalesce(events: Sequence) -> List[Message]:
+    """Merges events (ordered by creation); the latest payload wins."""
+    messages: List[Message] = []
+    by_key: dict = {}
+    for event in events:
+        recipients = sorted(set(event.recipient_ids))
+        if not recipients:
+            continue
+        key = (event.kind, event.coalesce_key, tuple(recipients)) if event.coalesce_key else None
+        message = by_key.get(key) if key else None
+        if message is None:
+            message = Message(kind=event.kind, payload=dict(event.payload), user_ids=recipients)
+            messages.append(message)
+            if key:
+                by_key[key] = message
+        else:
+            message.payload = dict(event.payload)
+            message.count += 1
+        message.event_ids.append(str(event.pk))
+    return messages
+
+
+def _deliver(events: List, claimed_qs):
+    from .models import NotificationOutbox
+
+    keys = {event.coalesce_key for event in events if event.coalesce_key}
+    if keys:
+        # хвост той же серии, которому еще не пришло время, — в ту же пачку
+        events += list(
+            claimed_qs.filter(coalesce_key__in=keys).exclude(pk__in=[event.pk for event in events])
+        )
+        events.sort(key=lambda event: (event.created_at, str(event.pk)))
+    expand_recipients(events)
+    messages = coalesce(events)
+    deferred = []
+    for backend in get_backends():
+        if backend.transactional:
+            backend.send(messages)
+        deferred.append(backend)
+    NotificationOutbox.objects.filter(pk__in=[event.pk for event in events]).delete()
+    return len(events), deferred, messages
+
+
+def _send_deferred(backends: Iterable, messages: List[Message]) -> None:
+    # вызывается после выхода из транзакции диспетчера
+    for backend in backends:
+        try:
+            if backend.transactional:
+                backend.committed(messages)
+            else:
+                backend.send(messages)
+        except Exception:  # pragma: no cover - зависит от внешнего канала
+            logger.exception('Notification backend %s failed for %d messages', type(backend).__name__, len(messages))
+
+
+def _locked():
+    from .models import NotificationOutbox
+
+    return NotificationOutbox.objects.select_for_update(skip_locked=True)
+
+
+def dispatch_batch(batch_size: int = DEFAULT_BATCH_SIZE, now=None) -> int:
+    """Delivers one batch of due events. Returns the number of events consumed."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(_locked().filter(available_at__lte=now).order_by('available_at', 'created_at')[:batch_size])
+        if not events:
+            return 0
+        done, deferred, messages = _deliver(events, _locked())
+    _send_deferred(deferred, messages)
+    return done
+
+
+def dispatch_events(ids: Sequence) -> int:
+    """Delivers the given events right away (inline mode), ignoring available_at."""
+    with transaction.atomic():
+        events = list(_locked().filter(pk__in=list(ids)).order_by('created_at'))
+        if not events:
+            return 0  # уже забрал воркер
+        done, deferred, messages = _deliver(events, _locked())
+    _send_deferred(deferred, messages)
+    return done
+
+
+def drain(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Dispatches batches until no due events are left."""
+    total = 0
+    while True:
+        done = dispatch_batch(batch_size)
+        if not done:
+            return total
+        total += done
+
+
+__all__ = ['coalesce', 'dispatch_batch', 'dispatch_events', 'drain', 'DEFAULT_BATCH_SIZE']
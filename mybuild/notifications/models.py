@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
 from core.models import BaseModel
 
 class Notification(BaseModel):
@@ -12,6 +13,52 @@ class Notification(BaseModel):
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
         ordering = ['-created_at']
+        indexes = [
+            # лента пользователя и выборка непрочитанных (notifications.inbox)
+            models.Index(fields=['user', 'is_read', 'created_at', 'id'], name='notif_user_inbox_idx'),
+        ]
 
     def __str__(self):
         return f'Уведомление для {self.user.username} ({self.kind})'
+
+
+class NotificationCounter(BaseModel):
+    """Материализованный счетчик непрочитанных уведомлений пользователя.
+
+    Поддерживается инкрементально (notifications.inbox): при доставке в
+    inbox и при отметке прочитанными.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Счетчик уведомлений'
+        verbose_name_plural = 'Счетчики уведомлений'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.unread}'
+
+
+class NotificationOutbox(BaseModel):
+    """Исходящее событие уведомления (transactional outbox).
+
+    Пишется в той же транзакции, что и бизнес-изменение; доставку по
+    backend'ам выполняет диспетчер (notifications.dispatcher), после чего
+    строка удаляется.
+    """
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    recipient_ids = models.JSONField(default=list)
+    # объект строительства события: получатели по ролям (notifications.recipients)
+    site_id = models.UUIDField(null=True, blank=True)
+    # события с одинаковым ключом и получателями склеиваются диспетчером
+    coalesce_key = models.CharField(max_length=128, blank=True, default='', db_index=True)
+    available_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Исходящее уведомление'
+        verbose_name_plural = 'Исходящие уведомления'
+        indexes = [models.Index(fields=['available_at', 'created_at'], name='notif_outbox_pending_idx')]
+
+    def __str__(self):
+        return f'{self.kind} → {len(self.recipient_ids)} получ.'
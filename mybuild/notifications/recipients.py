@@ -0,0 +1,110 @@
+"""Recipient resolution for notification events.
+
+An event about a construction object (NotificationOutbox.site_id) is
+delivered to the people working on it, by role:
+
+- ObjectAssignment — active assignments on the object itself;
+- Membership — members of the object's organization.
+
+KIND_ROLES maps the event kind to the roles that need it (unknown kinds go
+to DEFAULT_ROLES). The actor passed to notify() stays a recipient as before.
+
+resolve_roles() works for a whole dispatcher batch: one UNION query for the
+objects missing from the cache. The per-object role map is cached under
+versions (core.services.versions):
+
+- recipients:obj:<id> — bumped when an assignment on the object changes;
+- recipients:memberships — bumped on any Membership change (rare, admin-only).
+
+notifications.signals does the bumping after commit.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Set
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.services.versions import get_versions
+
+MEMBERSHIPS_VERSION = 'recipients:memberships'
+DEFAULT_CACHE_TIMEOUT = 3600
+
+FOREMAN, CLIENT, INSPECTOR = 'FOREMAN', 'CLIENT', 'INSPECTOR'
+DEFAULT_ROLES = frozenset({FOREMAN, CLIENT})
+KIND_ROLES: Dict[str, frozenset] = {
+    'object.activation_requested': frozenset({CLIENT, INSPECTOR}),
+    'object.activated': frozenset({FOREMAN, CLIENT, INSPECTOR}),
+    'object.closed': frozenset({FOREMAN, CLIENT, INSPECTOR}),
+    'remark.created': frozenset({FOREMAN, CLIENT}),
+    'remark.updated': frozenset({FOREMAN, CLIENT}),
+    'violation.created': frozenset({FOREMAN, CLIENT, INSPECTOR}),
+    'violation.updated': frozenset({FOREMAN, CLIENT, INSPECTOR}),
+    'checklist.submitted': frozenset({CLIENT, INSPECTOR}),
+    'checklist.approved': frozenset({FOREMAN}),
+    'checklist.rejected': frozenset({FOREMAN}),
+    'daily_checklist.confirmed': frozenset({CLIENT}),
+}
+
+RoleMap = Dict[str, List[int]]
+
+
+def object_version_name(object_id) -> str:
+    return f'recipients:obj:{object_id}'
+
+
+def roles_for(kind: str) -> frozenset:
+    return KIND_ROLES.get(kind, DEFAULT_ROLES)
+
+
+def _load(object_ids: List[str]) -> Dict[str, RoleMap]:
+    from objects.models import ObjectAssignment
+    from orgs.models import Membership
+
+    assignments = ObjectAssignment.objects.filter(object_id__in=object_ids, is_active=True).values_list(
+        'object_id', 'user_id', 'role'
+    )
+    members = Membership.objects.filter(org__construction_objects__in=object_ids).values_list(
+        'org__construction_objects__id', 'user_id', 'role'
+    )
+    result: Dict[str, Dict[str, Set[int]]] = {object_id: {} for object_id in object_ids}
+    for object_id, user_id, role in assignments.union(members):
+        result[str(object_id)].setdefault(role, set()).add(user_id)
+    return {object_id: {role: sorted(users) for role, users in roles.items()} for object_id, roles in result.items()}
+
+
+def resolve_roles(object_ids: Iterable) -> Dict[str, RoleMap]:
+    """{object_id: {role: [user_id, ...]}} for every requested object."""
+    object_ids = list(dict.fromkeys(str(object_id) for object_id in object_ids))
+    if not object_ids:
+        return {}
+    versions = get_versions([MEMBERSHIPS_VERSION] + [object_version_name(o) for o in object_ids])
+    keys = {
+        o: f'notif:rcpt:{o}:{versions[object_version_name(o)]}:{versions[MEMBERSHIPS_VERSION]}'
+        for o in object_ids
+    }
+    cached = cache.get_many(list(keys.values()))
+    result = {o: cached[key] for o, key in keys.items() if key in cached}
+    missing = [o for o in object_ids if o not in result]
+    if missing:
+        loaded = _load(missing)
+        timeout = getattr(settings, 'NOTIFICATION_RECIPIENTS_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+        cache.set_many({keys[o]: roles for o, roles in loaded.items()}, timeout)
+        result.update(loaded)
+    return result
+
+
+def expand_recipients(events: Iterable) -> None:
+    """Adds role-based recipients to outbox events that have a site_id (in place)."""
+    events = [event for event in events if event.site_id]
+    roles_by_object = resolve_roles(event.site_id for event in events)
+    for event in events:
+        roles = roles_by_object.get(str(event.site_id), {})
+        extra = [user_id for role in sorted(roles_for(event.kind)) for user_id in roles.get(role, ())]
+        event.recipient_ids = list(dict.fromkeys(list(event.recipient_ids) + extra))
+
+
+__all__ = [
+    'resolve_roles', 'expand_recipients', 'roles_for', 'object_version_name', 'KIND_ROLES', 'DEFAULT_ROLES',
+    'MEMBERSHIPS_VERSION',
+]
@@ -1,19 +1,29 @@
 """Notification service utilities.
 
-Lightweight abstraction around creating Notification records so that
-business logic (viewsets, signals, FSM transitions) can fire events
-without duplicating code. For now it stores rows only; later we can
-extend with async fan‑out (websocket, email, push) by swapping the
-backend inside notify().
+Lightweight abstraction around firing notification events so that
+business logic (viewsets, signals, FSM transitions) can do it without
+duplicating code. notify() appends a NotificationOutbox row inside the
+caller's transaction (one INSERT, no extra atomic block); delivery to the
+inbox, email or webhooks is done by notifications.dispatcher.
+
+NOTIFICATION_DISPATCH selects who runs the dispatcher:
+- 'inline' (default) — right after the business transaction commits,
+  in the same process;
+- 'worker' — only `manage.py dispatch_notifications` (coalescing window
+  NOTIFICATION_COALESCE_WINDOW applies).
 """
 from __future__ import annotations
 
-from typing import Iterable, Sequence, Mapping, Any
+from datetime import timedelta
+from typing import Iterable, Mapping, Any
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.utils import timezone
+
+from core.services.transactions import after_commit
 
-from .models import Notification
+from .models import NotificationOutbox
 
 # Canonical notification kind constants (helps avoiding typos)
 OBJECT_CREATED = 'object.created'
@@ -25,36 +35,98 @@ REMARK_UPDATED = 'remark.updated'
 VIOLATION_CREATED = 'violation.created'
 VIOLATION_UPDATED = 'violation.updated'
 
+# Kinds whose bursts for one target are merged into a single notification
+COALESCED_KINDS = frozenset({OBJECT_UPDATED, DELIVERY_UPDATED, REMARK_UPDATED, VIOLATION_UPDATED})
+DEFAULT_COALESCE_WINDOW = 30
+
+
+def dispatch_mode() -> str:
+    return getattr(settings, 'NOTIFICATION_DISPATCH', 'inline')
+
+
+def coalesce_key(kind: str, payload: Mapping[str, Any]) -> str:
+    if kind in COALESCED_KINDS and payload.get('model') and payload.get('id'):
+        return f"{payload['model']}:{payload['id']}"
+    return ''
+
+
+def _outbox_event(users: Iterable[User], kind: str, payload: Mapping[str, Any] | None, now) -> NotificationOutbox | None:
+    user_ids = list(dict.fromkeys(u.pk for u in users if u and u.pk))
+    payload_dict = dict(payload or {})
+    if not user_ids and not payload_dict.get('object_id'):
+        return None
+    key = coalesce_key(kind, payload_dict)
+    window = getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', DEFAULT_COALESCE_WINDOW) if key else 0
+    return NotificationOutbox(
+        kind=kind, payload=payload_dict, recipient_ids=user_ids, coalesce_key=key,
+        site_id=payload_dict.get('object_id') or None, available_at=now + timedelta(seconds=window),
+    )
+
+
+def _enqueue(events: list[NotificationOutbox]) -> None:
+    NotificationOutbox.objects.bulk_create(events)
+    if dispatch_mode() == 'inline':
+        from .dispatcher import dispatch_events
+
+        ids = [event.pk for event in events]
+        after_commit(lambda: dispatch_events(ids))
+
 
 def notify(users: Iterable[User], kind: str, payload: Mapping[str, Any] | None = None) -> int:
-    """Create notification rows for each user.
+    """Queue one notification event for the given users.
 
-    Returns number of notifications created. Silently skips if users empty.
+    If payload carries 'object_id' (see build_basic_payload), the dispatcher
+    also notifies the object's people by role (notifications.recipients).
+    Returns number of explicit recipients queued. Skips if there is nobody
+    to notify.
     """
-    users_list: list[User] = [u for u in users if u and u.pk]
-    if not users_list:
+    event = _outbox_event(users, kind, payload, timezone.now())
+    if event is None:
         return 0
-    payload_dict = dict(payload or {})
-    to_create = [Notification(user=u, kind=kind, payload=payload_dict) for u in users_list]
-    with transaction.atomic():
-        created = Notification.objects.bulk_create(to_create, ignore_conflicts=True)
-    return len(created)
+    _enqueue([event])
+    return len(event.recipient_ids)
+
+
+def notify_bulk(events: Iterable[tuple[Iterable[User], str, Mapping[str, Any] | None]]) -> int:
+    """Queue many (users, kind, payload) events with a single bulk insert.
+
+    Used by batch endpoints (offline sync) instead of one notify() per record.
+    """
+    now = timezone.now()
+    to_create = [e for e in (_outbox_event(users, kind, payload, now) for users, kind, payload in events) if e]
+    if not to_create:
+        return 0
+    _enqueue(to_create)
+    return sum(len(e.recipient_ids) for e in to_create)
 
 
 def notify_one(user: User, kind: str, payload: Mapping[str, Any] | None = None) -> int:
     return notify([user], kind, payload)
 
 
+def target_object_id(instance) -> str | None:
+    """Construction object an instance belongs to (itself for ConstructionObject)."""
+    if instance._meta.label_lower == 'objects.constructionobject':
+        return str(instance.pk)
+    object_id = getattr(instance, 'object_id', None)
+    return str(object_id) if object_id else None
+
+
 def build_basic_payload(instance) -> dict[str, Any]:  # small helper used by viewsets
-    return {
+    payload = {
         'model': instance._meta.label_lower,
         'id': str(getattr(instance, 'pk', '')),
         'repr': str(instance),
     }
+    object_id = target_object_id(instance)
+    if object_id:
+        payload['object_id'] = object_id
+    return payload
 
 
 __all__ = [
-    'notify', 'notify_one', 'build_basic_payload',
+    'notify', 'notify_bulk', 'notify_one', 'build_basic_payload', 'target_object_id', 'coalesce_key', 'dispatch_mode',
+    'COALESCED_KINDS',
     'OBJECT_CREATED', 'OBJECT_UPDATED',
     'DELIVERY_CREATED', 'DELIVERY_UPDATED',
     'REMARK_CREATED', 'REMARK_UPDATED',
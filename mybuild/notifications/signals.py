@@ -0,0 +1,27 @@
+"""Инвалидация кеша получателей уведомлений (notifications.recipients).
+
+Версии увеличиваются после коммита, как и для офлайн-пакетов
+(objects.signals): диспетчер не закеширует состав из незафиксированных строк.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.services.versions import bump_version
+from objects.models import ObjectAssignment
+from orgs.models import Membership
+
+from .recipients import MEMBERSHIPS_VERSION, object_version_name
+
+
+@receiver(post_save, sender=ObjectAssignment)
+@receiver(post_delete, sender=ObjectAssignment)
+def _assignment_changed(sender, instance, **kwargs):
+    name = object_version_name(instance.object_id)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def _membership_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_version(MEMBERSHIPS_VERSION))
@@ -0,0 +1,294 @@
+"""Server-sent events stream of the user's notifications.
+
+GET /api/notifications/stream/ (async view, served by the ASGI application)
+keeps a text/event-stream open and pushes each new Notification as
+
+    id: <stream position (high-water created_at, ids seen in the overlap window)>
+    event: notification
+    data: <NotificationSerializer JSON>
+
+An idle connection is one asyncio.Event in this process: no polling, no DB
+queries. Delivery works through wake-ups:
+
+- InboxBackend.committed() calls publish(user_ids) after the dispatcher
+  commits;
+- on PostgreSQL publish() sends NOTIFY on NOTIFY_CHANNEL and a listener
+  thread (one per process, its own connection with LISTEN) wakes the local
+  subscribers — so a dispatcher in another process reaches every worker;
+- on other databases (SQLite, tests) subscribers are woken in-process.
+
+A woken stream reads the user's rows with one query, so bursts collapse
+into one read. created_at is set at INSERT, not at commit: a dispatcher
+transaction that inserted earlier may commit after a newer row was already
+streamed. The stream therefore re-reads NOTIFICATION_STREAM_OVERLAP_SECONDS
+before its high-water created_at and skips ids it has already sent; those
+ids travel in the event id, so Last-Event-ID resumes after a reconnect
+without gaps or repeats. A row committed later than the overlap after its
+INSERT is still missed. Without Last-Event-ID the stream starts after the
+newest existing notification.
+
+Every NOTIFICATION_STREAM_HEARTBEAT seconds of silence a comment line is
+sent to keep proxies from closing the connection. At most
+NOTIFICATION_STREAM_MAX_CONNECTIONS streams are open per worker process;
+the rest get 503 with Retry-After and fall back to polling
+(/api/notifications/unread/).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+
+from core.services.cursors import InvalidCursor, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'notifications_stream'
+DEFAULT_HEARTBEAT = 15
+DEFAULT_MAX_CONNECTIONS = 1000
+DEFAULT_OVERLAP_SECONDS = 5
+RETRY_MS = 5000
+FETCH_LIMIT = 100
+_NOTIFY_CHUNK = 500  # id пользователей в одном NOTIFY (лимит payload — 8000 байт)
+
+
+class TooManyStreams(Exception):
+    """Достигнут лимит потоков на процесс."""
+
+
+class Subscription:
+    """Подписка одного соединения; wake() можно вызывать из любого потока."""
+
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self) -> None:
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout: float) -> bool:
+        """True — было пробуждение, False — истек таймаут."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+    def close(self) -> None:
+        _unsubscribe(self)
+
+
+_lock = threading.Lock()
+_subscribers: Dict[int, Set[Subscription]] = {}
+_open = 0
+_listener: Optional[threading.Thread] = None
+
+
+def _max_connections() -> int:
+    return getattr(settings, 'NOTIFICATION_STREAM_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+
+
+def heartbeat_interval() -> float:
+    return getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', DEFAULT_HEARTBEAT)
+
+
+def _overlap() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_STREAM_OVERLAP_SECONDS', DEFAULT_OVERLAP_SECONDS))
+
+
+def open_connections() -> int:
+    return _open
+
+
+def subscribe(user_id: int) -> Subscription:
+    global _open
+    subscription = Subscription(user_id)
+    with _lock:
+        if _open >= _max_connections():
+            raise TooManyStreams()
+        _open += 1
+        _subscribers.setdefault(user_id, set()).add(subscription)
+    if connection.vendor == 'postgresql':
+        _ensure_listener()
+    return subscription
+
+
+def _unsubscribe(subscription: Subscription) -> None:
+    global _open
+    with _lock:
+        subs = _subscribers.get(subscription.user_id)
+        if subs is None or subscription not in subs:
+            return
+        subs.discard(subscription)
+        if not subs:
+            del _subscribers[subscription.user_id]
+        _open -= 1
+
+
+def wake_local(user_ids: Optional[Iterable[int]] = None) -> None:
+    """Будит подписки процесса (всех пользователей при user_ids=None)."""
+    with _lock:
+        if user_ids is None:
+            targets = [s for subs in _subscribers.values() for s in subs]
+        else:
+            targets = [s for user_id in set(user_ids) for s in _subscribers.get(user_id, ())]
+    for subscription in targets:
+        subscription.wake()
+
+
+def publish(user_ids: Iterable[int]) -> None:
+    """Сообщает о новых уведомлениях; вызывать после коммита."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    if connection.vendor != 'postgresql':
+        wake_local(user_ids)
+        return
+    with connection.cursor() as cursor:
+        for i in range(0, len(user_ids), _NOTIFY_CHUNK):
+            cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, json.dumps(user_ids[i:i + _NOTIFY_CHUNK])])
+
+
+def _ensure_listener() -> None:
+    global _listener
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _listener = threading.Thread(target=_listen_forever, name='notifications-listen', daemon=True)
+        _listener.start()
+
+
+def _listen_forever() -> None:  # pragma: no cover - требует PostgreSQL
+    while True:
+        db = connections.create_connection('default')
+        try:
+            db.ensure_connection()
+            raw = db.connection
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            # уведомления, пришедшие до LISTEN, подписчики дочитают сами
+            wake_local()
+            while True:
+                if select.select([raw], [], [], 60) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    wake_local(json.loads(raw.notifies.pop(0).payload))
+        except Exception:
+            logger.exception('Notification stream listener failed, reconnecting')
+            time.sleep(1)
+        finally:
+            db.close()
+
+
+def _event(row, cursor: str) -> str:
+    from .serializers import NotificationSerializer
+
+    data = json.dumps(NotificationSerializer(row).data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f'id: {cursor}\nevent: notification\ndata: {data}\n\n'
+
+
+def _decode_position(cursor: Optional[str]) -> Tuple[Optional[datetime], Dict[str, Optional[datetime]]]:
+    """(created_at последнего отправленного, {id отправленных в окне: created_at или None})."""
+    if not cursor:
+        return None, {}
+    high, ids = decode_cursor(cursor, 2)
+    if not isinstance(high, datetime) or not isinstance(ids, str):
+        raise InvalidCursor('bad stream cursor')
+    # курсор старого формата (created_at, id) — одна отправленная строка
+    return high, dict.fromkeys(filter(None, ids.split(',')))
+
+
+def _encode_position(high: datetime, seen: Dict[str, Optional[datetime]]) -> str:
+    horizon = high - _overlap()
+    ids = sorted(pk for pk, created_at in seen.items() if created_at is None or created_at >= horizon)
+    return encode_cursor([high, ','.join(ids)])
+
+
+def start_cursor(user, last_event_id: Optional[str]) -> Optional[str]:
+    """Позиция потока: Last-Event-ID, если он валиден, иначе после последнего уведомления."""
+    from .models import Notification
+
+    if last_event_id:
+        try:
+            _decode_position(last_event_id)
+            return last_event_id
+        except InvalidCursor:
+            pass
+    qs = Notification.objects.filter(user=user)
+    high = qs.order_by('-created_at').values_list('created_at', flat=True).first()
+    if high is None:
+        return None
+    # строки окна перекрытия уже существуют — считаем их отправленными
+    seen = dict(qs.filter(created_at__gte=high - _overlap()).values_list('id', 'created_at'))
+    return _encode_position(high, {str(pk): created_at for pk, created_at in seen.items()})
+
+
+def fetch_events(user, cursor: Optional[str]) -> Tuple[list, Optional[str]]:
+    """Новые уведомления после cursor: (SSE-события, новый курсор).
+
+    Читается окно перекрытия перед курсором, уже отправленные id пропускаются —
+    так доходят строки, зафиксированные позже более новых.
+    """
+    from .models import Notification
+
+    high, seen = _decode_position(cursor)
+    qs = Notification.objects.filter(user=user)
+    if high is not None:
+        qs = qs.filter(created_at__gte=high - _overlap())
+    limit = FETCH_LIMIT + len(seen)
+    rows = list(qs.order_by('created_at', 'id')[:limit])
+    events = []
+    for row in rows:
+        key = str(row.pk)
+        if key in seen:
+            seen[key] = row.created_at
+            continue
+        if len(events) == FETCH_LIMIT:
+            break
+        seen[key] = row.created_at
+        high = row.created_at if high is None or row.created_at > high else high
+        events.append(_event(row, _encode_position(high, seen)))
+    if high is None:
+        return events, cursor
+    if len(rows) < limit:
+        # окно прочитано целиком: непрочитанные id из курсора уже вне окна
+        seen = {pk: created_at for pk, created_at in seen.items() if created_at is not None}
+    return events, _encode_position(high, seen)
+
+
+async def event_stream(subscription: Subscription, user, cursor: Optional[str]) -> AsyncIterator[str]:
+    """Тело ответа; cursor — из start_cursor(), вычисленный после subscribe()."""
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        woken = True  # при возобновлении сразу дочитываем пропущенное
+        while True:
+            while woken:
+                events, cursor = await sync_to_async(fetch_events)(user, cursor)
+                for event in events:
+                    yield event
+                woken = len(events) == FETCH_LIMIT
+            woken = await subscription.wait(heartbeat_interval())
+            if not woken:
+                yield ': ping\n\n'
+    finally:
+        subscription.close()
+
+
+__all__ = [
+    'subscribe', 'publish', 'wake_local', 'event_stream', 'fetch_events', 'start_cursor', 'open_connections',
+    'heartbeat_interval', 'Subscription', 'TooManyStreams', 'NOTIFY_CHANNEL',
+]
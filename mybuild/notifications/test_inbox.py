@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from notifications.inbox import _init_counters
+from notifications.models import Notification, NotificationCounter
+from notifications.services import OBJECT_CREATED, notify
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass123")
+        self.other = User.objects.create_user(username="reader2", password="pass123")
+        self.api = APIClient()
+        self.api.login(username="reader", password="pass123")
+
+    def unread(self, **headers):
+        return self.api.get('/api/notifications/unread/', **headers)
+
+    def test_counter_follows_delivery_and_mark_read(self):
+        for i in range(3):
+            notify([self.user, self.other], OBJECT_CREATED, {'repr': f'n{i}'})
+        self.assertEqual(self.unread().data['unread'], 3)
+        first = Notification.objects.filter(user=self.user).first()
+        resp = self.api.post('/api/notifications/mark-read/', {'ids': [str(first.pk)]}, format='json')
+        self.assertEqual((resp.data['marked'], resp.data['unread']), (1, 2))
+        # повторная отметка ничего не меняет и не уводит счетчик в минус
+        resp = self.api.post('/api/notifications/mark-read/', {'ids': [str(first.pk)]}, format='json')
+        self.assertEqual((resp.data['marked'], resp.data['unread']), (0, 2))
+        with self.assertNumQueries(7):  # сессия, пользователь, savepoint с двумя UPDATE, чтение счетчика
+            resp = self.api.post('/api/notifications/mark-read/', {'all': True}, format='json')
+        self.assertEqual((resp.data['marked'], resp.data['unread']), (2, 0))
+        self.assertEqual(NotificationCounter.objects.get(user=self.other).unread, 3)
+        self.assertEqual(self.api.post('/api/notifications/mark-read/', {}, format='json').status_code, 400)
+
+    def test_poll_returns_304_until_inbox_changes(self):
+        first = self.unread()
+        etag = first['ETag']
+        with self.assertNumQueries(2):  # сессия и пользователь — счетчик не читается
+            cached = self.unread(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        notify([self.user], OBJECT_CREATED, {'repr': 'new'})
+        changed = self.unread(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data['unread'], 1)
+
+    def test_counter_initialized_from_existing_rows(self):
+        Notification.objects.bulk_create([Notification(user=self.user, kind='legacy') for _ in range(2)])
+        self.assertEqual(self.unread().data['unread'], 2)
+        notify([self.user], OBJECT_CREATED, {'repr': 'new'})
+        self.assertEqual(self.unread().data['unread'], 3)
+
+    def test_losing_initializer_adds_its_own_rows(self):
+        Notification.objects.bulk_create([Notification(user=self.user, kind='mine') for _ in range(2)])
+        # конкурент успел вставить счетчик, не видя двух незафиксированных строк этой доставки
+        NotificationCounter.objects.create(user=self.user, unread=1)
+        _init_counters({self.user.pk: 2, self.other.pk: 0})
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 3)
+        self.assertEqual(NotificationCounter.objects.get(user=self.other).unread, 0)
+
+    def test_list_is_keyset_paginated_and_private(self):
+        for i in range(3):
+            notify([self.user], OBJECT_CREATED, {'repr': f'n{i}'})
+        notify([self.other], OBJECT_CREATED, {'repr': 'foreign'})
+        first = self.api.get('/api/notifications/', {'limit': 2})
+        self.assertEqual(len(first.data['results']), 2)
+        second = self.api.get('/api/notifications/', {'limit': 2, 'cursor': first.data['next']})
+        self.assertIsNone(second.data['next'])
+        reprs = [n['payload']['repr'] for n in first.data['results'] + second.data['results']]
+        self.assertEqual(sorted(reprs), ['n0', 'n1', 'n2'])
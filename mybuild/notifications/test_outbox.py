@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notifications.backends import MemoryWebhookBackend
+from notifications.dispatcher import dispatch_batch
+from notifications.models import Notification, NotificationOutbox
+from notifications.services import DELIVERY_UPDATED, OBJECT_CREATED, notify
+
+PAYLOAD = {'model': 'materials.delivery', 'id': 'd-1', 'repr': 'Поставка'}
+
+
+class InlineDispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="inbox", password="pass123")
+
+    def test_notify_outside_transaction_delivers_immediately(self):
+        self.assertEqual(notify([self.user], OBJECT_CREATED, PAYLOAD), 1)
+        self.assertEqual(Notification.objects.filter(user=self.user, kind=OBJECT_CREATED).count(), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_delivery_waits_for_commit_and_rollback_discards(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            notify([self.user], OBJECT_CREATED, PAYLOAD)
+            self.assertFalse(Notification.objects.exists())
+        self.assertEqual(Notification.objects.count(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notify([self.user], OBJECT_CREATED, PAYLOAD)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+@override_settings(NOTIFICATION_DISPATCH='worker', NOTIFICATION_COALESCE_WINDOW=30)
+class WorkerDispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="worker", password="pass123", email="worker@example.com")
+        self.other = User.objects.create_user(username="worker2", password="pass123")
+        MemoryWebhookBackend.sent.clear()
+
+    def later(self):
+        return timezone.now() + timedelta(minutes=1)
+
+    def test_burst_is_coalesced_into_one_notification(self):
+        for i in range(50):
+            notify([self.user], DELIVERY_UPDATED, {**PAYLOAD, 'repr': f'v{i}'})
+        notify([self.user], OBJECT_CREATED, PAYLOAD)
+        notify([self.other], DELIVERY_UPDATED, PAYLOAD)
+        self.assertFalse(Notification.objects.exists())
+        # *.updated ждут окна склейки, остальные уходят сразу
+        self.assertEqual(dispatch_batch(), 1)
+        self.assertEqual(dispatch_batch(now=self.later()), 51)
+        burst = Notification.objects.get(user=self.user, kind=DELIVERY_UPDATED)
+        self.assertEqual(burst.payload['count'], 50)
+        self.assertEqual(burst.payload['repr'], 'v49')
+        self.assertNotIn('count', Notification.objects.get(user=self.other).payload)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_due_event_pulls_rest_of_its_series(self):
+        for _ in range(3):
+            notify([self.user], DELIVERY_UPDATED, PAYLOAD)
+        NotificationOutbox.objects.filter(pk=NotificationOutbox.objects.order_by('created_at')[0].pk).update(
+            available_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(dispatch_batch(), 3)
+        self.assertEqual(Notification.objects.get().payload['count'], 3)
+
+    @override_settings(
+        NOTIFICATION_BACKENDS=[
+            'notifications.backends.InboxBackend',
+            'notifications.backends.EmailBackend',
+            'notifications.backends.MemoryWebhookBackend',
+        ],
+        NOTIFICATION_WEBHOOK_URL='http://hooks.local/notify',
+    )
+    def test_fan_out_to_all_backends(self):
+        notify([self.user, self.other], OBJECT_CREATED, PAYLOAD)
+        call_command('dispatch_notifications', '--once', stdout=open('/dev/null', 'w'))
+        self.assertEqual(Notification.objects.count(), 2)
+        # письмо только тому, у кого есть адрес
+        self.assertEqual([m.to for m in mail.outbox], [["worker@example.com"]])
+        self.assertEqual(len(MemoryWebhookBackend.sent), 1)
+        self.assertEqual(MemoryWebhookBackend.sent[0][0]['users'], sorted([self.user.pk, self.other.pk]))
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from notifications.dispatcher import dispatch_batch
+from notifications.models import Notification, NotificationCounter
+from notifications.recipients import resolve_roles
+from notifications.services import notify
+from objects.models import ConstructionObject, ObjectAssignment
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class RecipientResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Rcpt Org")
+        self.actor = User.objects.create_user(username="actor", password="pass123")
+        self.foreman = User.objects.create_user(username="rcpt_foreman", password="pass123")
+        self.client_user = User.objects.create_user(username="rcpt_client", password="pass123")
+        self.inspector = User.objects.create_user(username="rcpt_inspector", password="pass123")
+        self.objects = [
+            ConstructionObject.objects.create(org=self.org, name=f"Rcpt site {i}", polygon=POLYGON) for i in range(6)
+        ]
+        self.obj = self.objects[0]
+        Membership.objects.create(user=self.client_user, org=self.org, role="CLIENT")
+        for obj in self.objects:
+            ObjectAssignment.objects.create(object=obj, user=self.foreman, role="FOREMAN")
+            ObjectAssignment.objects.create(object=obj, user=self.inspector, role="INSPECTOR")
+
+    def payload(self, obj):
+        return {'model': 'issues.remark', 'id': str(obj.pk), 'object_id': str(obj.pk)}
+
+    def recipients(self, kind):
+        return set(Notification.objects.filter(kind=kind).values_list('user__username', flat=True))
+
+    def test_kind_roles_select_recipients(self):
+        notify([self.actor], 'remark.created', self.payload(self.obj))
+        self.assertEqual(self.recipients('remark.created'), {"actor", "rcpt_foreman", "rcpt_client"})
+        notify([self.actor], 'checklist.submitted', self.payload(self.obj))
+        self.assertEqual(self.recipients('checklist.submitted'), {"actor", "rcpt_client", "rcpt_inspector"})
+        # событие без объекта — только явные получатели
+        notify([self.actor], 'remark.created', {'model': 'issues.remark', 'id': 'x'})
+        self.assertEqual(Notification.objects.filter(kind='remark.created').count(), 4)
+
+    @override_settings(NOTIFICATION_DISPATCH='worker')
+    def test_batch_resolution_does_not_depend_on_object_count(self):
+        # счетчики непрочитанных заведены заранее — их инициализация не мешает подсчету
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user=u) for u in (self.actor, self.foreman, self.client_user, self.inspector)]
+        )
+
+        def dispatch(objects):
+            for obj in objects:
+                notify([self.actor], 'violation.created', self.payload(obj))
+            with CaptureQueriesContext(connection) as ctx:
+                dispatch_batch()
+            return len(ctx)
+
+        cold_small = dispatch(self.objects[:2])
+        cache.clear()
+        cold_large = dispatch(self.objects)
+        self.assertEqual(cold_small, cold_large)
+        # состав получателей закеширован — запроса UNION больше нет
+        self.assertEqual(dispatch(self.objects), cold_large - 1)
+        self.assertEqual(Notification.objects.filter(user=self.inspector).count(), 14)
+
+    def test_assignment_change_invalidates_cache(self):
+        newcomer = User.objects.create_user(username="newcomer", password="pass123")
+        self.assertNotIn(newcomer.pk, resolve_roles([self.obj.pk])[str(self.obj.pk)].get('FOREMAN', []))
+        with self.captureOnCommitCallbacks(execute=True):
+            ObjectAssignment.objects.create(object=self.obj, user=newcomer, role="FOREMAN")
+        with self.assertNumQueries(1):
+            roles = resolve_roles([self.obj.pk])[str(self.obj.pk)]
+        self.assertIn(newcomer.pk, roles['FOREMAN'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Membership.objects.filter(user=self.client_user).delete()
+        self.assertNotIn('CLIENT', resolve_roles([self.obj.pk])[str(self.obj.pk)])
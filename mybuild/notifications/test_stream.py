@@ -0,0 +1,101 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from notifications import stream
+from notifications.models import Notification
+from notifications.services import OBJECT_CREATED, notify
+
+URL = '/api/notifications/stream/'
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="streamer", password="pass123")
+        self.other = User.objects.create_user(username="streamer2", password="pass123")
+
+    async def connect(self, headers=None):
+        await self.async_client.aforce_login(self.user)
+        resp = await self.async_client.get(URL, headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        it = aiter(resp.streaming_content)
+        self.assertTrue((await self.next_chunk(it)).startswith('retry:'))
+        return it
+
+    async def next_chunk(self, it):
+        chunk = await asyncio.wait_for(anext(it), timeout=5)
+        return chunk.decode() if isinstance(chunk, bytes) else chunk
+
+    def parse(self, chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+        return fields['id'], json.loads(fields['data'])
+
+    async def test_new_notification_is_pushed(self):
+        await sync_to_async(notify)([self.user], OBJECT_CREATED, {'repr': 'old'})
+        it = await self.connect()
+        # чужие уведомления не приходят, старые не повторяются
+        await sync_to_async(notify)([self.other], OBJECT_CREATED, {'repr': 'foreign'})
+        await sync_to_async(notify)([self.user], OBJECT_CREATED, {'repr': 'fresh'})
+        _, data = self.parse(await self.next_chunk(it))
+        self.assertEqual(data['payload']['repr'], 'fresh')
+        await it.aclose()
+
+    async def test_closing_stream_releases_slot(self):
+        before = stream.open_connections()
+        body = stream.event_stream(stream.subscribe(self.user.pk), self.user, None)
+        self.assertEqual(stream.open_connections(), before + 1)
+        await anext(body)
+        await body.aclose()  # так ASGI-обработчик завершает поток при разрыве соединения
+        self.assertEqual(stream.open_connections(), before)
+
+    async def test_resume_from_last_event_id(self):
+        for i in range(3):
+            await sync_to_async(notify)([self.user], OBJECT_CREATED, {'repr': f'n{i}'})
+        first = await sync_to_async(Notification.objects.order_by('created_at', 'id').first)()
+        cursor = stream.encode_cursor([first.created_at, first.pk])
+        it = await self.connect(headers={'Last-Event-ID': cursor})
+        received = [self.parse(await self.next_chunk(it))[1]['payload']['repr'] for _ in range(2)]
+        self.assertEqual(received, ['n1', 'n2'])
+        await it.aclose()
+
+    def test_row_committed_after_newer_one_is_not_skipped(self):
+        notify([self.user], OBJECT_CREATED, {'repr': 'newer'})
+        newer = Notification.objects.get(user=self.user)
+        cursor = stream.start_cursor(self.user, None)
+        self.assertEqual(stream.fetch_events(self.user, cursor)[0], [])
+        # транзакция, вставившая строку раньше, фиксируется после того, как курсор ушел вперед
+        notify([self.user], OBJECT_CREATED, {'repr': 'older'})
+        older = Notification.objects.get(user=self.user, payload__repr='older')
+        Notification.objects.filter(pk=older.pk).update(created_at=newer.created_at - timedelta(seconds=1))
+        events, cursor = stream.fetch_events(self.user, cursor)
+        self.assertEqual([self.parse(e)[1]['payload']['repr'] for e in events], ['older'])
+        self.assertEqual(stream.fetch_events(self.user, cursor), ([], cursor))
+        # Last-Event-ID события несет уже отправленные id — без повторов после переподключения
+        resumed = stream.start_cursor(self.user, self.parse(events[0])[0])
+        self.assertEqual(stream.fetch_events(self.user, resumed)[0], [])
+
+    @override_settings(NOTIFICATION_STREAM_HEARTBEAT=0.05)
+    async def test_heartbeat_when_idle(self):
+        it = await self.connect()
+        self.assertEqual(await self.next_chunk(it), ': ping\n\n')
+        await it.aclose()
+
+    async def test_connection_cap_per_worker(self):
+        with override_settings(NOTIFICATION_STREAM_MAX_CONNECTIONS=stream.open_connections() + 1):
+            it = await self.connect()
+            resp = await self.async_client.get(URL)
+            self.assertEqual(resp.status_code, 503)
+            self.assertIn('Retry-After', resp)
+            await it.aclose()
+
+    def test_requires_asgi_and_login(self):
+        self.assertEqual(self.client.get(URL).status_code, 501)
+
+    async def test_anonymous_rejected(self):
+        resp = await self.async_client.get(URL)
+        self.assertEqual(resp.status_code, 401)
@@ -1,3 +1,32 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 
-# Create your views here.
+from .stream import TooManyStreams, event_stream, start_cursor, subscribe
+
+
+async def notification_stream(request):
+    """SSE-поток уведомлений текущего пользователя (см. notifications.stream)."""
+    if not isinstance(request, ASGIRequest):
+        # под WSGI поток занял бы рабочий процесс целиком
+        return JsonResponse({'detail': 'Поток доступен только через ASGI; используйте /api/notifications/unread/.'}, status=501)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется аутентификация.'}, status=401)
+    try:
+        subscription = subscribe(user.pk)
+    except TooManyStreams:
+        resp = JsonResponse({'detail': 'Слишком много соединений, повторите позже.'}, status=503)
+        resp['Retry-After'] = '30'
+        return resp
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        # позиция — после подписки: уведомление между ними не потеряется
+        cursor = await sync_to_async(start_cursor)(user, last_event_id)
+    except BaseException:
+        subscription.close()
+        raise
+    resp = StreamingHttpResponse(event_stream(subscription, user, cursor), content_type='text/event-stream')
+    resp['Cache-Control'] = 'no-cache'
+    resp['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return resp
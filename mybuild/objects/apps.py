@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ObjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'objects'
+
+    def ready(self):  # type: ignore[override]
+        # Инвалидация офлайн-пакетов объектов
+        from . import signals  # noqa: F401
@@ -42,6 +42,10 @@ class ConstructionObject(BaseModel):
     class Meta:
         verbose_name = 'Строительный объект'
         verbose_name_plural = 'Строительные объекты'
+        indexes = [
+            # лента изменений (core.services.changes): keyset по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='object_changes_idx'),
+        ]
         permissions = [
             ("can_confirm_geozone", "Может подтверждать геозону объекта"),
             ("can_view_auditlog", "Может просматривать аудит"),
@@ -80,6 +84,10 @@ class OpeningChecklist(BaseModel):
     class Meta:
         verbose_name = 'Вводный чек-лист'
         verbose_name_plural = 'Вводные чек-листы'
+        indexes = [
+            # лента изменений (core.services.changes): keyset по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='opening_checklist_changes_idx'),
+        ]
         permissions = [
             ("can_review_checklist", "Может рецензировать чеклист"),
             ("can_approve_checklist", "Может утверждать чеклист"),
@@ -101,6 +109,10 @@ class DailyChecklist(BaseModel):
     class Meta:
         verbose_name = 'Ежедневный чек-лист'
         verbose_name_plural = 'Ежедневные чек-листы'
+        indexes = [
+            # лента изменений (core.services.changes): keyset по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='daily_checklist_changes_idx'),
+        ]
         permissions = [
             ("can_create_daily_checklist", "Может создавать ежедневные чеклисты"),
             ("can_view_daily_checklist", "Может просматривать ежедневные чеклисты"),
@@ -124,3 +136,53 @@ class OpeningAct(BaseModel):
 
     def __str__(self):
         return f'Акт для {self.object.name}'
+
+
+class ObjectStats(BaseModel):
+    """Счетчики объекта (read model) для панели и списков.
+
+    Поддерживаются инкрементально после коммита (objects.services.stats),
+    сверяются и перестраиваются командой object_stats. «Открытые»
+    замечания и нарушения — в статусах OPEN и IN_PROGRESS.
+    """
+    object = models.OneToOneField(ConstructionObject, on_delete=models.CASCADE, related_name='stats')
+    opening_total = models.IntegerField(default=0)
+    opening_approved = models.IntegerField(default=0)
+    daily_total = models.IntegerField(default=0)
+    daily_approved = models.IntegerField(default=0)
+    remarks_total = models.IntegerField(default=0)
+    violations_total = models.IntegerField(default=0)
+    open_remarks_low = models.IntegerField(default=0)
+    open_remarks_medium = models.IntegerField(default=0)
+    open_remarks_high = models.IntegerField(default=0)
+    open_remarks_critical = models.IntegerField(default=0)
+    open_violations_low = models.IntegerField(default=0)
+    open_violations_medium = models.IntegerField(default=0)
+    open_violations_high = models.IntegerField(default=0)
+    open_violations_critical = models.IntegerField(default=0)
+    last_delivery_id = models.UUIDField(null=True, blank=True)
+    last_delivery_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Статистика объекта'
+        verbose_name_plural = 'Статистика объектов'
+
+    def __str__(self):
+        return f'Статистика {self.object_id}'
+
+    @property
+    def total_checks(self) -> int:
+        return self.opening_total + self.daily_total
+
+    @property
+    def completed_checks(self) -> int:
+        return self.opening_approved + self.daily_approved
+
+    @property
+    def issues(self) -> int:
+        return self.remarks_total + self.violations_total
+
+    @property
+    def open_issues(self) -> int:
+        return sum(getattr(self, f'open_{kind}_{severity}') for kind in ('remarks', 'violations')
+                   for severity in ('low', 'medium', 'high', 'critical'))
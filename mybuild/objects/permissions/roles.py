@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
-from functools import lru_cache
+
+from core.services.principal import get_principal
 
 ROLE_CLIENT = "CLIENT"
 ROLE_FOREMAN = "FOREMAN"
@@ -13,19 +14,10 @@ ROLE_ATTRS = {
     ROLE_ADMIN: "is_admin",
 }
 
-@lru_cache(maxsize=512)
-def _user_group_names(user_id: int, version: int):
-    try:
-        user = User.objects.get(pk=user_id)
-    except User.DoesNotExist:
-        return set()
-    return set(user.groups.values_list("name", flat=True))
-
 def _has_role(user: User, role: str) -> bool:
     if user.is_superuser:
         return True
-    groups = _user_group_names(user.id, int(user.last_login.timestamp()) if user.last_login else 0)
-    return role in groups
+    return get_principal(user).has_group(role)
 
 def is_client(user: User) -> bool:
     return _has_role(user, ROLE_CLIENT)
@@ -0,0 +1,127 @@
+"""Офлайн-пакет объекта строительства (/api/objects/{id}/offline-bundle/).
+
+Перед выездом на площадку без связи приложению прораба нужно все сразу:
+объект с геозоной, вводный чек-лист, ежедневные чек-листы за последние
+BUNDLE_DAILY_DAYS дней, незакрытые замечания и нарушения, справочник
+материалов и определения пунктов чек-листов из objects.constants.
+
+Пакет собирается фиксированным числом запросов, сериализуется в JSON и
+сжимается gzip. ETag — хеш содержимого. Готовый пакет кешируется под ключом
+из версий (core.services.versions):
+
+- bundle:obj:<id> — увеличивается при изменении объекта и любой из его
+  дочерних строк (objects.signals);
+- bundle:materials — при изменении справочника материалов;
+- текущая дата — окно «последних дней» сдвигается раз в сутки;
+- хеш констант чек-листов — меняется только с релизом.
+
+Повторная загрузка с If-None-Match получает 304 без сборки пакета.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from core.services.versions import get_versions
+
+BUNDLE_FORMAT = 1
+DEFAULT_DAILY_DAYS = 14
+DEFAULT_CACHE_TIMEOUT = 24 * 3600
+MATERIALS_VERSION = 'bundle:materials'
+
+
+def object_version_name(object_id) -> str:
+    return f'bundle:obj:{object_id}'
+
+
+@dataclass(frozen=True)
+class Bundle:
+    etag: str
+    body: bytes  # gzip
+
+    def raw(self) -> bytes:
+        return gzip.decompress(self.body)
+
+
+def _dumps(data: Any) -> bytes:
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode()
+
+
+@lru_cache(maxsize=1)
+def checklist_definitions() -> Dict[str, Any]:
+    from objects.constants import CHECKLIST_ITEM_STATUSES, DAILY_CHECKLIST_ITEMS, OPENING_CHECKLIST_ITEMS
+
+    return {
+        'opening': OPENING_CHECKLIST_ITEMS,
+        'daily': DAILY_CHECKLIST_ITEMS,
+        'statuses': CHECKLIST_ITEM_STATUSES,
+    }
+
+
+@lru_cache(maxsize=1)
+def _definitions_hash() -> str:
+    return hashlib.sha256(_dumps(checklist_definitions())).hexdigest()[:12]
+
+
+def _daily_days() -> int:
+    return getattr(settings, 'BUNDLE_DAILY_DAYS', DEFAULT_DAILY_DAYS)
+
+
+def _cache_key(object_id) -> str:
+    name = object_version_name(object_id)
+    versions = get_versions([name, MATERIALS_VERSION])
+    day = timezone.localdate().isoformat()
+    return f'bundle:{object_id}:{versions[name]}:{versions[MATERIALS_VERSION]}:{day}:{_definitions_hash()}'
+
+
+def build_payload(obj) -> Dict[str, Any]:
+    """Содержимое пакета; 6 запросов независимо от объема данных."""
+    from issues.models import IssueStatus, Remark, Violation
+    from issues.serializers import RemarkDetailSerializer, ViolationDetailSerializer
+    from materials.models import MaterialType
+    from materials.serializers import MaterialTypeSerializer
+    from objects.models import DailyChecklist, OpeningChecklist
+    from objects.serializers import (
+        ConstructionObjectDetailSerializer, DailyChecklistSerializer, OpeningChecklistSerializer,
+    )
+
+    since = timezone.now() - timedelta(days=_daily_days())
+    opening = OpeningChecklist.objects.filter(object=obj).first()
+    daily = DailyChecklist.objects.filter(object=obj, created_at__gte=since).order_by('-created_at')
+    open_issue = {'object': obj, 'status__in': [s for s in IssueStatus.values if s != IssueStatus.ACCEPTED]}
+    remarks = Remark.objects.filter(**open_issue).prefetch_related('photos').order_by('created_at')
+    violations = Violation.objects.filter(**open_issue).prefetch_related('photos').order_by('created_at')
+    return {
+        'format': BUNDLE_FORMAT,
+        'object': ConstructionObjectDetailSerializer(obj).data,
+        'opening_checklist': OpeningChecklistSerializer(opening).data if opening else None,
+        'daily_checklists': DailyChecklistSerializer(daily, many=True).data,
+        'remarks': RemarkDetailSerializer(remarks, many=True).data,
+        'violations': ViolationDetailSerializer(violations, many=True).data,
+        'material_types': MaterialTypeSerializer(MaterialType.objects.order_by('name'), many=True).data,
+        'checklist_items': checklist_definitions(),
+    }
+
+
+def get_bundle(obj) -> Bundle:
+    """Пакет объекта из кеша либо собранный заново."""
+    key = _cache_key(obj.pk)
+    bundle = cache.get(key)
+    if bundle is None:
+        raw = _dumps(build_payload(obj))
+        bundle = Bundle(etag=f'"{hashlib.sha256(raw).hexdigest()}"', body=gzip.compress(raw, mtime=0))
+        cache.set(key, bundle, getattr(settings, 'BUNDLE_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return bundle
+
+
+__all__ = ['Bundle', 'get_bundle', 'build_payload', 'checklist_definitions', 'object_version_name', 'MATERIALS_VERSION']
@@ -0,0 +1,252 @@
+"""Счетчики объекта строительства (objects.models.ObjectStats).
+
+Панель, список объектов и отчеты читают готовые числа из ObjectStats
+вместо агрегации по строкам на каждый запрос. Таблица поддерживается
+инкрементально (objects.signals):
+
+- при загрузке строки OpeningChecklist/DailyChecklist/Remark/Violation
+  запоминается ее вклад в счетчики (post_init, без запросов). Если нужные
+  поля отложены (.only()/.defer(), refresh_from_db(fields=...)), вклад
+  неизвестен (UNKNOWN): обращение к полю перезагрузило бы строку и снова
+  вызвало post_init. При сохранении или удалении такой строки строка
+  ObjectStats ее объекта пересчитывается из данных;
+- после save/delete вычисляется разница вкладов «было/стало» и после
+  коммита применяется одним UPDATE ... SET x = x + delta (F-выражения),
+  так что параллельные изменения не теряются;
+- последняя поставка обновляется условным UPDATE при создании и
+  пересчитывается при изменении или удалении поставки;
+- если строки ObjectStats нет (объект создан до появления таблицы), она
+  строится заново из данных.
+
+Вклад «было» запоминается при загрузке строки, а переходы статусов строку
+не блокируют (select_for_update): два параллельных запроса, уводящих одно и
+то же замечание или чек-лист из статуса, оба применят -1, и счетчик уйдет
+вниз. Такой дрейф, как и изменения через QuerySet.update() и сырой SQL,
+которые счетчики не видят, сверяет и исправляет команда object_stats
+(--verify/--rebuild) — ее стоит запускать по расписанию.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from core.services.transactions import after_commit
+
+OPEN_STATUSES = ('OPEN', 'IN_PROGRESS')
+SEVERITIES = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+COUNTER_FIELDS = (
+    'opening_total', 'opening_approved', 'daily_total', 'daily_approved', 'remarks_total', 'violations_total',
+) + tuple(f'open_{kind}_{s.lower()}' for kind in ('remarks', 'violations') for s in SEVERITIES)
+STATS_FIELDS = COUNTER_FIELDS + ('last_delivery_id', 'last_delivery_at')
+
+# label модели -> префикс полей ObjectStats
+_CHECKLISTS = {'objects.openingchecklist': 'opening', 'objects.dailychecklist': 'daily'}
+_ISSUES = {'issues.remark': 'remarks', 'issues.violation': 'violations'}
+COUNTED_LABELS = tuple(_CHECKLISTS) + tuple(_ISSUES)
+
+Contribution = Tuple[object, Dict[str, int]]
+# вклад загруженной строки неизвестен — ее поля отложены
+UNKNOWN = 'unknown'
+
+
+def _contribution_fields(instance) -> Tuple[str, ...]:
+    if instance._meta.label_lower in _CHECKLISTS:
+        return ('object_id', 'status')
+    return ('object_id', 'status', 'severity')
+
+
+def loaded_contribution(instance):
+    """Вклад строки по уже загруженным полям; UNKNOWN, если какое-то из них отложено."""
+    loaded = instance.__dict__
+    if any(name not in loaded for name in _contribution_fields(instance)):
+        return UNKNOWN
+    return contribution(instance)
+
+
+def contribution(instance) -> Optional[Contribution]:
+    """Вклад строки в счетчики своего объекта: (object_id, {поле: 1})."""
+    label = instance._meta.label_lower
+    if not instance.object_id:
+        return None
+    if label in _CHECKLISTS:
+        prefix = _CHECKLISTS[label]
+        fields = {f'{prefix}_total': 1}
+        if instance.status == 'APPROVED':
+            fields[f'{prefix}_approved'] = 1
+    else:
+        prefix = _ISSUES[label]
+        fields = {f'{prefix}_total': 1}
+        if instance.status in OPEN_STATUSES and instance.severity in SEVERITIES:
+            fields[f'open_{prefix}_{instance.severity.lower()}'] = 1
+    return instance.object_id, fields
+
+
+def deltas(old: Optional[Contribution], new: Optional[Contribution]) -> Dict[object, Dict[str, int]]:
+    result: Dict[object, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for sign, part in ((-1, old), (1, new)):
+        if part is None:
+            continue
+        object_id, fields = part
+        for field, value in fields.items():
+            result[object_id][field] += sign * value
+    return {
+        object_id: {f: v for f, v in fields.items() if v}
+        for object_id, fields in result.items()
+        if any(fields.values())
+    }
+
+
+def _apply(changes: Dict[object, Dict[str, int]]) -> None:
+    from objects.models import ObjectStats
+
+    now = timezone.now()
+    missing = []
+    for object_id, fields in changes.items():
+        updated = ObjectStats.objects.filter(object_id=object_id).update(
+            updated_at=now, **{field: F(field) + value for field, value in fields.items()}
+        )
+        if not updated:
+            missing.append(object_id)
+    if missing:
+        # строки нет — строим из данных, изменение в них уже есть
+        rebuild_stats(missing)
+
+
+def apply_change(old: Optional[Contribution], new: Optional[Contribution]) -> None:
+    changes = deltas(old, new)
+    if changes:
+        after_commit(lambda: _apply(changes))
+
+
+def rebuild_later(object_ids: Iterable) -> None:
+    """Пересчет строк объектов после коммита — когда прежний вклад строки неизвестен."""
+    object_ids = list({object_id for object_id in object_ids if object_id})
+    if object_ids:
+        after_commit(lambda: rebuild_stats(object_ids))
+
+
+def _delivery_created(object_id, delivery_id, delivered_at) -> None:
+    from objects.models import ObjectStats
+
+    stats = ObjectStats.objects.filter(object_id=object_id)
+    newer = Q(last_delivery_at__isnull=True) | Q(last_delivery_at__lte=delivered_at)
+    if not stats.filter(newer).update(last_delivery_id=delivery_id, last_delivery_at=delivered_at, updated_at=timezone.now()):
+        if not stats.exists():
+            rebuild_stats([object_id])
+
+
+def refresh_last_delivery(object_ids: Iterable) -> None:
+    """Пересчитывает последнюю поставку объектов (после изменения или удаления поставки)."""
+    from materials.models import Delivery
+    from objects.models import ObjectStats
+
+    for object_id in set(object_ids):
+        latest = (
+            Delivery.objects.filter(object_id=object_id).order_by('-delivered_at', '-id')
+            .values_list('id', 'delivered_at').first()
+        ) or (None, None)
+        if not ObjectStats.objects.filter(object_id=object_id).update(
+            last_delivery_id=latest[0], last_delivery_at=latest[1], updated_at=timezone.now(),
+        ):
+            rebuild_stats([object_id])
+
+
+def delivery_saved(instance, created: bool, old_object_id=None) -> None:
+    if created:
+        args = (instance.object_id, instance.pk, instance.delivered_at)
+        after_commit(lambda: _delivery_created(*args))
+    else:
+        object_ids = {instance.object_id, old_object_id} - {None}
+        after_commit(lambda: refresh_last_delivery(object_ids))
+
+
+def delivery_deleted(instance) -> None:
+    object_id = instance.object_id
+    after_commit(lambda: refresh_last_delivery([object_id]))
+
+
+def object_created(instance) -> None:
+    from objects.models import ObjectStats
+
+    object_id = instance.pk
+    after_commit(lambda: ObjectStats.objects.bulk_create([ObjectStats(object_id=object_id)], ignore_conflicts=True))
+
+
+def compute_stats(object_ids: Optional[Iterable] = None) -> Dict[object, Dict[str, object]]:
+    """Счетчики из данных: по одному сгруппированному запросу на модель."""
+    from issues.models import Remark, Violation
+    from materials.models import Delivery
+    from objects.models import ConstructionObject, DailyChecklist, OpeningChecklist
+
+    objects = ConstructionObject.objects.all()
+    if object_ids is not None:
+        objects = objects.filter(pk__in=list(object_ids))
+    latest = Delivery.objects.filter(object=OuterRef('pk')).order_by('-delivered_at', '-id')
+    result: Dict[object, Dict[str, object]] = {}
+    for row in objects.annotate(
+        last_delivery_id=Subquery(latest.values('id')[:1]),
+        last_delivery_at=Subquery(latest.values('delivered_at')[:1]),
+    ).values('pk', 'last_delivery_id', 'last_delivery_at'):
+        result[row['pk']] = {
+            **{field: 0 for field in COUNTER_FIELDS},
+            'last_delivery_id': row['last_delivery_id'],
+            'last_delivery_at': row['last_delivery_at'],
+        }
+
+    def grouped(model, **aggregates):
+        qs = model.objects.all() if object_ids is None else model.objects.filter(object_id__in=list(result))
+        return qs.values('object_id').annotate(**aggregates).order_by()
+
+    for model, prefix in ((OpeningChecklist, 'opening'), (DailyChecklist, 'daily')):
+        for row in grouped(model, total=Count('id'), approved=Count('id', filter=Q(status='APPROVED'))):
+            if row['object_id'] in result:
+                result[row['object_id']].update({f'{prefix}_total': row['total'], f'{prefix}_approved': row['approved']})
+    for model, prefix in ((Remark, 'remarks'), (Violation, 'violations')):
+        open_counts = {
+            f'open_{prefix}_{s.lower()}': Count('id', filter=Q(severity=s, status__in=OPEN_STATUSES)) for s in SEVERITIES
+        }
+        for row in grouped(model, **{f'{prefix}_total': Count('id')}, **open_counts):
+            object_id = row.pop('object_id')
+            if object_id in result:
+                result[object_id].update(row)
+    return result
+
+
+def rebuild_stats(object_ids: Optional[Iterable] = None) -> int:
+    """Перестраивает строки ObjectStats из данных (все объекты при object_ids=None)."""
+    from objects.models import ObjectStats
+
+    computed = compute_stats(object_ids)
+    rows = [ObjectStats(object_id=object_id, **values) for object_id, values in computed.items()]
+    ObjectStats.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True, unique_fields=['object'], update_fields=list(STATS_FIELDS),
+    )
+    return len(rows)
+
+
+def verify_stats(object_ids: Optional[Iterable] = None) -> List[Tuple[object, str, object, object]]:
+    """Расхождения ObjectStats с данными: [(object_id, поле, в таблице, фактически)]."""
+    from objects.models import ObjectStats
+
+    computed = compute_stats(object_ids)
+    stored = {s.object_id: s for s in ObjectStats.objects.filter(object_id__in=list(computed))}
+    mismatches = []
+    for object_id, values in computed.items():
+        row = stored.get(object_id)
+        if row is None:
+            mismatches.append((object_id, '*', None, 'нет строки'))
+            continue
+        for field in STATS_FIELDS:
+            if getattr(row, field) != values[field]:
+                mismatches.append((object_id, field, getattr(row, field), values[field]))
+    return mismatches
+
+
+__all__ = [
+    'contribution', 'loaded_contribution', 'deltas', 'apply_change', 'rebuild_later', 'delivery_saved', 'delivery_deleted', 'object_created',
+    'refresh_last_delivery', 'compute_stats', 'rebuild_stats', 'verify_stats',
+    'OPEN_STATUSES', 'COUNTER_FIELDS', 'STATS_FIELDS', 'COUNTED_LABELS', 'UNKNOWN',
+]
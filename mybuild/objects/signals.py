@@ -0,0 +1,120 @@
+"""Сигналы объектов строительства.
+
+- Инвалидация офлайн-пакетов (objects.services.bundle). Версия
+  увеличивается после коммита: до него читатели видят и старую версию,
+  и старые данные, поэтому в кеш не попадает пакет из незафиксированного
+  состояния.
+- Инкрементальные счетчики ObjectStats (objects.services.stats).
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.services.versions import bump_version
+from issues.models import Remark, Violation
+from materials.models import Delivery, MaterialType
+from objects.models import ConstructionObject, DailyChecklist, OpeningChecklist
+from objects.services import stats
+from objects.services.bundle import MATERIALS_VERSION, object_version_name
+
+
+def _bump_later(name: str) -> None:
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver(post_save, sender=ConstructionObject)
+@receiver(post_delete, sender=ConstructionObject)
+def _object_changed(sender, instance, **kwargs):
+    _bump_later(object_version_name(instance.pk))
+
+
+@receiver(post_save, sender=OpeningChecklist)
+@receiver(post_delete, sender=OpeningChecklist)
+@receiver(post_save, sender=DailyChecklist)
+@receiver(post_delete, sender=DailyChecklist)
+@receiver(post_save, sender=Remark)
+@receiver(post_delete, sender=Remark)
+@receiver(post_save, sender=Violation)
+@receiver(post_delete, sender=Violation)
+def _object_child_changed(sender, instance, **kwargs):
+    _bump_later(object_version_name(instance.object_id))
+
+
+@receiver(m2m_changed, sender=Remark.photos.through)
+@receiver(m2m_changed, sender=Violation.photos.through)
+def _issue_photos_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        _bump_later(object_version_name(instance.object_id))
+
+
+@receiver(post_save, sender=MaterialType)
+@receiver(post_delete, sender=MaterialType)
+def _material_type_changed(sender, instance, **kwargs):
+    _bump_later(MATERIALS_VERSION)
+
+
+# ---------- ObjectStats ----------
+
+_COUNTED = (OpeningChecklist, DailyChecklist, Remark, Violation)
+
+
+def _remember(sender, instance, **kwargs):
+    # отложенные поля не читаем: их загрузка снова вызывает post_init
+    instance._stats_contribution = stats.loaded_contribution(instance)
+
+
+def _counted_saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_stats_contribution', None)
+    if old is stats.UNKNOWN:
+        # прежний вклад неизвестен — пересчитываем объект целиком; вклад по-прежнему
+        # неизвестен, пока поля строки отложены
+        stats.rebuild_later([instance.object_id])
+        instance._stats_contribution = stats.loaded_contribution(instance)
+        return
+    new = stats.contribution(instance)
+    stats.apply_change(old, new)
+    instance._stats_contribution = new
+
+
+def _counted_deleting(sender, instance, **kwargs):
+    if getattr(instance, '_stats_contribution', None) is stats.UNKNOWN:
+        # после удаления строку уже не дочитать — объект запоминаем заранее
+        instance._stats_object_id = instance.object_id
+
+
+def _counted_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_stats_contribution', None)
+    if old is stats.UNKNOWN:
+        stats.rebuild_later([getattr(instance, '_stats_object_id', None)])
+        return
+    stats.apply_change(old, None)
+
+
+for _model in _COUNTED:
+    post_init.connect(_remember, sender=_model, dispatch_uid=f'stats_init_{_model._meta.label_lower}')
+    post_save.connect(_counted_saved, sender=_model, dispatch_uid=f'stats_save_{_model._meta.label_lower}')
+    pre_delete.connect(_counted_deleting, sender=_model, dispatch_uid=f'stats_deleting_{_model._meta.label_lower}')
+    post_delete.connect(_counted_deleted, sender=_model, dispatch_uid=f'stats_delete_{_model._meta.label_lower}')
+
+
+@receiver(post_init, sender=Delivery)
+def _delivery_loaded(sender, instance, **kwargs):
+    # без .only('object') — неизвестно; при изменении пересчитывается только новый объект
+    instance._stats_object_id = instance.__dict__.get('object_id')
+
+
+@receiver(post_save, sender=Delivery)
+def _delivery_saved(sender, instance, created, **kwargs):
+    stats.delivery_saved(instance, created, getattr(instance, '_stats_object_id', None))
+    instance._stats_object_id = instance.object_id
+
+
+@receiver(post_delete, sender=Delivery)
+def _delivery_deleted(sender, instance, **kwargs):
+    stats.delivery_deleted(instance)
+
+
+@receiver(post_save, sender=ConstructionObject)
+def _object_created(sender, instance, created, **kwargs):
+    if created:
+        stats.object_created(instance)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from issues.models import Remark, Violation
+from materials.models import Delivery, MaterialType
+from objects.models import ConstructionObject, DailyChecklist, ObjectStats, OpeningChecklist
+from objects.services.stats import verify_stats
+from orgs.models import Organization
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class ObjectStatsTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Stats Org")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Stats site", polygon=POLYGON)
+        self.other = ConstructionObject.objects.create(org=self.org, name="Stats site 2", polygon=POLYGON)
+        self.material = MaterialType.objects.create(name="Песок", unit="т")
+
+    def stats(self, obj=None):
+        return ObjectStats.objects.get(object=obj or self.obj)
+
+    def test_counters_follow_creates_updates_and_deletes(self):
+        self.assertEqual(self.stats().total_checks, 0)
+        checklist = DailyChecklist.objects.create(object=self.obj, data={})
+        OpeningChecklist.objects.create(object=self.obj, data={}, status='APPROVED')
+        remark = Remark.objects.create(object=self.obj, description="r", severity='CRITICAL')
+        Violation.objects.create(object=self.obj, description="v", severity='LOW')
+        stats = self.stats()
+        self.assertEqual((stats.total_checks, stats.completed_checks, stats.issues), (2, 1, 2))
+        self.assertEqual((stats.open_remarks_critical, stats.open_violations_low), (1, 1))
+
+        checklist.status = 'APPROVED'
+        checklist.save()
+        remark.status = 'RESOLVED'
+        remark.save()
+        stats = self.stats()
+        self.assertEqual(stats.completed_checks, 2)
+        self.assertEqual((stats.open_remarks_critical, stats.remarks_total, stats.open_issues), (0, 1, 1))
+
+        # перенос на другой объект и повторное сохранение без изменений
+        remark.object = self.other
+        remark.save()
+        remark.save()
+        self.assertEqual((self.stats().remarks_total, self.stats(self.other).remarks_total), (0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            checklist.delete()
+        self.assertEqual(self.stats().daily_total, 0)
+        self.assertEqual(verify_stats(), [])
+
+    def test_deferred_fields_do_not_recurse(self):
+        remark = Remark.objects.create(object=self.obj, description="r", severity='CRITICAL')
+        Delivery.objects.create(object=self.obj, material=self.material, quantity=1, delivered_at=timezone.now())
+
+        partial = Remark.objects.only('id', 'description').get(pk=remark.pk)
+        self.assertEqual(partial.status, 'OPEN')  # догрузка поля — без рекурсии post_init
+        remark.refresh_from_db(fields=['status'])
+        with self.assertNumQueries(1):
+            list(Delivery.objects.only('id', 'quantity'))
+
+        # прежний вклад неизвестен — строка объекта пересчитывается из данных
+        partial = Remark.objects.only('id').get(pk=remark.pk)
+        partial.status = 'RESOLVED'
+        partial.save()
+        self.assertEqual(self.stats().open_remarks_critical, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Remark.objects.only('id').get(pk=remark.pk).delete()
+        self.assertEqual(self.stats().remarks_total, 0)
+        self.assertEqual(verify_stats(), [])
+
+    def test_last_delivery(self):
+        now = timezone.now()
+        latest = Delivery.objects.create(object=self.obj, material=self.material, quantity=1, delivered_at=now)
+        older = Delivery.objects.create(object=self.obj, material=self.material, quantity=1,
+                                        delivered_at=now - timedelta(days=1))
+        self.assertEqual(self.stats().last_delivery_id, latest.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            latest.delete()
+        self.assertEqual(self.stats().last_delivery_id, older.pk)
+        older.object = self.other
+        older.save()
+        self.assertIsNone(self.stats().last_delivery_id)
+        self.assertEqual(self.stats(self.other).last_delivery_id, older.pk)
+
+    def test_missing_row_is_rebuilt_on_next_change(self):
+        Remark.objects.create(object=self.obj, description="r", severity='HIGH')
+        ObjectStats.objects.filter(object=self.obj).delete()
+        Remark.objects.create(object=self.obj, description="r2", severity='HIGH')
+        self.assertEqual(self.stats().open_remarks_high, 2)
+
+    def test_command_verifies_and_rebuilds(self):
+        Remark.objects.create(object=self.obj, description="r", severity='MEDIUM')
+        # обход сигналов — счетчики расходятся с данными
+        Remark.objects.filter(object=self.obj).update(status='ACCEPTED')
+        with self.assertRaises(CommandError):
+            call_command('object_stats', '--verify', stdout=StringIO())
+        call_command('object_stats', '--rebuild', '--object', str(self.obj.pk), stdout=StringIO())
+        self.assertEqual(self.stats().open_remarks_medium, 0)
+        call_command('object_stats', stdout=StringIO())
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from issues.models import IssueStatus, Remark, Violation
+from materials.models import MaterialType
+from objects.constants import OPENING_CHECKLIST_ITEMS
+from objects.models import ConstructionObject, DailyChecklist, OpeningChecklist
+from orgs.models import Organization, Membership
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]}
+
+
+class OfflineBundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Bundle Org")
+        self.other = Organization.objects.create(name="Bundle Other")
+        self.user = User.objects.create_user(username="bundler", password="pass123")
+        Membership.objects.create(user=self.user, org=self.org, role="FOREMAN")
+        self.obj = ConstructionObject.objects.create(org=self.org, name="Bundle site", polygon=POLYGON)
+        self.foreign = ConstructionObject.objects.create(org=self.other, name="Foreign", polygon=POLYGON)
+        OpeningChecklist.objects.create(object=self.obj, data={"fields": []})
+        DailyChecklist.objects.create(object=self.obj, data={"items": []})
+        self.open_remark = Remark.objects.create(object=self.obj, description="open")
+        Remark.objects.create(object=self.obj, description="closed", status=IssueStatus.ACCEPTED)
+        Violation.objects.create(object=self.obj, description="violation")
+        MaterialType.objects.create(name="Песок", unit="т")
+        self.url = f'/api/objects/{self.obj.pk}/offline-bundle/'
+        self.api = APIClient()
+        self.api.login(username="bundler", password="pass123")
+
+    def get(self, **headers):
+        return self.api.get(self.url, **headers)
+
+    def test_bundle_contents_and_compression(self):
+        resp = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(resp.content))
+        self.assertEqual(data['object']['id'], str(self.obj.pk))
+        self.assertEqual(data['object']['polygon'], POLYGON)
+        self.assertIsNotNone(data['opening_checklist'])
+        self.assertEqual(len(data['daily_checklists']), 1)
+        self.assertEqual([r['id'] for r in data['remarks']], [str(self.open_remark.pk)])
+        self.assertEqual(len(data['violations']), 1)
+        self.assertEqual([m['name'] for m in data['material_types']], ["Песок"])
+        self.assertEqual(len(data['checklist_items']['opening']), len(OPENING_CHECKLIST_ITEMS))
+        plain = self.get()
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(json.loads(plain.content), data)
+        self.assertEqual(plain['ETag'], resp['ETag'])
+
+    def test_etag_304_until_underlying_row_changes(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(3):  # сессия, пользователь, объект — пакет из кеша
+            cached = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.open_remark.description = "changed"
+            self.open_remark.save()
+        changed = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_foreign_object_not_available(self):
+        resp = self.api.get(f'/api/objects/{self.foreign.pk}/offline-bundle/')
+        self.assertEqual(resp.status_code, 404)
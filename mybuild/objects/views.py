@@ -18,11 +18,18 @@ from django.core.exceptions import PermissionDenied
 from django.contrib.auth.models import Group
 from objects.permissions import roles as role_checks  # предполагаемый модуль с функциями is_client/is_foreman/... если отсутствует – создать отдельно
 from . import constants
+from core.services.page_cache import page_fragment
 
 
 @login_required
 def object_list(request):
-	qs = ConstructionObject.objects.select_related('org').all().order_by('-created_at')
+	return render(request, 'objects/list.html', {
+		'page_fragment': page_fragment(request, 'object_list', build=lambda: _object_list_context(request)),
+	})
+
+
+def _object_list_context(request):
+	qs = ConstructionObject.objects.select_related('org', 'stats').all().order_by('-created_at')
 	# Filter by user's organizations unless superuser
 	if not request.user.is_superuser:
 		user_orgs = request.user.memberships.values_list('org', flat=True).distinct()
@@ -37,12 +44,11 @@ def object_list(request):
 	allowed_roles = ['ADMIN', 'CLIENT']
 	can_create = any(role in allowed_roles for role in user_roles) or request.user.is_superuser
 	
-	context = {
+	return {
 		'objects': qs[:200],  # simple cap
 		'statuses': ConstructionObject._meta.get_field('status').choices,
 		'can_create_objects': can_create,
 	}
-	return render(request, 'objects/list.html', context)
 
 
 class ObjectDetailContextAssembler: